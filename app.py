@@ -1,11 +1,11 @@
-from flask import Flask, render_template, jsonify, request, send_from_directory, session
+from flask import Flask, Response, render_template, jsonify, request, send_from_directory, session, g
 import pygame
 import threading
 import os
 import time
 import json
+import math
 from pathlib import Path
-from pythonosc import udp_client
 from pythonosc.dispatcher import Dispatcher
 import asyncio
 import socket
@@ -13,16 +13,43 @@ from datetime import datetime, date
 import secrets
 import hashlib
 import subprocess
-import sys
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from state_store import StateStore
+from sqlite_state import SqliteBackend
+from sound_cache import SoundCache
+from transcode_cache import TranscodeCache
+from event_bus import EventBus
+from chat_log import ChatLog
+from event_log import EventLog
+from rollups import ClickRollups, RESOLUTIONS
+from rate_limiter import RATE_LIMIT_ALGORITHMS, create_rate_limiter, restore_rate_limiter
+from wsgi_server import WSGIServer
+from audio_engine import AudioEngine, PRIORITY_VOICE, PRIORITY_CLICK, PRIORITY_TEST
+from osc_sender import OSCSender
+from session_registry import SessionRegistry
+from sound_library import SoundLibrary, SORT_KEYS
+from sound_resolver import SoundResolver
+from pishock_client import PiShockClient, MERGE_POLICIES, REQUESTS_AVAILABLE
+from metrics import MetricsRegistry, RequestMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from trigger_trace import Tracer
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)  # Secure session key
 
-# Add middleware to handle ngrok browser warning bypass
+# Request and domain metrics, exported in Prometheus format at /metrics
+metrics = MetricsRegistry(namespace='clicker')
+request_metrics = RequestMetrics(metrics)
+events_counter = metrics.counter('events_total', 'Clicks, bonks and zaps triggered', ('type',))
+rate_limited_counter = metrics.counter('rate_limited_total', 'Clicks refused by the rate limiter')
+pishock_latency = metrics.histogram('pishock_request_duration_seconds', 'PiShock API call latency', ('status',))
+
 @app.before_request
 def before_request():
-    """Add headers to bypass ngrok browser warning"""
-    pass
+    """Start timing the request for its route's latency histogram"""
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_start = time.perf_counter()
+    request_metrics.started(g.metrics_route)
 
 @app.after_request
 def after_request(response):
@@ -33,8 +60,17 @@ def after_request(response):
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type, ngrok-skip-browser-warning'
+    g.metrics_status = response.status_code
     return response
 
+@app.teardown_request
+def teardown_request(exc):
+    """Record the request's status and latency (runs even if the handler raised)"""
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        request_metrics.finished(g.metrics_route, request.method, g.pop('metrics_status', 500),
+                                 time.perf_counter() - start)
+
 # Initialize pygame mixer for audio playback
 pygame.mixer.init()
 
@@ -45,29 +81,114 @@ STATS_FILE = "click_stats.json"  # Persistent statistics storage
 SETTINGS_FILE = "user_settings.json"  # User customization settings
 VOICE_MESSAGE_DIR = "static"  # Directory for voice messages
 VOICE_MESSAGE_BASE = "voice_message"  # Base filename (extension added dynamically)
-CHAT_FILE = "chat_messages.json"  # Chat messages storage
+CHAT_FILE = "chat_messages.json"  # Legacy chat storage (migrated into CHAT_LOG_FILE)
+CHAT_LOG_FILE = "chat_messages.jsonl"  # Append-only chat log, one message per line
 SESSIONS_FILE = "user_sessions.json"  # Session-to-nickname mapping
 RATE_LIMITS_FILE = "rate_limits.json"  # Rate limiting data
 PISHOCK_CONFIG_FILE = "pishock_config.json"  # PiShock API configuration
 CUSTOM_SOUNDS_DIR = "static/custom_sounds"  # Directory for custom sound library
 USER_PREFERENCES_FILE = "user_preferences.json"  # Per-user sound preferences
+TRANSCODE_CACHE_DIR = "transcode_cache"  # Converted WAVs, keyed by source content hash
+EVENT_LOG_DIR = "click_events"  # Append-only log of every click, bonk and zap
+ROLLUPS_FILE = "click_rollups.json"  # Per-minute/hour/day event counters and the weekly heatmap
+
+# State persistence - handlers work in memory, a background thread writes JSON files
+STATE_FLUSH_INTERVAL = 2.0  # Seconds between background flushes
+STATE_FLUSH_THRESHOLD = 50  # Flush early once this many changes are pending
+STATE_BACKEND = "json"  # json (one file per document) or sqlite (STATE_DB_FILE, only changed rows written)
+STATE_DB_FILE = "clicker_state.db"  # SQLite database; the JSON files are imported into it once
+
+# Decoded sound cache - keeps click/bonk sounds in memory instead of re-reading them
+SOUND_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Memory budget for decoded sounds (64 MB)
+
+# Transcode cache - MP3s are converted once and reused until the source changes
+TRANSCODE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Disk budget for converted WAVs (256 MB)
+
+# Background transcode workers (voice messages and MP3 uploads)
+TRANSCODE_WORKERS = 2  # ffmpeg jobs that may run at once
+TRANSCODE_QUEUE_LIMIT = 8  # Jobs allowed to wait or run before uploads are refused
+
+# Audio engine - one playback thread works through a priority queue
+AUDIO_QUEUE_SIZE = 32  # Sounds waiting to start before the lowest-priority one is dropped
+AUDIO_MAX_DELAY = 5  # Seconds a click/bonk/test sound may wait before it's skipped (voice never is)
+
+# Server-Sent Events - pushes clicks, chat and voice message changes to open pages
+SSE_QUEUE_SIZE = 100  # Events buffered per client before a slow client is dropped
+SSE_HEARTBEAT_INTERVAL = 15  # Seconds between keep-alive comments on idle streams
+
+# Web server - used by both the console entry point and the GUI
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 5000
+SERVER_ENGINE = "werkzeug"  # werkzeug (pooled, /ws WebSockets), cheroot or auto (cheroot when installed)
+SERVER_THREADS = 32  # Worker pool size for ordinary requests
+SERVER_MAX_STREAMS = 256  # Open /events and /ws connections, each on its own thread - more get 503 and poll instead
+SERVER_BACKLOG = 128  # Connections queued by the OS before new ones are refused
+SERVER_TIMEOUT = 30  # Seconds an idle keep-alive connection or slow request may take
+SERVER_SHUTDOWN_TIMEOUT = 10  # Seconds to let in-flight requests finish on stop
+
+# Click event log - every click, bonk and zap, in size-rotated segments
+EVENT_LOG_SEGMENT_BYTES = 4 * 1024 * 1024  # Segment size before a new one is started (4 MB)
+EVENT_LOG_COMPACT_AFTER = 7 * 24 * 3600  # Segments older than this (seconds) are gzipped
+EVENT_LOG_RETENTION = 90 * 24 * 3600  # Segments older than this (seconds) are deleted (0 = keep forever)
+CLICK_HISTORY_SIZE = 10  # Recent clicks shown on the page and in /stats
+EVENTS_PAGE_MAX = 1000  # Largest ?limit= accepted by /admin/events
+
+# Click rollups - counters kept up as events happen, served by /stats/history
+ROLLUP_MINUTE_RETENTION = 2 * 24 * 3600  # Seconds per-minute buckets are kept (then only hours remain)
+ROLLUP_HOUR_RETENTION = 90 * 24 * 3600  # Seconds per-hour buckets are kept (then only days remain)
+HISTORY_DEFAULT_POINTS = {'minute': 60, 'hour': 48, 'day': 30}  # Buckets returned without ?from=
+HISTORY_MAX_POINTS = 2000  # Most buckets one /stats/history response returns
+
+# Trigger tracing - per-stage latency of the latest clicks, bonks and zaps
+TRACE_BUFFER_SIZE = 1000  # Traces kept for /admin/traces percentiles
+
+# Chat - recent messages kept in memory with increasing IDs
+CHAT_BUFFER_SIZE = 50  # Messages kept (and replayed to new visitors)
+CHAT_PAGE_SIZE = 20  # Messages returned by GET /chat without ?since=
+
+# Visitor sessions - nicknames and colors kept in memory
+SESSION_TTL = 30 * 24 * 3600  # Sessions idle this long (seconds) are forgotten
+SESSION_LAST_SEEN_GRANULARITY = 60  # last_seen is stored to the minute, so clicks rarely dirty the file
+SESSION_SWEEP_INTERVAL = 3600  # Seconds between sweeps for expired sessions
+USERS_PAGE_SIZE = 50  # Users per /admin/users page
+USERS_PAGE_MAX = 200  # Largest ?limit= accepted
 
 # Rate limiting configuration
 MAX_CLICKS_PER_HOUR = 10  # Default: 10 clicks per hour
 RATE_LIMIT_WINDOW = 3600  # 1 hour in seconds
+RATE_LIMIT_SWEEP_INTERVAL = 300  # Seconds between sweeps of idle sessions
+RATE_LIMIT_ALGORITHM = "sliding_window"  # sliding_window, token_bucket or gcra
+RATE_LIMIT_BURST = 5  # Clicks allowed back-to-back (token_bucket and gcra)
+RATE_LIMIT_REFILL_PER_HOUR = 10  # Clicks earned back per hour (token_bucket)
 
 # PiShock Configuration
-PISHOCK_API_URL = "https://do.pishock.com/api/apioperate"
+PISHOCK_API_URL = "https://do.pishock.com/api/apioperate"  # pishock_stub.py serves http://127.0.0.1:5050/api/apioperate for offline testing
+PISHOCK_WORKERS = 2  # API calls that may be in flight at once
+PISHOCK_QUEUE_LIMIT = 16  # Commands allowed to wait or run before new ones are refused
+PISHOCK_TIMEOUT = 5  # Seconds per API call
+PISHOCK_FAILURE_THRESHOLD = 5  # Consecutive failures before the circuit opens
+PISHOCK_RETRY_AFTER = 30  # Seconds an open circuit fails fast before probing the API again
+PISHOCK_COALESCE_WINDOW = 1.0  # A press is sent at once; presses in the next N seconds merge into one follow-up (0 = off)
+PISHOCK_MERGE_POLICY = "max_intensity"  # max_intensity, sum_duration or drop_duplicates
 
 # VRChat OSC Configuration
 VRCHAT_OSC_IP = "127.0.0.1"
 VRCHAT_OSC_PORT = 9000
 OSC_RECEIVE_PORT = 9001
+OSC_PULSE_DURATION = 0.1  # Seconds a trigger parameter stays True before it's reset
+OSC_TIMER_TICK = 0.01  # Resolution of the reset timer wheel (seconds)
 
 # Ngrok Configuration - ADD YOUR TOKEN HERE!
 NGROK_AUTH_TOKEN = ""  # Paste your ngrok token between the quotes
 # Get your token from: https://dashboard.ngrok.com/get-started/your-authtoken
 
+# Optional WebSocket support for low-latency triggers
+try:
+    from flask_sock import Sock
+    SOCK_AVAILABLE = True
+except ImportError:
+    SOCK_AVAILABLE = False
+
 # Optional tunnel support
 try:
     from pyngrok import ngrok, conf
@@ -75,10 +196,193 @@ try:
 except ImportError:
     NGROK_AVAILABLE = False
 
-# OSC Client for sending to VRChat
-osc_client = None
+# OSC sender thread for VRChat (None until init_osc)
+osc_sender = None
 public_tunnel_url = None
 
+def default_pishock_config():
+    """Default PiShock configuration used until one is saved"""
+    return {
+        'enabled': False,
+        'username': '',
+        'api_key': '',
+        'sharecode': '',
+        'name': 'PiShock',
+        'intensity': 30,
+        'duration': 1,
+        'operation': 0,  # 0=shock, 1=vibrate, 2=beep
+        'coalesce_window': PISHOCK_COALESCE_WINDOW,
+        'merge_policy': PISHOCK_MERGE_POLICY
+    }
+
+ROLLUP_RETENTION = {'minute': ROLLUP_MINUTE_RETENTION, 'hour': ROLLUP_HOUR_RETENTION}
+
+def default_settings():
+    """Default settings (for long distance relationships)"""
+    return {
+        'title': 'Good Boy!',
+        'subtitle': 'Remote Clicker Training 🎯',
+        'timezones': [
+            {'name': 'Partner 1', 'offset': 0},
+            {'name': 'Partner 2', 'offset': 0}
+        ],
+        'theme': 'purple'
+    }
+
+# In-memory state for every JSON file - flushed to disk in the background
+state = StateStore(
+    flush_interval=STATE_FLUSH_INTERVAL,
+    dirty_threshold=STATE_FLUSH_THRESHOLD,
+    backend=SqliteBackend(STATE_DB_FILE) if STATE_BACKEND == 'sqlite' else None
+)
+state.register('stats', STATS_FILE)
+
+def session_color(session_id):
+    """Color for a new session - a hash of its ID, so it's stable across restarts"""
+    colors = ['💜', '💙', '💚', '💛', '🧡', '❤️', '💗', '💕']
+    color_index = int(hashlib.md5(session_id.encode()).hexdigest(), 16) % len(colors)
+    return colors[color_index]
+
+def new_session_registry():
+    return SessionRegistry(
+        ttl=SESSION_TTL,
+        granularity=SESSION_LAST_SEEN_GRANULARITY,
+        sweep_interval=SESSION_SWEEP_INTERVAL,
+        color_for=session_color
+    )
+
+state.register(
+    'sessions', SESSIONS_FILE,
+    default=new_session_registry,
+    to_json=lambda registry: registry.snapshot(),
+    from_json=lambda data: new_session_registry().restore(data)
+)
+def load_rate_limiter(data):
+    """Restore the rate limiter along with the hourly limit it was saved with"""
+    global MAX_CLICKS_PER_HOUR
+    saved = data.get('max_events')
+    if isinstance(saved, int) and saved > 0:
+        MAX_CLICKS_PER_HOUR = saved
+    return restore_rate_limiter(
+        data, MAX_CLICKS_PER_HOUR, RATE_LIMIT_WINDOW,
+        RATE_LIMIT_BURST, RATE_LIMIT_REFILL_PER_HOUR, RATE_LIMIT_SWEEP_INTERVAL
+    )
+
+state.register(
+    'rate_limits', RATE_LIMITS_FILE,
+    default=lambda: create_rate_limiter(
+        RATE_LIMIT_ALGORITHM, MAX_CLICKS_PER_HOUR, RATE_LIMIT_WINDOW,
+        RATE_LIMIT_BURST, RATE_LIMIT_REFILL_PER_HOUR, RATE_LIMIT_SWEEP_INTERVAL
+    ),
+    # The token bucket has no max_events of its own, but the admin's hourly limit still has to survive a restart
+    to_json=lambda limiter: {'max_events': MAX_CLICKS_PER_HOUR, **limiter.snapshot()},
+    from_json=load_rate_limiter
+)
+state.register('preferences', USER_PREFERENCES_FILE)
+state.register('pishock', PISHOCK_CONFIG_FILE, default=default_pishock_config)
+state.register('settings', SETTINGS_FILE, default=default_settings)
+state.register(
+    'rollups', ROLLUPS_FILE,
+    default=lambda: ClickRollups(ROLLUP_RETENTION),
+    to_json=lambda rollups: rollups.snapshot(),
+    from_json=lambda data: ClickRollups(ROLLUP_RETENTION).restore(data)
+)
+state.start()
+atexit.register(state.close)
+
+# Per-session click timestamps, held in memory and snapshotted by the state store
+rate_limiter = state.get('rate_limits')
+
+# Live updates for /events subscribers
+event_bus = EventBus(queue_size=SSE_QUEUE_SIZE, max_subscribers=SERVER_MAX_STREAMS)
+
+# Chat ring buffer backed by an append-only log
+chat_log = ChatLog(CHAT_LOG_FILE, capacity=CHAT_BUFFER_SIZE, legacy_path=CHAT_FILE)
+atexit.register(chat_log.close)
+
+# Every click, bonk and zap, appended as it happens
+event_log = EventLog(
+    EVENT_LOG_DIR,
+    segment_bytes=EVENT_LOG_SEGMENT_BYTES,
+    retention=EVENT_LOG_RETENTION,
+    compact_after=EVENT_LOG_COMPACT_AFTER
+)
+atexit.register(event_log.close)
+
+# Stage timings of recent triggers, from HTTP receipt to sound, OSC and PiShock
+tracer = Tracer(capacity=TRACE_BUFFER_SIZE)
+
+# Event counts per minute/hour/day, held in memory and snapshotted by the state store
+rollups = state.get('rollups')
+
+def backfill_rollups():
+    """Build the rollups from the event log the first time they're used"""
+    start = None
+    while True:
+        events, start = event_log.read(start, limit=EVENTS_PAGE_MAX)
+        for event in events:
+            rollups.record(event.get('type', 'click'), event['timestamp'])
+        if start is None:
+            break
+    if rollups.total:
+        state.mark_dirty('rollups')
+        print(f"📈 Rolled up {rollups.total} logged events")
+
+if not rollups.total:
+    backfill_rollups()
+
+def count_event(event_type, timestamp):
+    """Add a click/bonk/zap to the rollups"""
+    rollups.record(event_type, timestamp)
+    state.mark_dirty('rollups')
+    events_counter.inc(event_type)
+
+# Decoded pygame Sounds, keyed by (path, mtime, size)
+sound_cache = SoundCache(max_bytes=SOUND_CACHE_MAX_BYTES)
+
+# Index of the sound library directories (lookup order: built-in, then uploads)
+sound_library = SoundLibrary({'sounds': "static/sounds", 'custom': CUSTOM_SOUNDS_DIR})
+
+# Every sound is started from this one thread: voice messages, then clicks, then tests
+audio_engine = AudioEngine(queue_size=AUDIO_QUEUE_SIZE)
+audio_engine.start()
+
+# Converted WAVs on disk, in the mixer's native sample rate and channel count
+_mixer_frequency, _mixer_size, _mixer_channels = pygame.mixer.get_init() or (44100, -16, 2)
+transcode_cache = TranscodeCache(
+    TRANSCODE_CACHE_DIR,
+    max_bytes=TRANSCODE_CACHE_MAX_BYTES,
+    sample_rate=_mixer_frequency,
+    channels=_mixer_channels
+)
+
+# Bounded worker pool so uploads never transcode on the request thread
+transcode_executor = ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS, thread_name_prefix='transcode')
+transcode_slots = threading.BoundedSemaphore(TRANSCODE_QUEUE_LIMIT)
+
+def submit_transcode(fn, *args):
+    """Queue work on the transcode pool. Returns None if the queue is full."""
+    if not transcode_slots.acquire(blocking=False):
+        print("⚠️ Transcode queue full - job refused")
+        return None
+    try:
+        future = transcode_executor.submit(fn, *args)
+    except RuntimeError:
+        transcode_slots.release()
+        return None
+    future.add_done_callback(lambda f: transcode_slots.release())
+    return future
+
+# Voice message lifecycle: none -> pending (transcoding) -> ready (decoded buffer) or failed (files deleted, error kept)
+voice_message_lock = threading.Lock()
+voice_message_state = {
+    'status': 'none',
+    'path': None,
+    'sound': None,
+    'error': None,
+    'generation': 0
+}
+
 def setup_tunnel():
     """Set up public tunnel if ngrok is available"""
     global public_tunnel_url
@@ -114,11 +418,12 @@ def setup_tunnel():
         return False
 
 def init_osc():
-    """Initialize OSC client for VRChat communication"""
-    global osc_client
+    """Initialize OSC sender for VRChat communication"""
+    global osc_sender
     try:
-        osc_client = udp_client.SimpleUDPClient(VRCHAT_OSC_IP, VRCHAT_OSC_PORT)
-        print(f"🎮 OSC Client initialized for VRChat at {VRCHAT_OSC_IP}:{VRCHAT_OSC_PORT}")
+        osc_sender = OSCSender(VRCHAT_OSC_IP, VRCHAT_OSC_PORT, tick=OSC_TIMER_TICK)
+        osc_sender.start()
+        print(f"🎮 OSC sender initialized for VRChat at {VRCHAT_OSC_IP}:{VRCHAT_OSC_PORT}")
         return True
     except Exception as e:
         print(f"❌ OSC initialization failed: {e}")
@@ -130,48 +435,54 @@ class AudioClicker:
         self.daily_click_count = 0
         self.last_click_time = None
         self.vrchat_connected = False
-        self.click_history = []  # Store last 10 clicks
+        self.click_history = event_log.tail(CLICK_HISTORY_SIZE, types=('click',))  # Newest clicks, for the page
         self.current_date = str(date.today())
         self.load_stats()
         
     def load_stats(self):
-        """Load statistics from JSON file"""
+        """Load statistics from the state store"""
         try:
-            if os.path.exists(STATS_FILE):
-                with open(STATS_FILE, 'r') as f:
-                    data = json.load(f)
-                    self.click_count = data.get('total_clicks', 0)
-                    self.click_history = data.get('click_history', [])[-10:]  # Last 10
-                    
-                    # Check if date changed - reset daily count
-                    saved_date = data.get('current_date', str(date.today()))
-                    if saved_date == str(date.today()):
-                        self.daily_click_count = data.get('daily_clicks', 0)
-                    else:
-                        self.daily_click_count = 0
-                        self.current_date = str(date.today())
-                    
-                    print(f"📊 Loaded stats: {self.click_count} total clicks, {self.daily_click_count} today")
+            data = state.get('stats')
+            if data:
+                self.click_count = data.get('total_clicks', 0)
+                
+                # Older versions kept the last 10 clicks in the stats file - move them to the event log
+                legacy_history = data.get('click_history')
+                if legacy_history and not self.click_history:
+                    for record in legacy_history:
+                        event_log.append(dict(record, type='click'))
+                        if 'timestamp' in record:
+                            count_event('click', record['timestamp'])
+                    self.click_history = event_log.tail(CLICK_HISTORY_SIZE, types=('click',))
+                    print(f"📜 Moved {len(legacy_history)} clicks from {STATS_FILE} to the event log")
+                
+                # Check if date changed - reset daily count
+                saved_date = data.get('current_date', str(date.today()))
+                if saved_date == str(date.today()):
+                    self.daily_click_count = data.get('daily_clicks', 0)
+                else:
+                    self.daily_click_count = 0
+                    self.current_date = str(date.today())
+                
+                print(f"📊 Loaded stats: {self.click_count} total clicks, {self.daily_click_count} today")
         except Exception as e:
             print(f"⚠️ Could not load stats: {e}")
     
     def save_stats(self):
-        """Save statistics to JSON file"""
+        """Hand statistics to the state store (written to disk by the flusher)"""
         try:
             data = {
                 'total_clicks': self.click_count,
                 'daily_clicks': self.daily_click_count,
                 'current_date': self.current_date,
-                'click_history': self.click_history[-10:],  # Keep last 10
                 'last_updated': time.time()
             }
-            with open(STATS_FILE, 'w') as f:
-                json.dump(data, f, indent=2)
+            state.set('stats', data)
         except Exception as e:
             print(f"⚠️ Could not save stats: {e}")
         
-    def play_sound(self, sound_type="default", session_id=None, nickname=None):
-        """Play different types of sounds"""
+    def play_sound(self, sound_type="default", session_id=None, nickname=None, voice_sound=None, priority=PRIORITY_CLICK, trace=None):
+        """Count a click and queue its sound (and any voice message) on the audio engine"""
         try:
             # Check if date changed - reset daily count
             if self.current_date != str(date.today()):
@@ -182,89 +493,107 @@ class AudioClicker:
             # Determine which sound type to play (click or bonk)
             actual_sound_type = 'bonk' if sound_type == 'bonk' else 'click'
             
-            # Get custom sound for this user or use default
-            sound_file = get_custom_sound_for_user(session_id, actual_sound_type) if session_id else (BONK_SOUND_FILE if actual_sound_type == 'bonk' else SOUND_FILE)
+            # Custom sound for this user or the default - a table lookup, no disk access
+            sound_file, playable = sound_resolver.resolve(session_id, actual_sound_type)
+            if trace:
+                trace.mark('sound_resolved')
             
-            if os.path.exists(sound_file):
-                # Play sound file with MP3 support
-                if play_sound_file(sound_file):
-                    print(f"🎵 Playing {actual_sound_type} sound: {sound_file}")
+            def play():
+                if playable is not None:
+                    try:
+                        sound_cache.get(playable).play()
+                        if trace:
+                            trace.mark('play_started')
+                        print(f"🎵 Playing {actual_sound_type} sound: {sound_file}")
+                    except Exception as e:
+                        print(f"⚠️ Sound playback failed for {sound_file}: {e}")
                 else:
-                    # Fallback to system beep
+                    play_click_audio(sound_file or SOUND_FILE, actual_sound_type, trace)
+                if voice_sound is not None:
                     try:
-                        import winsound
-                        winsound.Beep(800, 200)
-                        print("🔊 Fallback to system beep")
-                    except:
-                        print("\a")  # ASCII bell
+                        time.sleep(0.1)
+                        voice_sound.play()
+                        if trace:
+                            trace.mark('voice_started')
+                        print(f"🎤 Playing voice message on server ({voice_sound.get_length():.1f}s)")
+                    except Exception as e:
+                        print(f"❌ Failed to play voice message: {e}")
+            
+            # A click carrying a voice message jumps the queue and is never skipped as stale
+            if voice_sound is not None:
+                audio_engine.submit(play, PRIORITY_VOICE, 'voice message')
             else:
-                # Fall back to system beep
-                try:
-                    import winsound
-                    winsound.Beep(800, 200)  # frequency, duration
-                    print("🔊 Playing system beep")
-                except:
-                    print("\a")  # ASCII bell
+                audio_engine.submit(play, priority, actual_sound_type, max_wait=AUDIO_MAX_DELAY)
             
             # Update counts
             self.click_count += 1
             self.daily_click_count += 1
             self.last_click_time = time.time()
             
-            # Add to click history with user info
-            click_record = {
+            # Log the click with user info; the page shows the newest few
+            click_record = event_log.append({
                 'timestamp': self.last_click_time,
+                'type': 'click',
+                'sound_type': actual_sound_type,
                 'total_count': self.click_count,
                 'daily_count': self.daily_click_count,
                 'session_id': session_id,
-                'nickname': nickname
-            }
+                'nickname': nickname,
+                'sound': sound_file,
+                'trace_id': trace.id if trace else None,
+                'trigger_latency_ms': trace.elapsed_ms() if trace else None
+            })
+            count_event('click', self.last_click_time)
             self.click_history.append(click_record)
-            if len(self.click_history) > 10:
-                self.click_history = self.click_history[-10:]
+            if len(self.click_history) > CLICK_HISTORY_SIZE:
+                self.click_history = self.click_history[-CLICK_HISTORY_SIZE:]
             
             print(f"🖱️ Click #{self.click_count} triggered! (Daily: {self.daily_click_count}) by {nickname or 'Anonymous'}")
             
             # Save stats after each click
             self.save_stats()
             
+            # Push the new counts to every open page
+            event_bus.publish('click', {
+                'click_count': self.click_count,
+                'daily_click_count': self.daily_click_count,
+                'last_click_time': self.last_click_time,
+                'entry': click_record
+            })
+            
             # Send OSC message to VRChat if connected
-            self.send_vrchat_trigger(sound_type)
+            self.send_vrchat_trigger(sound_type, trace)
             
         except Exception as e:
             print(f"❌ Audio error: {e}")
             # Emergency fallback - print bell character
             print("\a")  # ASCII bell character
     
-    def send_vrchat_trigger(self, trigger_type="click"):
+    def send_vrchat_trigger(self, trigger_type="click", trace=None):
         """Send OSC message to VRChat to trigger avatar reactions"""
-        if osc_client:
+        if osc_sender:
             try:
                 # Common VRChat avatar parameter paths
                 # These can be customized based on your avatar setup
                 
-                # Trigger a boolean parameter (momentary)
-                osc_client.send_message(f"/avatar/parameters/RemoteClick", True)
-                
-                # Send click count as integer
-                osc_client.send_message(f"/avatar/parameters/ClickCount", self.click_count)
+                # Momentary booleans - set now, reset by the sender's timer wheel
+                pulses = ["/avatar/parameters/RemoteClick"]
                 
                 # Send different trigger types
                 if trigger_type == "click":
-                    osc_client.send_message(f"/avatar/parameters/ClickTrigger", True)
+                    pulses.append("/avatar/parameters/ClickTrigger")
                 elif trigger_type == "special":
-                    osc_client.send_message(f"/avatar/parameters/SpecialTrigger", True)
+                    pulses.append("/avatar/parameters/SpecialTrigger")
                 
-                # Reset the boolean after a short delay
-                def reset_trigger():
-                    time.sleep(0.1)
-                    osc_client.send_message(f"/avatar/parameters/RemoteClick", False)
-                    osc_client.send_message(f"/avatar/parameters/ClickTrigger", False)
-                    osc_client.send_message(f"/avatar/parameters/SpecialTrigger", False)
-                
-                threading.Thread(target=reset_trigger).start()
+                # Click count and triggers go out as one bundle
+                osc_sender.send_event(
+                    values=[("/avatar/parameters/ClickCount", self.click_count)],
+                    pulses=pulses,
+                    pulse_duration=OSC_PULSE_DURATION,
+                    on_sent=(lambda: trace.mark('osc_sent')) if trace else None
+                )
                 print(f"📡 OSC message sent to VRChat: {trigger_type}")
-                self.vrchat_connected = True
+                self.vrchat_connected = osc_sender.ok
                 
             except Exception as e:
                 print(f"❌ OSC send failed: {e}")
@@ -274,23 +603,8 @@ class AudioClicker:
 clicker = AudioClicker()
 
 def load_sessions():
-    """Load session-to-nickname mappings"""
-    try:
-        if os.path.exists(SESSIONS_FILE):
-            with open(SESSIONS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except Exception as e:
-        print(f"⚠️ Could not load sessions: {e}")
-        return {}
-
-def save_sessions(sessions):
-    """Save session-to-nickname mappings"""
-    try:
-        with open(SESSIONS_FILE, 'w') as f:
-            json.dump(sessions, f, indent=2)
-    except Exception as e:
-        print(f"⚠️ Could not save sessions: {e}")
+    """Get the live session registry (update it via set_user_nickname)"""
+    return state.get('sessions')
 
 def get_or_create_session_id():
     """Get existing session ID or create a new one"""
@@ -303,170 +617,69 @@ def get_user_nickname(session_id=None):
     if session_id is None:
         session_id = get_or_create_session_id()
     
-    sessions = load_sessions()
-    return sessions.get(session_id, {}).get('nickname', None)
+    return load_sessions().nickname(session_id)
+
+def get_user_color(session_id):
+    """Get the chat color for a session ID"""
+    return load_sessions().color(session_id)
 
 def set_user_nickname(nickname, session_id=None):
-    """Set nickname for a session ID"""
+    """Set nickname for a session ID and mark it as seen"""
     if session_id is None:
         session_id = get_or_create_session_id()
     
-    sessions = load_sessions()
-    
-    # Assign a color if this is a new user
-    if session_id not in sessions:
-        colors = ['💜', '💙', '💚', '💛', '🧡', '❤️', '💗', '💕']
-        # Use hash of session_id to consistently assign a color
-        color_index = int(hashlib.md5(session_id.encode()).hexdigest(), 16) % len(colors)
-        color = colors[color_index]
-    else:
-        color = sessions[session_id].get('color', '💜')
-    
-    sessions[session_id] = {
-        'nickname': nickname,
-        'color': color,
-        'last_seen': time.time()
-    }
-    save_sessions(sessions)
+    color, changed = load_sessions().touch(session_id, nickname)
+    # Same nickname within the same last_seen interval - nothing to write
+    if changed:
+        state.mark_dirty('sessions')
     return color
 
-def load_rate_limits():
-    """Load rate limiting data"""
-    try:
-        if os.path.exists(RATE_LIMITS_FILE):
-            with open(RATE_LIMITS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except Exception as e:
-        print(f"⚠️ Could not load rate limits: {e}")
-        return {}
-
-def save_rate_limits(limits):
-    """Save rate limiting data"""
-    try:
-        with open(RATE_LIMITS_FILE, 'w') as f:
-            json.dump(limits, f, indent=2)
-    except Exception as e:
-        print(f"⚠️ Could not save rate limits: {e}")
-
 def check_rate_limit(session_id, nickname=None):
     """Check if user is within rate limit. Returns (allowed, wait_time, click_count)"""
-    limits = load_rate_limits()
-    current_time = time.time()
-    
-    # Get user's click history
-    if session_id not in limits:
-        limits[session_id] = {'clicks': []}
-    
-    user_limits = limits[session_id]
-    
-    # Remove clicks older than the rate limit window
-    user_limits['clicks'] = [
-        click_time for click_time in user_limits['clicks']
-        if current_time - click_time < RATE_LIMIT_WINDOW
-    ]
-    
-    click_count = len(user_limits['clicks'])
-    
-    # Check if user exceeded limit
-    if click_count >= MAX_CLICKS_PER_HOUR:
-        # Calculate when they can click again
-        oldest_click = min(user_limits['clicks'])
-        wait_time = int(RATE_LIMIT_WINDOW - (current_time - oldest_click))
-        return False, wait_time, click_count
-    
-    return True, 0, click_count
+    return rate_limiter.check(session_id)
 
 def record_click_for_rate_limit(session_id):
     """Record a click for rate limiting"""
-    limits = load_rate_limits()
-    current_time = time.time()
-    
-    if session_id not in limits:
-        limits[session_id] = {'clicks': []}
-    
-    limits[session_id]['clicks'].append(current_time)
-    save_rate_limits(limits)
+    rate_limiter.record(session_id)
+    state.mark_dirty('rate_limits')
 
 def get_custom_sound_for_user(session_id, sound_type='click'):
     """Get custom sound file for a specific user and sound type"""
-    preferences = load_user_preferences()
-    user_prefs = preferences.get(session_id, {})
-    
-    # Get preference for this sound type (click or bonk)
-    custom_sound = user_prefs.get(f'{sound_type}_sound', None)
-    
-    if custom_sound and os.path.exists(custom_sound):
-        return custom_sound
-    
-    # Fall back to default based on sound type
-    return BONK_SOUND_FILE if sound_type == 'bonk' else SOUND_FILE
+    return sound_resolver.resolve(session_id, sound_type)[0]
 
 def set_custom_sound_for_user(session_id, sound_filename, sound_type='click'):
     """Set custom sound file for a specific user and sound type"""
     # Check in both static/sounds and static/custom_sounds
-    possible_paths = [
-        f"static/sounds/{sound_filename}",
-        f"{CUSTOM_SOUNDS_DIR}/{sound_filename}"
-    ]
-    
-    sound_path = None
-    for path in possible_paths:
-        if os.path.exists(path):
-            sound_path = path
-            break
+    sound_path = sound_library.find(sound_filename)
     
     if sound_path:
-        preferences = load_user_preferences()
-        if session_id not in preferences:
-            preferences[session_id] = {}
-        
-        preferences[session_id][f'{sound_type}_sound'] = sound_path
-        save_user_preferences(preferences)
+        with state.edit('preferences') as preferences:
+            if session_id not in preferences:
+                preferences[session_id] = {}
+            
+            preferences[session_id][f'{sound_type}_sound'] = sound_path
+        sound_resolver.set_override(session_id, sound_type, sound_path)
         return True
     return False
 
 def load_user_preferences():
-    """Load user sound preferences"""
-    try:
-        if os.path.exists(USER_PREFERENCES_FILE):
-            with open(USER_PREFERENCES_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except Exception as e:
-        print(f"⚠️ Could not load user preferences: {e}")
-        return {}
+    """Get the live user sound preferences (mutate via state.edit)"""
+    return state.get('preferences')
 
 def save_user_preferences(preferences):
-    """Save user sound preferences"""
-    try:
-        with open(USER_PREFERENCES_FILE, 'w') as f:
-            json.dump(preferences, f, indent=2)
-    except Exception as e:
-        print(f"⚠️ Could not save user preferences: {e}")
+    """Replace user sound preferences"""
+    state.set('preferences', preferences)
 
 def get_sound_library_info():
     """Get information about the custom sound library"""
-    os.makedirs(CUSTOM_SOUNDS_DIR, exist_ok=True)
-    os.makedirs("static/sounds", exist_ok=True)
-    
-    total_size = 0
-    sound_files = []
-    
-    # Scan both directories
-    for directory in [CUSTOM_SOUNDS_DIR, "static/sounds"]:
-        if os.path.exists(directory):
-            for filename in os.listdir(directory):
-                if filename.endswith(('.wav', '.mp3', '.ogg')):
-                    filepath = os.path.join(directory, filename)
-                    file_size = os.path.getsize(filepath)
-                    total_size += file_size
-                    sound_files.append({
-                        'filename': filename,
-                        'path': filepath,
-                        'size': file_size,
-                        'size_mb': round(file_size / (1024 * 1024), 2)
-                    })
+    entries, _ = sound_library.query()
+    total_size = sum(entry['size'] for entry in entries)
+    sound_files = [{
+        'filename': entry['filename'],
+        'path': entry['path'],
+        'size': entry['size'],
+        'size_mb': round(entry['size'] / (1024 * 1024), 2)
+    } for entry in entries]
     
     return {
         'total_size': total_size,
@@ -476,50 +689,96 @@ def get_sound_library_info():
     }
 
 def convert_mp3_to_wav(mp3_path):
-    """Convert MP3 to WAV format using ffmpeg"""
-    wav_path = mp3_path.rsplit('.', 1)[0] + '_converted.wav'
-    
-    try:
-        print(f"🔄 Converting MP3 to WAV: {mp3_path}")
-        result = subprocess.run(
-            ['ffmpeg', '-i', mp3_path, '-acodec', 'pcm_s16le', '-ar', '44100', '-ac', '2', '-y', wav_path],
-            capture_output=True,
-            timeout=30
-        )
-        if result.returncode == 0 and os.path.exists(wav_path):
-            print(f"✅ Converted to WAV: {wav_path}")
-            return wav_path
-        else:
-            print(f"⚠️ ffmpeg conversion failed: {result.stderr.decode()}")
-    except FileNotFoundError:
-        print("⚠️ ffmpeg not found - MP3 conversion requires ffmpeg")
-    except Exception as e:
-        print(f"⚠️ MP3 conversion error: {e}")
-    
-    return None
+    """Get a WAV version of an MP3, converting with ffmpeg only if it isn't cached yet"""
+    return transcode_cache.get_or_convert(mp3_path, timeout=30)
 
-def play_sound_file(sound_path):
+def play_sound_file(sound_path, trace=None):
     """Play a sound file with MP3 support and fallback to WAV conversion"""
     try:
-        # If MP3, try to convert to WAV first for better compatibility
+        # If MP3, use its converted WAV - converting here would stall the audio engine,
+        # so a missing one is queued for the transcode pool and this play uses pygame.music
         if sound_path.endswith('.mp3'):
-            wav_path = convert_mp3_to_wav(sound_path)
+            wav_path = transcode_cache.lookup(sound_path)
             if wav_path:
                 sound_path = wav_path
+            else:
+                submit_transcode(prepare_mp3, sound_path)
+            if trace:
+                trace.mark('transcode')
         
-        # Try pygame Sound first (best for WAV)
-        if sound_path.endswith('.wav'):
-            pygame.mixer.Sound(sound_path).play()
-            return True
-        
-        # Try pygame music for other formats
-        pygame.mixer.music.load(sound_path)
-        pygame.mixer.music.play()
+        # Try pygame Sound first (best for WAV) - decoded once, then served from cache
+        if sound_path.endswith(('.wav', '.ogg')):
+            sound_cache.get(sound_path).play()
+        else:
+            # Try pygame music for other formats
+            pygame.mixer.music.load(sound_path)
+            pygame.mixer.music.play()
+        if trace:
+            trace.mark('play_started')
         return True
     except Exception as e:
         print(f"⚠️ Sound playback failed for {sound_path}: {e}")
         return False
 
+def play_click_audio(sound_file, sound_type='click', trace=None):
+    """Start a click/bonk sound, falling back to a system beep (runs on the audio engine)"""
+    if os.path.exists(sound_file):
+        # Play sound file with MP3 support
+        if play_sound_file(sound_file, trace):
+            print(f"🎵 Playing {sound_type} sound: {sound_file}")
+        else:
+            # Fallback to system beep
+            try:
+                import winsound
+                winsound.Beep(800, 200)
+                print("🔊 Fallback to system beep")
+            except:
+                print("\a")  # ASCII bell
+    else:
+        # Fall back to system beep
+        try:
+            import winsound
+            winsound.Beep(800, 200)  # frequency, duration
+            print("🔊 Playing system beep")
+        except:
+            print("\a")  # ASCII bell
+
+def prepare_mp3(mp3_path):
+    """Convert an MP3 on the transcode pool, then let the resolver pick up the WAV"""
+    wav_path = convert_mp3_to_wav(mp3_path)
+    if wav_path:
+        sound_resolver.refresh(mp3_path)
+    return wav_path
+
+def playable_sound_path(path):
+    """File the sound cache can play for a library sound, or None if it must be played the slow way.
+    
+    MP3s are only playable once converted - a missing WAV is queued for the
+    transcode pool and picked up by prepare_mp3 when it's done.
+    """
+    if not os.path.exists(path):
+        return None
+    if path.endswith('.mp3'):
+        wav_path = transcode_cache.lookup(path)
+        if not wav_path:
+            submit_transcode(prepare_mp3, path)
+            return None
+        path = wav_path
+    if path.endswith(('.wav', '.ogg')):
+        return path
+    return None
+
+# (session, sound type) -> file to play; decoded Sounds live in sound_cache
+sound_resolver = SoundResolver(playable_sound_path)
+
+def rebuild_sound_resolver():
+    """Compile the default and user-selected sounds into the resolver"""
+    with state.lock:
+        preferences = {sid: dict(user_prefs) for sid, user_prefs in load_user_preferences().items()}
+    ready = sound_resolver.rebuild({'click': SOUND_FILE, 'bonk': BONK_SOUND_FILE}, preferences)
+    loaded = sound_cache.preload(sound_resolver.playable_paths())
+    print(f"🎵 Sound resolver ready: {ready} sound{'s' if ready != 1 else ''}, {loaded} preloaded")
+
 def get_voice_message_path():
     """Find the voice message file regardless of extension"""
     for ext in ['.webm', '.mp4', '.ogg', '.wav']:
@@ -530,6 +789,11 @@ def get_voice_message_path():
 
 def delete_all_voice_messages():
     """Delete all voice message files"""
+    reset_voice_message_state()
+    delete_voice_message_files()
+
+def delete_voice_message_files():
+    """Remove the voice message from disk without touching its state"""
     for ext in ['.webm', '.mp4', '.ogg', '.wav', '_converted.wav']:
         path = os.path.join(VOICE_MESSAGE_DIR, f"{VOICE_MESSAGE_BASE}{ext}")
         if os.path.exists(path):
@@ -539,9 +803,91 @@ def delete_all_voice_messages():
             except Exception as e:
                 print(f"⚠️ Could not delete {path}: {e}")
 
+def publish_voice_message_state():
+    """Tell /events subscribers the voice message state changed"""
+    with voice_message_lock:
+        status = voice_message_state['status']
+        error = voice_message_state['error']
+    event_bus.publish('voice_message', {
+        'exists': status in ('pending', 'ready'),
+        'state': status,
+        'ready': status == 'ready',
+        'error': error
+    })
+
+def reset_voice_message_state():
+    """Forget the prepared voice message; any in-flight transcode becomes stale"""
+    with voice_message_lock:
+        voice_message_state['generation'] += 1
+        voice_message_state.update({'status': 'none', 'path': None, 'sound': None, 'error': None})
+        generation = voice_message_state['generation']
+    publish_voice_message_state()
+    return generation
+
+def prepare_voice_message(voice_path, generation):
+    """Worker job: transcode a voice message and decode it into a ready-to-play Sound"""
+    wav_path = voice_path if voice_path.endswith('.wav') else convert_to_wav(voice_path)
+    sound = None
+    error = None
+    
+    if wav_path:
+        try:
+            sound = pygame.mixer.Sound(wav_path)
+        except Exception as e:
+            error = f'Could not decode voice message: {e}'
+    else:
+        error = 'Conversion failed - install ffmpeg for WebM/MP4/OGG support'
+    
+    with voice_message_lock:
+        # A newer upload or a delete happened meanwhile - drop this result
+        if voice_message_state['generation'] != generation:
+            return
+        if sound is not None:
+            voice_message_state.update({'status': 'ready', 'sound': sound, 'error': None})
+            print(f"✅ Voice message ready to play ({sound.get_length():.1f}s)")
+    if sound is None:
+        discard_voice_message(error, generation)
+        return
+    publish_voice_message_state()
+
+def discard_voice_message(error, generation):
+    """A voice message that can't be played - delete its files and keep the reason"""
+    with voice_message_lock:
+        # Checked under the lock so a stale job never deletes a newer upload
+        if voice_message_state['generation'] != generation:
+            return
+        delete_voice_message_files()
+        voice_message_state.update({'status': 'failed', 'path': None, 'sound': None, 'error': error})
+    print(f"❌ Voice message not playable: {error}")
+    publish_voice_message_state()
+
+def queue_voice_message(voice_path):
+    """Mark a voice message pending and hand it to the transcode pool"""
+    generation = reset_voice_message_state()
+    with voice_message_lock:
+        voice_message_state.update({'status': 'pending', 'path': voice_path})
+    publish_voice_message_state()
+    
+    if submit_transcode(prepare_voice_message, voice_path, generation) is None:
+        discard_voice_message('Transcode queue is full', generation)
+        return False
+    return True
+
+def take_ready_voice_message():
+    """Claim the prepared voice message for playback. Returns (sound, status)."""
+    with voice_message_lock:
+        status = voice_message_state['status']
+        if status != 'ready':
+            return None, status
+        sound = voice_message_state['sound']
+    
+    # The decoded buffer is all we need now - remove the files and reset state
+    delete_all_voice_messages()
+    return sound, status
+
 def convert_to_wav(input_path):
     """
-    Convert audio file to WAV format for pygame compatibility.
+    Convert audio file to WAV in the mixer's native format for pygame compatibility.
     Returns the path to the converted WAV file, or None if conversion fails.
     """
     output_path = os.path.join(VOICE_MESSAGE_DIR, f"{VOICE_MESSAGE_BASE}_converted.wav")
@@ -550,7 +896,8 @@ def convert_to_wav(input_path):
     try:
         print(f"🔄 Converting {input_path} to WAV using ffmpeg...")
         result = subprocess.run(
-            ['ffmpeg', '-i', input_path, '-acodec', 'pcm_s16le', '-ar', '44100', '-ac', '2', '-y', output_path],
+            ['ffmpeg', '-i', input_path, '-acodec', 'pcm_s16le', '-ar', str(_mixer_frequency),
+             '-ac', str(_mixer_channels), '-y', output_path],
             capture_output=True,
             timeout=10
         )
@@ -566,99 +913,139 @@ def convert_to_wav(input_path):
     
     return None
 
-def play_audio_file(file_path):
-    """
-    Play audio file using the best available method.
-    Returns True if successful, False otherwise.
-    """
-    # Try pygame.mixer.music first (supports more formats on some systems)
-    try:
-        pygame.mixer.music.load(file_path)
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            time.sleep(0.1)
-        print(f"✅ Played audio using pygame.mixer.music")
-        return True
-    except Exception as e:
-        print(f"⚠️ pygame.mixer.music failed: {e}")
-    
-    # If webm/mp4, try converting to WAV first
-    if file_path.endswith(('.webm', '.mp4', '.ogg')):
-        converted_path = convert_to_wav(file_path)
-        if converted_path:
-            try:
-                pygame.mixer.Sound(converted_path).play()
-                # Wait for sound to finish
-                while pygame.mixer.get_busy():
-                    time.sleep(0.1)
-                print(f"✅ Played converted WAV file")
-                return True
-            except Exception as e:
-                print(f"⚠️ Failed to play converted WAV: {e}")
-    
-    # Last resort: try Windows winsound (WAV only)
-    if sys.platform == 'win32' and file_path.endswith('.wav'):
-        try:
-            import winsound
-            winsound.PlaySound(file_path, winsound.SND_FILENAME)
-            print(f"✅ Played audio using winsound")
-            return True
-        except Exception as e:
-            print(f"⚠️ winsound failed: {e}")
-    
-    print(f"❌ All playback methods failed for {file_path}")
-    return False
-
 def load_pishock_config():
-    """Load PiShock configuration"""
-    try:
-        if os.path.exists(PISHOCK_CONFIG_FILE):
-            with open(PISHOCK_CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        return {
-            'enabled': False,
-            'username': '',
-            'api_key': '',
-            'sharecode': '',
-            'name': 'PiShock',
-            'intensity': 30,
-            'duration': 1,
-            'operation': 0  # 0=shock, 1=vibrate, 2=beep
-        }
-    except Exception as e:
-        print(f"⚠️ Could not load PiShock config: {e}")
-        return {'enabled': False}
+    """Get the current PiShock configuration"""
+    return state.get('pishock')
 
 def save_pishock_config(config):
     """Save PiShock configuration"""
     try:
-        with open(PISHOCK_CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
+        if not isinstance(config, dict):
+            raise ValueError('PiShock config must be a JSON object')
+        state.set('pishock', config)
         return True
     except Exception as e:
         print(f"⚠️ Could not save PiShock config: {e}")
         return False
 
-def trigger_pishock(operation=None, intensity=None, duration=None):
-    """Trigger PiShock device"""
-    import requests
-    
+# Traces waiting for their PiShock job's API response, by job id
+_pending_pishock_traces = {}
+_pending_pishock_traces_lock = threading.Lock()
+
+def trace_pishock(trace, pishock_job):
+    """Mark when a trigger's PiShock command was queued, and later answered"""
+    if pishock_job is None:
+        return
+    trace.mark('pishock_queued')
+    if pishock_job['status'] in ('pending', 'queued', 'running'):
+        with _pending_pishock_traces_lock:
+            _pending_pishock_traces.setdefault(pishock_job['id'], []).append(trace)
+        job = pishock_client.job(pishock_job['id'])
+        if job and job['status'] in ('succeeded', 'failed', 'rejected'):
+            finish_pishock_traces(job)
+    else:
+        trace.mark('pishock_response')
+
+def finish_pishock_traces(job):
+    with _pending_pishock_traces_lock:
+        traces = _pending_pishock_traces.pop(job['id'], [])
+    for trace in traces:
+        trace.mark('pishock_response')
+
+# Bonk/zap events waiting for their PiShock job to finish, by job id
+_pending_trigger_events = {}
+_pending_trigger_events_lock = threading.Lock()
+
+def log_trigger_event(record, pishock_job=None):
+    """Append a bonk/zap to the event log - once its PiShock command has an outcome"""
+    if pishock_job is None:
+        event_log.append(dict(record, pishock='off'))
+    elif pishock_job['status'] in ('pending', 'queued', 'running'):
+        with _pending_trigger_events_lock:
+            _pending_trigger_events.setdefault(pishock_job['id'], []).append(record)
+        # It may have finished while we were queueing the record
+        job = pishock_client.job(pishock_job['id'])
+        if job and job['status'] in ('succeeded', 'failed', 'rejected'):
+            log_pishock_outcome(job)
+    else:
+        log_pishock_outcome(pishock_job, [record])
+
+def log_pishock_outcome(job, records=None):
+    """Log the bonks/zaps a finished PiShock job was carrying"""
+    if records is None:
+        with _pending_trigger_events_lock:
+            records = _pending_trigger_events.pop(job['id'], [])
+    for record in records:
+        event_log.append(dict(
+            record,
+            pishock=job['status'],
+            pishock_job=job['id'],
+            pishock_latency_ms=job.get('latency_ms'),
+            error=job.get('error')
+        ))
+
+def flush_pending_trigger_events():
+    """Log bonks/zaps whose PiShock job never finished before shutdown"""
+    with _pending_trigger_events_lock:
+        pending = list(_pending_trigger_events.items())
+        _pending_trigger_events.clear()
+    for job_id, records in pending:
+        for record in records:
+            event_log.append(dict(record, pishock='unfinished', pishock_job=job_id))
+
+atexit.register(flush_pending_trigger_events)
+
+def publish_pishock_job(job):
+    """Tell /events subscribers how a queued PiShock command turned out, and log it"""
+    finish_pishock_traces(job)
+    event_bus.publish('pishock', job)
+    log_pishock_outcome(job)
+    if job.get('latency_ms') is not None:
+        pishock_latency.observe(job['latency_ms'] / 1000, job['status'])
+
+# Queued, pooled PiShock API calls - handlers get a job back immediately
+pishock_client = PiShockClient(
+    PISHOCK_API_URL,
+    workers=PISHOCK_WORKERS,
+    queue_size=PISHOCK_QUEUE_LIMIT,
+    timeout=PISHOCK_TIMEOUT,
+    failure_threshold=PISHOCK_FAILURE_THRESHOLD,
+    reset_timeout=PISHOCK_RETRY_AFTER,
+    on_complete=publish_pishock_job
+) if REQUESTS_AVAILABLE else None
+
+def trigger_pishock(operation=None, intensity=None, duration=None, coalesce=True):
+    """Queue a PiShock command. Returns its job (status 'pending', 'queued' or 'rejected'), or None if PiShock is off.
+    
+    With coalesce, the first press goes out at once and presses inside the configured
+    window after it are merged into one follow-up operation.
+    """
     config = load_pishock_config()
     
     if not config.get('enabled'):
         print("⚠️ PiShock is disabled")
-        return False
+        return None
     
     if not all([config.get('username'), config.get('api_key'), config.get('sharecode')]):
         print("❌ PiShock not configured properly")
-        return False
+        return None
+    
+    if pishock_client is None:
+        print("❌ PiShock needs the requests package - pip install requests")
+        return None
     
     # Use provided values or defaults from config
     op = operation if operation is not None else config.get('operation', 0)
     intensity_val = intensity if intensity is not None else config.get('intensity', 30)
     duration_val = duration if duration is not None else config.get('duration', 1)
     
-    # Validate values
+    # Validate values - whole numbers only, as the API (and merging presses) expect
+    try:
+        intensity_val = int(round(float(intensity_val)))
+        duration_val = int(round(float(duration_val)))
+    except (TypeError, ValueError):
+        print(f"❌ Invalid PiShock intensity/duration: {intensity_val!r}, {duration_val!r}")
+        return None
     intensity_val = max(0, min(100, intensity_val))  # Clamp 0-100
     duration_val = max(1, min(15, duration_val))  # Clamp 1-15 seconds
     
@@ -672,35 +1059,41 @@ def trigger_pishock(operation=None, intensity=None, duration=None):
         'Op': str(op)
     }
     
-    try:
-        print(f"⚡ Sending PiShock command: op={op}, intensity={intensity_val}, duration={duration_val}")
-        response = requests.post(PISHOCK_API_URL, json=payload, timeout=5)
-        
-        if response.status_code == 200:
-            print(f"✅ PiShock triggered successfully")
-            return True
-        else:
-            print(f"❌ PiShock API error: {response.status_code} - {response.text}")
-            return False
-    except Exception as e:
-        print(f"❌ PiShock request failed: {e}")
-        return False
+    window = config.get('coalesce_window', PISHOCK_COALESCE_WINDOW) if coalesce else 0
+    policy = config.get('merge_policy', PISHOCK_MERGE_POLICY)
+    if policy not in MERGE_POLICIES:
+        policy = PISHOCK_MERGE_POLICY
+    
+    print(f"⚡ Queueing PiShock command: op={op}, intensity={intensity_val}, duration={duration_val}")
+    job = pishock_client.submit(payload, window=window, policy=policy)
+    if job['status'] == 'rejected':
+        print(f"❌ PiShock command rejected: {job['error']}")
+    return job
+
+def pishock_job_accepted(job):
+    """Whether trigger_pishock actually queued a command"""
+    return job is not None and job['status'] != 'rejected'
 
 @app.route('/')
 def index():
     """Main page with clicker button"""
+    # Set the session cookie up front so the /ws socket can reuse it
+    get_or_create_session_id()
     return render_template('index.html', 
                          click_count=clicker.click_count,
-                         last_click=clicker.last_click_time)
+                         last_click=clicker.last_click_time,
+                         websocket_enabled=websocket_supported(request.environ))
 
-@app.route('/click', methods=['POST'])
-def trigger_click():
-    """API endpoint to trigger a click"""
-    sound_type = request.json.get('sound_type', 'default') if request.is_json else 'default'
+def handle_click(session_id, data, received=None):
+    """Trigger a click for a session. Shared by /click and /ws; returns (payload, status)
+    
+    ``received`` is the perf_counter() time the trigger arrived, where its trace starts.
+    """
+    trace = tracer.start('click', received)
+    sound_type = data.get('sound_type', 'default')
     
     # Get user info
-    session_id = get_or_create_session_id()
-    nickname = request.json.get('nickname') if request.is_json else None
+    nickname = data.get('nickname')
     
     # If nickname provided, update it
     if nickname:
@@ -712,16 +1105,28 @@ def trigger_click():
     allowed, wait_time, click_count = check_rate_limit(session_id, nickname)
     
     if not allowed:
+        rate_limited_counter.inc()
         minutes = wait_time // 60
         seconds = wait_time % 60
         
+        settings = rate_limiter.settings()
+        
         # Cute rate limit messages
-        messages = [
-            f"Whoa there, {nickname or 'friend'}! 💜 You've already rewarded the good boy/girl {click_count} times in the past hour. Give them a break!",
-            f"Easy now, {nickname or 'cutie'}! 💕 {click_count} clicks in an hour is plenty! They need time to rest!",
-            f"Slow down, {nickname or 'sweetheart'}! 🎯 You've clicked {click_count} times already. Let them catch their breath!",
-            f"Hold on, {nickname or 'dear'}! ✨ {click_count} rewards in one hour? They're gonna get spoiled!",
-        ]
+        if settings['algorithm'] == 'token_bucket':
+            # A bucket counts clicks left, not clicks in the past hour
+            messages = [
+                f"Whoa there, {nickname or 'friend'}! 💜 You've used up all {settings['burst']} rewards for now. Give the good boy/girl a break!",
+                f"Easy now, {nickname or 'cutie'}! 💕 Your rewards are all spent! They need time to rest!",
+                f"Slow down, {nickname or 'sweetheart'}! 🎯 {click_count} clicks in a row is plenty. Let them catch their breath!",
+                f"Hold on, {nickname or 'dear'}! ✨ Out of rewards already? They're gonna get spoiled!",
+            ]
+        else:
+            messages = [
+                    f"Whoa there, {nickname or 'friend'}! 💜 You've already rewarded the good boy/girl {click_count} times in the past hour. Give them a break!",
+                f"Easy now, {nickname or 'cutie'}! 💕 {click_count} clicks in an hour is plenty! They need time to rest!",
+                f"Slow down, {nickname or 'sweetheart'}! 🎯 You've clicked {click_count} times already. Let them catch their breath!",
+                f"Hold on, {nickname or 'dear'}! ✨ {click_count} rewards in one hour? They're gonna get spoiled!",
+            ]
         
         import random
         cute_message = random.choice(messages)
@@ -731,89 +1136,50 @@ def trigger_click():
         else:
             wait_str = f"{seconds} second{'s' if seconds != 1 else ''}"
         
-        return jsonify({
+        result = {
             'success': False,
             'rate_limited': True,
             'message': cute_message,
             'wait_time': wait_time,
             'wait_string': wait_str,
             'clicks_in_window': click_count,
-            'max_clicks': MAX_CLICKS_PER_HOUR
-        }), 429
+            'trace_id': trace.id
+        }
+        if settings['algorithm'] == 'token_bucket':
+            result['burst'] = settings['burst']
+            result['refill_per_hour'] = settings['refill_per_window'] * 3600 / settings['window']
+        else:
+            result['max_clicks'] = settings['max_events']
+        return result, 429
     
     # Record this click for rate limiting
     record_click_for_rate_limit(session_id)
     
-    # Check if voice message exists BEFORE playing sounds
-    voice_message_path = get_voice_message_path()
-    voice_message_existed = voice_message_path is not None
-    
-    # Pre-convert voice message if needed (do this BEFORE playing click sound)
-    converted_voice_path = None
-    if voice_message_existed and voice_message_path:
-        # If it's not a WAV, convert it now while we prepare to play
-        if not voice_message_path.endswith('.wav'):
-            print(f"🔄 Pre-converting voice message while click sound plays...")
-            converted_voice_path = convert_to_wav(voice_message_path)
-        else:
-            converted_voice_path = voice_message_path
-    
-    # Play sound and voice message in a separate thread to avoid blocking
-    def play_sounds_and_voice():
-        # Play click sound first (this gives time for conversion to finish)
-        clicker.play_sound(sound_type, session_id, nickname)
-        
-        # If voice message exists, play it on the server
-        if voice_message_existed and (converted_voice_path or voice_message_path):
-            try:
-                # Much shorter delay since conversion is already done
-                time.sleep(0.1)
-                
-                # Use converted file if available, otherwise try original
-                audio_to_play = converted_voice_path if converted_voice_path else voice_message_path
-                print(f"🎤 Playing voice message on server: {audio_to_play}")
-                
-                # Play the audio file
-                success = play_audio_file(audio_to_play)
-                
-                if not success:
-                    print(f"⚠️ Could not play voice message. Format may not be supported.")
-                    print(f"💡 Tip: Install ffmpeg for automatic conversion support")
-                
-                # Delete after playing (or after failed attempt)
-                print(f"🗑️ Deleting voice message files...")
-                delete_all_voice_messages()
-                
-            except Exception as e:
-                print(f"❌ Failed to play voice message: {e}")
-                import traceback
-                traceback.print_exc()
-                # Still try to delete even if playback failed
-                try:
-                    delete_all_voice_messages()
-                except:
-                    pass
+    # Only a voice message that was already transcoded and decoded gets played -
+    # a pending one stays queued for a later click
+    voice_sound, voice_status = take_ready_voice_message()
     
-    threading.Thread(target=play_sounds_and_voice).start()
+    # Count the click and queue its sound (plus the voice message) on the audio engine
+    clicker.play_sound(sound_type, session_id, nickname, voice_sound=voice_sound, trace=trace)
     
-    return jsonify({
+    return {
         'success': True,
         'message': f'Click triggered! Total clicks: {clicker.click_count}',
         'click_count': clicker.click_count,
         'daily_click_count': clicker.daily_click_count,
         'timestamp': time.time(),
-        'voice_message_exists': voice_message_existed
-    })
-
-@app.route('/bonk', methods=['POST'])
-def trigger_bonk():
-    """API endpoint to trigger a bonk (sound + optional PiShock)"""
+        'voice_message_exists': voice_sound is not None,
+        'voice_message_pending': voice_status == 'pending',
+        'trace_id': trace.id
+    }, 200
+
+def handle_bonk(session_id, data, received=None):
+    """Trigger a bonk (sound + optional PiShock). Shared by /bonk and /ws; returns (payload, status)"""
+    trace = tracer.start('bonk', received)
     # Get user info
-    session_id = get_or_create_session_id()
-    nickname = request.json.get('nickname') if request.is_json else None
+    nickname = data.get('nickname')
     
     # Get optional intensity/duration from hold time
-    data = request.json if request.is_json else {}
     intensity = data.get('intensity')  # Optional override
     duration = data.get('duration')    # Optional override
     
@@ -823,10 +1189,14 @@ def trigger_bonk():
         nickname = get_user_nickname(session_id)
     
     # Play bonk sound
+    bonk_path, bonk_playable = sound_resolver.resolve(None, 'bonk')
+    trace.mark('sound_resolved')
+    
     def play_bonk():
         try:
-            if os.path.exists(BONK_SOUND_FILE):
-                pygame.mixer.Sound(BONK_SOUND_FILE).play()
+            if bonk_playable is not None:
+                sound_cache.get(bonk_playable).play()
+                trace.mark('play_started')
                 print(f"💥 BONK sound played by {nickname or 'Anonymous'}")
             else:
                 # Fallback bonk sound (two quick beeps)
@@ -838,37 +1208,55 @@ def trigger_bonk():
         except Exception as e:
             print(f"❌ Bonk sound error: {e}")
     
-    threading.Thread(target=play_bonk).start()
+    audio_engine.submit(play_bonk, PRIORITY_CLICK, 'bonk', max_wait=AUDIO_MAX_DELAY)
+    bonk_time = time.time()
+    count_event('bonk', bonk_time)
     
     # Try to trigger PiShock if enabled (with optional intensity/duration)
-    pishock_triggered = False
+    pishock_job = None
     pishock_config = load_pishock_config()
     
     if pishock_config.get('enabled'):
-        pishock_triggered = trigger_pishock(
+        pishock_job = trigger_pishock(
             operation=pishock_config.get('operation', 0),
             intensity=intensity,
             duration=duration
         )
         
+        trace_pishock(trace, pishock_job)
+        
         if intensity or duration:
             print(f"⚡ Custom bonk: intensity={intensity}, duration={duration}")
     
-    return jsonify({
+    log_trigger_event({
+        'timestamp': bonk_time,
+        'type': 'bonk',
+        'session_id': session_id,
+        'nickname': nickname,
+        'sound': bonk_path,
+        'intensity': intensity,
+        'duration': duration,
+        'trace_id': trace.id,
+        'trigger_latency_ms': trace.elapsed_ms()
+    }, pishock_job)
+    
+    return {
         'success': True,
         'message': 'Bonk triggered!',
-        'pishock_triggered': pishock_triggered,
+        'pishock_triggered': pishock_job_accepted(pishock_job),
+        'pishock_merged': bool(pishock_job and pishock_job['merged']),
+        'pishock_job': pishock_job,
         'intensity': intensity,
         'duration': duration,
-        'timestamp': time.time()
-    })
+        'timestamp': time.time(),
+        'trace_id': trace.id
+    }, 200
 
-@app.route('/zap', methods=['POST'])
-def trigger_zap():
-    """API endpoint for MAX ZAP - preset strong shock"""
+def handle_zap(session_id, data, received=None):
+    """MAX ZAP - preset strong shock. Shared by /zap and /ws; returns (payload, status)"""
+    trace = tracer.start('zap', received)
     # Get user info
-    session_id = get_or_create_session_id()
-    nickname = request.json.get('nickname') if request.is_json else None
+    nickname = data.get('nickname')
     
     if nickname:
         set_user_nickname(nickname, session_id)
@@ -879,39 +1267,160 @@ def trigger_zap():
     pishock_config = load_pishock_config()
     
     if not pishock_config.get('enabled'):
-        return jsonify({
+        return {
             'success': False,
             'message': 'PiShock is not enabled',
             'pishock_triggered': False
-        }), 400
+        }, 400
     
     # Use max zap preset (or allow override from request)
-    data = request.json if request.is_json else {}
     max_intensity = data.get('intensity', pishock_config.get('max_zap_intensity', 70))
     max_duration = data.get('duration', pishock_config.get('max_zap_duration', 3))
     
     print(f"⚡⚡⚡ MAX ZAP triggered by {nickname or 'Anonymous'}: {max_intensity}% for {max_duration}s")
+    zap_time = time.time()
+    count_event('zap', zap_time)
     
     # Trigger PiShock with max settings
-    pishock_triggered = trigger_pishock(
+    pishock_job = trigger_pishock(
         operation=pishock_config.get('operation', 0),
         intensity=max_intensity,
         duration=max_duration
     )
+    trace_pishock(trace, pishock_job)
     
-    return jsonify({
+    log_trigger_event({
+        'timestamp': zap_time,
+        'type': 'zap',
+        'session_id': session_id,
+        'nickname': nickname,
+        'intensity': max_intensity,
+        'duration': max_duration,
+        'trace_id': trace.id,
+        'trigger_latency_ms': trace.elapsed_ms()
+    }, pishock_job)
+    
+    return {
         'success': True,
         'message': 'MAX ZAP triggered!',
-        'pishock_triggered': pishock_triggered,
+        'pishock_triggered': pishock_job_accepted(pishock_job),
+        'pishock_merged': bool(pishock_job and pishock_job['merged']),
+        'pishock_job': pishock_job,
         'intensity': max_intensity,
         'duration': max_duration,
-        'timestamp': time.time()
-    })
+        'timestamp': time.time(),
+        'trace_id': trace.id
+    }, 200
 
-@app.route('/stats')
-def get_stats():
-    """Get clicker statistics"""
-    return jsonify({
+# Conditional GET - each cached endpoint keeps its last serialized body and ETag
+_server_instance_id = secrets.token_hex(4)  # Versions restart at 0, so ETags include the run
+_versioned_responses = {}
+_versioned_responses_lock = threading.Lock()
+
+def versioned_json(name, version, build):
+    """Serve build() as JSON with a strong ETag derived from version.
+    
+    If the client already holds this version it gets a 304 and build() never
+    runs; if another client fetched it first the cached body is reused.
+    """
+    etag = hashlib.md5(repr((_server_instance_id, name, version)).encode()).hexdigest()
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        with _versioned_responses_lock:
+            cached = _versioned_responses.get(name)
+        if cached and cached[0] == etag:
+            body = cached[1]
+        else:
+            body = json.dumps(build(), separators=(',', ':'))
+            with _versioned_responses_lock:
+                _versioned_responses[name] = (etag, body)
+        response = Response(body, mimetype='application/json')
+    
+    response.set_etag(etag)
+    # Let browsers keep the body but always revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def request_data():
+    """JSON body of the current request, or {} when there isn't one"""
+    return (request.json or {}) if request.is_json else {}
+
+@app.route('/click', methods=['POST'])
+def trigger_click():
+    """API endpoint to trigger a click"""
+    payload, status = handle_click(get_or_create_session_id(), request_data(), g.get('metrics_start'))
+    return jsonify(payload), status
+
+@app.route('/bonk', methods=['POST'])
+def trigger_bonk():
+    """API endpoint to trigger a bonk (sound + optional PiShock)"""
+    payload, status = handle_bonk(get_or_create_session_id(), request_data(), g.get('metrics_start'))
+    return jsonify(payload), status
+
+@app.route('/zap', methods=['POST'])
+def trigger_zap():
+    """API endpoint for MAX ZAP - preset strong shock"""
+    payload, status = handle_zap(get_or_create_session_id(), request_data(), g.get('metrics_start'))
+    return jsonify(payload), status
+
+# Trigger actions accepted over the /ws socket
+TRIGGER_HANDLERS = {
+    'click': handle_click,
+    'bonk': handle_bonk,
+    'zap': handle_zap
+}
+
+def websocket_supported(environ):
+    """Whether the server handling this request can hand its socket over to /ws"""
+    return SOCK_AVAILABLE and ('werkzeug.socket' in environ or 'gunicorn.socket' in environ)
+
+if SOCK_AVAILABLE:
+    sock = Sock(app)
+    
+    @sock.route('/ws')
+    def trigger_socket(ws):
+        """Persistent WebSocket for click/bonk/zap - same payloads and results as the HTTP endpoints"""
+        # The page load sets the session cookie; without it we can't tell who is pressing
+        if 'user_id' not in session:
+            ws.close(reason=1008, message='Session required - load the page first')
+            return
+        session_id = session['user_id']
+        
+        while True:
+            raw = ws.receive()
+            if raw is None:
+                break
+            received = time.perf_counter()
+            try:
+                message = json.loads(raw)
+                if not isinstance(message, dict):
+                    raise ValueError('expected a JSON object')
+            except ValueError as e:
+                ws.send(json.dumps({'id': None, 'status': 400, 'result': {'success': False, 'error': f'Invalid message: {e}'}}))
+                continue
+            
+            handler = TRIGGER_HANDLERS.get(message.get('action'))
+            if handler is None:
+                payload, status = {'success': False, 'error': 'Unknown action'}, 400
+            else:
+                try:
+                    payload, status = handler(session_id, message.get('data') or {}, received)
+                except Exception as e:
+                    print(f"❌ WebSocket {message.get('action')} failed: {e}")
+                    payload, status = {'success': False, 'error': str(e)}, 500
+            
+            ws.send(json.dumps({
+                'id': message.get('id'),
+                'action': message.get('action'),
+                'status': status,
+                'result': payload
+            }))
+
+def build_stats_payload():
+    """Clicker statistics as served by /stats and the /events snapshot"""
+    return {
         'click_count': clicker.click_count,
         'daily_click_count': clicker.daily_click_count,
         'current_date': clicker.current_date,
@@ -920,13 +1429,131 @@ def get_stats():
         'sound_file_exists': os.path.exists(SOUND_FILE),
         'sound_file_path': os.path.abspath(SOUND_FILE),
         'vrchat_connected': clicker.vrchat_connected,
-        'osc_enabled': osc_client is not None
+        'osc_enabled': osc_sender is not None,
+        'sound_cache': sound_cache.stats(),
+        'sound_resolver': sound_resolver.stats(),
+        'transcode_cache': transcode_cache.stats(),
+        'audio_engine': audio_engine.stats()
+    }
+
+def stats_version():
+    """Everything /stats reports, reduced to counters and flags"""
+    return (
+        state.version('stats'),
+        clicker.vrchat_connected,
+        osc_sender is not None,
+        SOUND_FILE,
+        os.path.exists(SOUND_FILE),
+        sound_cache.version,
+        sound_resolver.version,
+        transcode_cache.version,
+        audio_engine.version
+    )
+
+@app.route('/stats')
+def get_stats():
+    """Get clicker statistics"""
+    return versioned_json('stats', stats_version(), build_stats_payload)
+
+def osc_stat(key):
+    """One OSC sender counter, or None while OSC is off"""
+    return osc_sender.stats()[key] if osc_sender else None
+
+def pishock_stat(key):
+    return pishock_client.stats()[key] if pishock_client else None
+
+metrics.callback('gauge', 'daily_clicks', 'Clicks so far today', lambda: clicker.daily_click_count)
+metrics.callback('counter', 'osc_datagrams_sent_total', 'OSC datagrams sent to VRChat', lambda: osc_stat('datagrams_sent'))
+metrics.callback('counter', 'osc_bundles_sent_total', 'OSC bundles sent to VRChat', lambda: osc_stat('bundles_sent'))
+metrics.callback('counter', 'osc_errors_total', 'OSC sends that failed', lambda: osc_stat('errors'))
+metrics.callback('counter', 'pishock_calls_total', 'PiShock commands by outcome', lambda: pishock_client and {
+    (outcome,): pishock_stat(outcome) for outcome in ('succeeded', 'failed', 'rejected', 'merged')
+}, ('outcome',))
+metrics.callback('gauge', 'pishock_in_flight', 'PiShock API calls running', lambda: pishock_stat('in_flight'))
+metrics.callback('gauge', 'pishock_circuit_open', '1 while the PiShock circuit breaker is open',
+                 lambda: pishock_client and int(pishock_stat('circuit') == 'open'))
+metrics.callback('gauge', 'audio_queue_depth', 'Sounds waiting on the audio engine', lambda: audio_engine.stats()['depth'])
+metrics.callback('counter', 'audio_dropped_total', 'Sounds dropped or skipped as stale',
+                 lambda: audio_engine.stats()['dropped'] + audio_engine.stats()['expired'])
+metrics.callback('gauge', 'sse_subscribers', 'Open /events streams', lambda: event_bus.stats()['subscribers'])
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus text-format metrics"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+def query_number(name, cast=float):
+    """A numeric query argument, or None when it's absent. Raises ValueError when it isn't a finite number."""
+    raw = request.args.get(name)
+    if raw is None or raw == '':
+        return None
+    value = cast(raw)
+    if not math.isfinite(value):
+        raise ValueError(f'{name} must be finite')
+    return value
+
+@app.route('/stats/history')
+def get_stats_history():
+    """Event counts over time: ?resolution=minute|hour|day, ?from=&to= (unix seconds)"""
+    resolution = request.args.get('resolution', 'hour')
+    if resolution not in RESOLUTIONS:
+        return jsonify({'success': False, 'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+    try:
+        start = query_number('from')
+        end = query_number('to')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'from and to must be unix timestamps'}), 400
+    # Without a range, the newest few buckets
+    max_points = HISTORY_MAX_POINTS if start is not None else HISTORY_DEFAULT_POINTS[resolution]
+    
+    def build():
+        buckets = rollups.series(resolution, start, end, max_points)
+        totals = {}
+        for bucket in buckets:
+            for event_type, count in bucket.items():
+                if event_type != 'start':
+                    totals[event_type] = totals.get(event_type, 0) + count
+        return {
+            'resolution': resolution,
+            'bucket_seconds': RESOLUTIONS[resolution],
+            'from': start,
+            'to': end,
+            'buckets': buckets,
+            'totals': totals,
+            'heatmap': rollups.heatmap()
+        }
+    
+    return versioned_json('stats_history', (state.version('rollups'), resolution, start, end), build)
+
+@app.route('/events')
+def events():
+    """Server-Sent Events stream of clicks, chat messages and voice message changes"""
+    subscriber = event_bus.subscribe()
+    if subscriber is None:
+        # Past the cap, pages fall back to polling
+        return Response('Too many live update streams', status=503, headers={'Retry-After': '30'})
+    snapshot = event_bus.encode('stats', build_stats_payload())
+    
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            yield snapshot
+            while not subscriber.dropped:
+                frame = subscriber.get(timeout=SSE_HEARTBEAT_INTERVAL)
+                # Idle streams get a comment line so proxies and tunnels keep them open
+                yield frame if frame is not None else ': keep-alive\n\n'
+        finally:
+            event_bus.unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 @app.route('/test')
 def test_audio():
     """Test endpoint to verify audio works"""
-    threading.Thread(target=clicker.play_sound).start()
+    clicker.play_sound(priority=PRIORITY_TEST)
     return jsonify({'message': 'Test click triggered!'})
 
 @app.route('/vrchat/click', methods=['POST'])
@@ -934,16 +1561,16 @@ def vrchat_click():
     """VRChat-specific click endpoint with enhanced parameters"""
     data = request.json if request.is_json else {}
     trigger_type = data.get('type', 'click')
-    intensity = data.get('intensity', 1.0)  # 0.0 to 1.0
     
-    # Play sound in a separate thread
-    threading.Thread(target=clicker.play_sound, args=(trigger_type,)).start()
+    # Count the click and queue its sound on the audio engine
+    clicker.play_sound(trigger_type)
     
     # Send additional VRChat parameters if specified
-    if osc_client and data.get('vrchat_params'):
+    if osc_sender and data.get('vrchat_params'):
         try:
-            for param, value in data['vrchat_params'].items():
-                osc_client.send_message(f"/avatar/parameters/{param}", value)
+            osc_sender.send_bundle(
+                (f"/avatar/parameters/{param}", value) for param, value in data['vrchat_params'].items()
+            )
         except Exception as e:
             print(f"❌ VRChat parameter send failed: {e}")
     
@@ -959,20 +1586,20 @@ def vrchat_click():
 def vrchat_status():
     """Get VRChat OSC connection status"""
     return jsonify({
-        'osc_enabled': osc_client is not None,
+        'osc_enabled': osc_sender is not None,
         'vrchat_connected': clicker.vrchat_connected,
         'osc_target': f"{VRCHAT_OSC_IP}:{VRCHAT_OSC_PORT}",
-        'receive_port': OSC_RECEIVE_PORT
+        'receive_port': OSC_RECEIVE_PORT,
+        'sender': osc_sender.stats() if osc_sender else None
     })
 
 @app.route('/vrchat/test-osc')
 def test_osc():
     """Test OSC connection to VRChat"""
-    if osc_client:
+    if osc_sender:
         try:
-            # Send a test parameter
-            osc_client.send_message("/avatar/parameters/OSCTest", True)
-            threading.Thread(target=lambda: (time.sleep(0.5), osc_client.send_message("/avatar/parameters/OSCTest", False))).start()
+            # Send a test parameter, reset half a second later
+            osc_sender.send_event(pulses=["/avatar/parameters/OSCTest"], pulse_duration=0.5)
             return jsonify({'success': True, 'message': 'OSC test message sent!'})
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)})
@@ -1005,28 +1632,17 @@ def settings():
     if request.method == 'POST':
         try:
             settings_data = request.json
-            with open(SETTINGS_FILE, 'w') as f:
-                json.dump(settings_data, f, indent=2)
+            state.set('settings', settings_data)
             return jsonify({'success': True, 'message': 'Settings saved!'})
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)})
     else:
         # Load settings
         try:
-            if os.path.exists(SETTINGS_FILE):
-                with open(SETTINGS_FILE, 'r') as f:
-                    return jsonify(json.load(f))
-            else:
-                # Default settings (for long distance relationships)
-                return jsonify({
-                    'title': 'Good Boy!',
-                    'subtitle': 'Remote Clicker Training 🎯',
-                    'timezones': [
-                        {'name': 'Partner 1', 'offset': 0},
-                        {'name': 'Partner 2', 'offset': 0}
-                    ],
-                    'theme': 'purple'
-                })
+            def build():
+                with state.lock:
+                    return state.get('settings')
+            return versioned_json('settings', state.version('settings'), build)
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)})
 
@@ -1063,11 +1679,16 @@ def upload_voice_message():
         file_size = os.path.getsize(voice_path)
         print(f"✅ Voice message uploaded successfully: {filename} ({file_size} bytes)")
         
+        # Transcode and decode in the background so /click only ever plays a ready buffer
+        if not queue_voice_message(voice_path):
+            return jsonify({'success': False, 'error': 'Server is busy converting audio - try again shortly'}), 503
+        
         return jsonify({
             'success': True, 
             'message': 'Voice message saved!', 
             'size': file_size,
-            'filename': f"{VOICE_MESSAGE_BASE}{ext}"
+            'filename': f"{VOICE_MESSAGE_BASE}{ext}",
+            'state': 'pending'
         })
     except Exception as e:
         print(f"❌ Voice message upload failed: {e}")
@@ -1077,18 +1698,29 @@ def upload_voice_message():
 
 @app.route('/voice-message', methods=['GET'])
 def get_voice_message():
-    """Check if voice message exists"""
+    """Check if voice message exists and whether it is ready to play"""
+    with voice_message_lock:
+        status = voice_message_state['status']
+        error = voice_message_state['error']
+    
     voice_path = get_voice_message_path()
     if voice_path:
         # Return the relative path for the browser
         relative_path = voice_path.replace('\\', '/')
         return jsonify({
             'exists': True,
-            'path': f"/{relative_path}"
+            'path': f"/{relative_path}",
+            'state': status,
+            'ready': status == 'ready',
+            'error': error
         })
+    # A failed upload's files are gone, but the page should still learn why
     return jsonify({
         'exists': False,
-        'path': None
+        'path': None,
+        'state': 'failed' if status == 'failed' else 'none',
+        'ready': False,
+        'error': error if status == 'failed' else None
     })
 
 @app.route('/voice-message', methods=['DELETE'])
@@ -1123,8 +1755,7 @@ def user_nickname():
     else:
         # GET - return current nickname
         nickname = get_user_nickname(session_id)
-        sessions = load_sessions()
-        color = sessions.get(session_id, {}).get('color', '💜')
+        color = get_user_color(session_id)
         
         return jsonify({
             'nickname': nickname,
@@ -1135,23 +1766,38 @@ def user_nickname():
 
 @app.route('/admin/users', methods=['GET'])
 def get_users():
-    """Get list of all users (for admin to assign custom sounds)"""
-    sessions = load_sessions()
-    users = []
+    """Page through users, most recently seen first (for admin to assign custom sounds)
     
-    for session_id, data in sessions.items():
-        users.append({
-            'session_id': session_id,
-            'nickname': data.get('nickname', 'Anonymous'),
-            'color': data.get('color', '💜'),
-            'custom_sound': data.get('custom_sound', None),
-            'last_seen': data.get('last_seen', 0)
-        })
+    Query: limit (default USERS_PAGE_SIZE), cursor (next_cursor from the previous page)
+    and q (nickname prefix).
+    """
+    limit = max(1, min(request.args.get('limit', USERS_PAGE_SIZE, type=int), USERS_PAGE_MAX))
+    cursor = request.args.get('cursor') or None
+    prefix = request.args.get('q', '').strip() or None
+    if cursor:
+        try:
+            SessionRegistry.decode_cursor(cursor)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
     
-    # Sort by last seen (most recent first)
-    users.sort(key=lambda x: x['last_seen'], reverse=True)
+    def build():
+        user_items, next_cursor = load_sessions().page(limit, cursor=cursor, prefix=prefix)
+        preferences = load_user_preferences()
+        
+        users = []
+        for session_id, data in user_items:
+            users.append({
+                'session_id': session_id,
+                'nickname': data.get('nickname', 'Anonymous'),
+                'color': data.get('color', '💜'),
+                'custom_sound': preferences.get(session_id, {}).get('click_sound'),
+                'last_seen': data.get('last_seen', 0)
+            })
+        
+        return {'users': users, 'next_cursor': next_cursor, 'total': len(load_sessions())}
     
-    return jsonify({'users': users})
+    version = (state.version('sessions'), state.version('preferences'), limit, cursor, prefix)
+    return versioned_json('users', version, build)
 
 @app.route('/admin/user/<session_id>/sound', methods=['POST'])
 def set_user_sound(session_id):
@@ -1168,31 +1814,45 @@ def set_user_sound(session_id):
 
 @app.route('/admin/sounds', methods=['GET'])
 def list_sounds():
-    """List available sound files"""
-    sounds_dir = "static/sounds"
-    
-    # Create sounds directory if it doesn't exist
-    os.makedirs(sounds_dir, exist_ok=True)
-    os.makedirs(CUSTOM_SOUNDS_DIR, exist_ok=True)
-    
-    sound_files = []
-    # Scan both directories
-    for directory in [sounds_dir, CUSTOM_SOUNDS_DIR]:
-        if os.path.exists(directory):
-            for filename in os.listdir(directory):
-                if filename.endswith(('.wav', '.mp3', '.ogg')):
-                    filepath = os.path.join(directory, filename)
-                    sound_files.append({
-                        'filename': filename,
-                        'path': filepath,
-                        'size': os.path.getsize(filepath)
-                    })
+    """List available sound files
     
-    return jsonify({
-        'sounds': sound_files,
-        'default_sound': SOUND_FILE,
-        'default_bonk_sound': BONK_SOUND_FILE
-    })
+    Query: q (filename contains), format (wav/mp3/ogg), source (sounds/custom),
+    sort (filename/size/modified), order (asc/desc), offset and limit.
+    """
+    q = request.args.get('q', '').strip() or None
+    fmt = request.args.get('format') or None
+    source = request.args.get('source') or None
+    sort = request.args.get('sort', 'filename')
+    descending = request.args.get('order', 'asc') == 'desc'
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, limit)
+    if sort not in SORT_KEYS or (source and source not in sound_library.directories):
+        return jsonify({'success': False, 'error': 'Invalid sort or source'}), 400
+    
+    def build():
+        sound_files, total = sound_library.query(q, fmt, source, sort, descending, offset, limit)
+        next_offset = offset + len(sound_files)
+        return {
+            'sounds': [{
+                'filename': entry['filename'],
+                'path': entry['path'],
+                'size': entry['size'],
+                'format': entry['format'],
+                'source': entry['source'],
+                'hash': entry['hash']
+            } for entry in sound_files],
+            'total': total,
+            'next_offset': next_offset if next_offset < total else None,
+            'default_sound': SOUND_FILE,
+            'default_bonk_sound': BONK_SOUND_FILE
+        }
+    
+    # The index rescans any directory whose mtime moved, so check it before versioning
+    sound_library.revalidate()
+    version = (sound_library.version, SOUND_FILE, BONK_SOUND_FILE, q, fmt, source, sort, descending, offset, limit)
+    return versioned_json('sounds', version, build)
 
 @app.route('/admin/sounds/library', methods=['GET'])
 def get_sound_library():
@@ -1223,9 +1883,16 @@ def upload_custom_sound():
         save_path = os.path.join(CUSTOM_SOUNDS_DIR, filename)
         sound_file.save(save_path)
         
-        file_size = os.path.getsize(save_path)
+        file_size = sound_library.add(save_path)['size']
         print(f"✅ Sound uploaded: {filename} ({file_size} bytes)")
         
+        # Anyone already using this filename gets the new file
+        sound_resolver.refresh(save_path)
+        
+        # Convert MP3s now so the first click doesn't wait on ffmpeg
+        if filename.endswith('.mp3'):
+            submit_transcode(prepare_mp3, save_path)
+        
         return jsonify({
             'success': True,
             'message': 'Sound uploaded successfully!',
@@ -1245,6 +1912,10 @@ def delete_custom_sound(filename):
             filepath = os.path.join(directory, filename)
             if os.path.exists(filepath):
                 os.remove(filepath)
+                sound_library.remove(filepath)
+                sound_cache.invalidate(filepath)
+                transcode_cache.forget(filepath)
+                sound_resolver.invalidate(filepath)
                 print(f"🗑️ Deleted sound: {filename}")
                 return jsonify({'success': True, 'message': f'Deleted {filename}'})
         
@@ -1287,27 +1958,65 @@ def manage_sound_preferences():
 
 @app.route('/admin/rate-limit', methods=['GET', 'POST'])
 def manage_rate_limit():
-    """Get or update rate limit settings"""
-    global MAX_CLICKS_PER_HOUR, RATE_LIMIT_WINDOW
+    """Get or update rate limit settings and algorithm"""
+    global MAX_CLICKS_PER_HOUR, rate_limiter
     
     if request.method == 'POST':
         try:
-            new_limit = request.json.get('max_clicks_per_hour')
-            if new_limit and isinstance(new_limit, int) and new_limit > 0:
-                MAX_CLICKS_PER_HOUR = new_limit
-                return jsonify({
-                    'success': True,
-                    'max_clicks_per_hour': MAX_CLICKS_PER_HOUR
-                })
-            else:
+            data = request.json or {}
+            new_limit = data.get('max_clicks_per_hour', MAX_CLICKS_PER_HOUR)
+            algorithm = data.get('algorithm', rate_limiter.algorithm)
+            current = rate_limiter.settings()
+            burst = data.get('burst', current.get('burst', RATE_LIMIT_BURST))
+            refill = data.get('refill_per_hour', current.get('refill_per_window', RATE_LIMIT_REFILL_PER_HOUR))
+            
+            if not (isinstance(new_limit, int) and new_limit > 0):
                 return jsonify({'success': False, 'error': 'Invalid rate limit'})
+            if algorithm not in RATE_LIMIT_ALGORITHMS:
+                return jsonify({'success': False, 'error': f"Algorithm must be one of: {', '.join(RATE_LIMIT_ALGORITHMS)}"})
+            if not (isinstance(burst, int) and burst > 0):
+                return jsonify({'success': False, 'error': 'Invalid burst'})
+            if not (isinstance(refill, (int, float)) and refill > 0):
+                return jsonify({'success': False, 'error': 'Invalid refill rate'})
+            
+            MAX_CLICKS_PER_HOUR = new_limit
+            if algorithm == rate_limiter.algorithm:
+                # Same algorithm - retune it in place and keep everyone's history
+                rate_limiter.configure(max_events=new_limit, burst=burst, refill_per_window=refill)
+                state.mark_dirty('rate_limits')
+            else:
+                rate_limiter = create_rate_limiter(
+                    algorithm, new_limit, RATE_LIMIT_WINDOW, burst, refill, RATE_LIMIT_SWEEP_INTERVAL
+                )
+                state.set('rate_limits', rate_limiter)
+                print(f"🚦 Rate limit algorithm switched to {algorithm}")
+            
+            response = {'success': True, 'max_clicks_per_hour': MAX_CLICKS_PER_HOUR}
+            response.update(rate_limit_settings())
+            return jsonify(response)
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)})
     else:
-        return jsonify({
+        response = {
             'max_clicks_per_hour': MAX_CLICKS_PER_HOUR,
-            'window_seconds': RATE_LIMIT_WINDOW
-        })
+            'window_seconds': RATE_LIMIT_WINDOW,
+            'tracked_sessions': rate_limiter.session_count()
+        }
+        response.update(rate_limit_settings())
+        return jsonify(response)
+
+def rate_limit_settings():
+    """Algorithm choice and its tuning, in /admin/rate-limit field names"""
+    settings = rate_limiter.settings()
+    result = {
+        'algorithm': settings['algorithm'],
+        'algorithms': list(RATE_LIMIT_ALGORITHMS)
+    }
+    if 'burst' in settings:
+        result['burst'] = settings['burst']
+    if 'refill_per_window' in settings:
+        result['refill_per_hour'] = settings['refill_per_window'] * 3600 / settings['window']
+    return result
 
 @app.route('/admin/pishock', methods=['GET', 'POST'])
 def manage_pishock():
@@ -1333,15 +2042,68 @@ def test_pishock():
         intensity = data.get('intensity', 30)
         duration = data.get('duration', 1)
         
-        success = trigger_pishock(operation, intensity, duration)
+        job = trigger_pishock(operation, intensity, duration, coalesce=False)
+        if job is None:
+            return jsonify({'success': False, 'error': 'PiShock trigger failed'})
         
-        if success:
-            return jsonify({'success': True, 'message': 'PiShock test successful!'})
+        # The admin wants the outcome, so this one waits for the API
+        job = pishock_client.wait(job['id'], timeout=PISHOCK_TIMEOUT + 1)
+        if job['status'] == 'succeeded':
+            return jsonify({'success': True, 'message': 'PiShock test successful!', 'job': job})
         else:
-            return jsonify({'success': False, 'error': 'PiShock trigger failed'})
+            return jsonify({'success': False, 'error': job['error'] or 'PiShock trigger failed', 'job': job})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/admin/pishock/status')
+def pishock_status():
+    """PiShock client counters: circuit state, queue, latency and errors"""
+    if pishock_client is None:
+        return jsonify({'available': False})
+    return jsonify(dict(pishock_client.stats(), available=True))
+
+@app.route('/admin/events')
+def get_events():
+    """Logged clicks, bonks and zaps in a time range: ?start=&end= (unix seconds), ?type=click,bonk,zap, ?limit="""
+    try:
+        start = query_number('start')
+        end = query_number('end')
+        limit = query_number('limit', int)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'start and end must be unix timestamps and limit a whole number'}), 400
+    limit = EVENTS_PAGE_MAX if limit is None else max(1, min(limit, EVENTS_PAGE_MAX))
+    types = [t for t in request.args.get('type', '').split(',') if t] or None
+    
+    events, next_start = event_log.read(start, end, types, limit)
+    return jsonify({
+        'events': events,
+        'count': len(events),
+        # Ask again with start=next_start for the rest of the range
+        'next_start': next_start,
+        'log': event_log.stats()
+    })
+
+@app.route('/admin/traces')
+def get_traces():
+    """Per-stage trigger latency: p50/p95/p99 in ms since receipt, ?kind=click|bonk|zap, ?recent=N"""
+    kind = request.args.get('kind') or None
+    recent = max(0, min(request.args.get('recent', 20, type=int), TRACE_BUFFER_SIZE))
+    return jsonify({
+        'kind': kind,
+        'stages': tracer.summary(kind),
+        'recent': tracer.recent(recent, kind),
+        'traced': tracer.started,
+        'buffer_size': TRACE_BUFFER_SIZE
+    })
+
+@app.route('/pishock/jobs/<int:job_id>')
+def get_pishock_job(job_id):
+    """Status of a queued PiShock command"""
+    job = pishock_client.job(job_id) if pishock_client else None
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify(job)
+
 @app.route('/admin/sounds/set-default', methods=['POST'])
 def set_default_sounds():
     """Set default click and bonk sounds"""
@@ -1356,12 +2118,14 @@ def set_default_sounds():
             click_path = f"static/sounds/{click_sound}"
             if os.path.exists(click_path):
                 SOUND_FILE = click_path
+                sound_resolver.set_default('click', click_path)
                 print(f"🔊 Default click sound set to: {click_sound}")
         
         if bonk_sound:
             bonk_path = f"static/sounds/{bonk_sound}"
             if os.path.exists(bonk_path):
                 BONK_SOUND_FILE = bonk_path
+                sound_resolver.set_default('bonk', bonk_path)
                 print(f"💥 Default bonk sound set to: {bonk_sound}")
         
         return jsonify({
@@ -1391,48 +2155,60 @@ def chat():
                 color = set_user_nickname(nickname, session_id)
             else:
                 nickname = get_user_nickname(session_id) or 'Anonymous'
-                sessions = load_sessions()
-                color = sessions.get(session_id, {}).get('color', '💜')
+                color = get_user_color(session_id)
             
-            # Load existing messages
-            messages = []
-            if os.path.exists(CHAT_FILE):
-                with open(CHAT_FILE, 'r') as f:
-                    data = json.load(f)
-                    messages = data.get('messages', [])
-            
-            # Add new message with user info
-            messages.append({
+            chat_message = {
                 'message': message_text,
                 'timestamp': time.time(),
                 'session_id': session_id,
                 'nickname': nickname,
                 'color': color
-            })
-            
-            # Keep only last 50 messages
-            messages = messages[-50:]
+            }
             
-            # Save messages
-            with open(CHAT_FILE, 'w') as f:
-                json.dump({'messages': messages}, f, indent=2)
+            # Buffer it (oldest falls out) and append one line to the log
+            chat_message = chat_log.append(chat_message)
+            event_bus.publish('chat', chat_message)
             
-            return jsonify({'success': True})
+            return jsonify({'success': True, 'id': chat_message['id']})
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)})
     else:
-        # GET - return messages
-        try:
-            if os.path.exists(CHAT_FILE):
-                with open(CHAT_FILE, 'r') as f:
-                    data = json.load(f)
-                    # Return last 20 messages
-                    messages = data.get('messages', [])[-20:]
-                    return jsonify({'messages': messages})
-            else:
-                return jsonify({'messages': []})
-        except Exception as e:
-            return jsonify({'messages': []})
+        # GET - ?since=<id> returns only newer messages, otherwise the latest page
+        since = request.args.get('since', type=int)
+        if since is None:
+            return jsonify({'messages': chat_log.latest(CHAT_PAGE_SIZE), 'last_id': chat_log.last_id})
+        
+        messages = chat_log.since(since)
+        if not messages:
+            # Nothing new - empty response, no body to build or send
+            return '', 304
+        return jsonify({'messages': messages, 'last_id': chat_log.last_id})
+
+# Decode the default and user-selected sounds before the first click arrives
+rebuild_sound_resolver()
+
+# A voice message left over from the last run still needs preparing
+if get_voice_message_path():
+    queue_voice_message(get_voice_message_path())
+
+def create_server(host=SERVER_HOST, port=SERVER_PORT):
+    """Production WSGI server for the app; start()/serve_forever() and stop() drain cleanly"""
+    server = WSGIServer(
+        app, host, port,
+        threads=SERVER_THREADS,
+        backlog=SERVER_BACKLOG,
+        timeout=SERVER_TIMEOUT,
+        shutdown_timeout=SERVER_SHUTDOWN_TIMEOUT,
+        engine=SERVER_ENGINE,
+        stream_paths=('/events', '/ws'),
+        max_streams=SERVER_MAX_STREAMS,
+        on_draining=event_bus.disconnect_all,  # SSE streams would otherwise keep the drain waiting
+        on_stopped=state.flush
+    )
+    if server.engine == 'cheroot':
+        # Every stream holds a cheroot worker - leave half of them for ordinary requests
+        event_bus.max_subscribers = min(SERVER_MAX_STREAMS, SERVER_THREADS // 2)
+    return server
 
 if __name__ == '__main__':
     print("🎮 Starting Remote Audio Clicker Server with VRChat OSC Support...")
@@ -1505,5 +2281,5 @@ if __name__ == '__main__':
         
         threading.Thread(target=delayed_tunnel_setup, daemon=True).start()
     
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
+    # Run the Flask app until Ctrl+C, then drain requests and flush state
+    create_server().serve_forever()
\ No newline at end of file
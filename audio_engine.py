@@ -0,0 +1,159 @@
+"""
+Audio playback engine for Remote Audio Clicker
+One thread owns the mixer and works through a bounded priority queue,
+so a burst of presses doesn't turn into a burst of threads.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+# Lower number plays first
+PRIORITY_VOICE = 0
+PRIORITY_CLICK = 1
+PRIORITY_TEST = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_VOICE: 'voice',
+    PRIORITY_CLICK: 'click',
+    PRIORITY_TEST: 'test',
+}
+
+
+class AudioEngine:
+    """Single playback thread fed by a bounded priority queue.
+
+    Jobs are small callables that start a sound (``Sound.play()`` returns
+    immediately and the mixer does the rest). Voice messages run before
+    clicks, clicks before test sounds, and jobs of equal priority run in
+    the order they were submitted.
+
+    Overflow policy: when the queue is full, a new job evicts the newest
+    queued job of the lowest priority if that priority is strictly lower
+    than its own; otherwise the new job is dropped. Jobs submitted with
+    ``max_wait`` are skipped if they waited longer than that - a click
+    sound several seconds late is just noise.
+    """
+
+    def __init__(self, queue_size=32):
+        self.queue_size = queue_size
+        self.lock = threading.Condition()
+        self._heap = []  # (priority, seq, enqueued_at, max_wait, label, job)
+        self._seq = itertools.count()
+        self._thread = None
+        self._stopping = False
+        self.submitted = 0
+        self.played = 0
+        self.dropped = 0
+        self.expired = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.last_wait = 0.0
+        self.max_wait_seen = 0.0
+        self._total_wait = 0.0
+        self.version = 0  # Bumped whenever anything reported by stats() changes
+
+    def start(self):
+        with self.lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='audio-engine', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """Finish what is queued, then stop the thread"""
+        with self.lock:
+            thread = self._thread
+            self._stopping = True
+            self.lock.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self.lock:
+            self._thread = None
+
+    def submit(self, job, priority=PRIORITY_CLICK, label=None, max_wait=None):
+        """Queue a playback job; returns False if the overflow policy dropped it"""
+        entry = (priority, next(self._seq), time.monotonic(), max_wait, label, job)
+        with self.lock:
+            self.submitted += 1
+            self.version += 1
+            if len(self._heap) >= self.queue_size:
+                # The heap's last-sorting entry is the newest job of the lowest priority
+                victim = max(self._heap)
+                if victim[0] <= priority:
+                    self.dropped += 1
+                    print(f"⚠️ Audio queue full - dropped {label or PRIORITY_NAMES.get(priority, priority)}")
+                    return False
+                self._heap.remove(victim)
+                heapq.heapify(self._heap)
+                self.dropped += 1
+                print(f"⚠️ Audio queue full - dropped queued {victim[4] or PRIORITY_NAMES.get(victim[0], victim[0])}")
+            heapq.heappush(self._heap, entry)
+            self.max_depth = max(self.max_depth, len(self._heap))
+            self.lock.notify()
+        return True
+
+    def _next(self):
+        with self.lock:
+            while not self._heap:
+                if self._stopping:
+                    return None
+                self.lock.wait()
+            return heapq.heappop(self._heap)
+
+    def _run(self):
+        while True:
+            entry = self._next()
+            if entry is None:
+                return
+            priority, _, enqueued_at, max_wait, label, job = entry
+            waited = time.monotonic() - enqueued_at
+
+            with self.lock:
+                self.version += 1
+                self.last_wait = waited
+                self.max_wait_seen = max(self.max_wait_seen, waited)
+                self._total_wait += waited
+                if max_wait is not None and waited > max_wait:
+                    self.expired += 1
+                    continue
+
+            try:
+                job()
+                with self.lock:
+                    self.played += 1
+            except Exception as e:
+                print(f"❌ Audio job {label or PRIORITY_NAMES.get(priority, priority)} failed: {e}")
+                with self.lock:
+                    self.failed += 1
+
+    def depth(self):
+        with self.lock:
+            return len(self._heap)
+
+    def stats(self):
+        """Queue depth, outcomes and wait times (milliseconds) for the stats endpoint"""
+        with self.lock:
+            depth_by_priority = {name: 0 for name in PRIORITY_NAMES.values()}
+            for entry in self._heap:
+                name = PRIORITY_NAMES.get(entry[0], str(entry[0]))
+                depth_by_priority[name] = depth_by_priority.get(name, 0) + 1
+            started = self.played + self.failed + self.expired
+            return {
+                'depth': len(self._heap),
+                'depth_by_priority': depth_by_priority,
+                'max_depth': self.max_depth,
+                'queue_size': self.queue_size,
+                'submitted': self.submitted,
+                'played': self.played,
+                'dropped': self.dropped,
+                'expired': self.expired,
+                'failed': self.failed,
+                'wait_ms': {
+                    'last': round(self.last_wait * 1000, 1),
+                    'avg': round(self._total_wait / started * 1000, 1) if started else 0.0,
+                    'max': round(self.max_wait_seen * 1000, 1),
+                },
+            }
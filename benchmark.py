@@ -0,0 +1,430 @@
+"""
+Load test and benchmark harness for Remote Audio Clicker
+Drives the HTTP API at a configurable concurrency, either through Flask's
+test client or against a live local server, and stores throughput,
+latency percentiles, error/429 rates and file I/O per request as JSON so
+runs can be compared across commits.
+
+The app runs in a scratch directory (its JSON files, logs and database
+never touch the real ones), with SDL's dummy audio driver and PiShock
+pointed at pishock_stub.py - nothing is played and no device fires.
+
+Usage:
+    python benchmark.py --mode client --concurrency 8 --requests 2000
+    python benchmark.py --mode live --mix click=5,stats=3 --compare benchmark_results/<earlier run>.json
+"""
+
+import argparse
+import builtins
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from trigger_trace import percentile
+
+# Optional HTTP client - only needed for --mode live
+try:
+    import requests
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmark_results")
+
+# name -> (method, path, JSON body)
+ENDPOINTS = {
+    'click': ('POST', '/click', {'nickname': 'bench'}),
+    'bonk': ('POST', '/bonk', {'nickname': 'bench'}),
+    'zap': ('POST', '/zap', {'nickname': 'bench'}),
+    'chat': ('POST', '/chat', {'message': 'benchmark message', 'nickname': 'bench'}),
+    'chat_read': ('GET', '/chat', None),
+    'stats': ('GET', '/stats', None),
+    'history': ('GET', '/stats/history', None),
+    'admin_users': ('GET', '/admin/users', None),
+    'admin_sounds': ('GET', '/admin/sounds', None),
+    'admin_events': ('GET', '/admin/events?limit=100', None),
+    'admin_traces': ('GET', '/admin/traces', None),
+    'metrics': ('GET', '/metrics', None),
+}
+DEFAULT_MIX = "click=4,bonk=1,zap=1,chat=1,chat_read=2,stats=3,history=1,admin_users=1,admin_sounds=1,admin_events=1,metrics=1"
+
+# File operations counted per request (os.path.exists & co. go through os.stat)
+IO_FUNCTIONS = ((builtins, 'open'), (os, 'open'), (os, 'stat'), (os, 'lstat'), (os, 'listdir'),
+                (os, 'scandir'), (os, 'replace'), (os, 'remove'))
+
+
+def parse_mix(text):
+    """'click=4,stats=2' -> {'click': 4, 'stats': 2}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        try:
+            mix[name] = int(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight for '{name}' must be an integer")
+    return mix
+
+
+class IOCounter:
+    """Counts file operations, attributed to the route of the request doing them.
+
+    Works for both modes because the live server runs in this process too;
+    anything outside a request (state flusher, audio engine, log
+    maintenance) is counted as 'background'.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}  # 'METHOD /rule' -> {operation: count}
+        self._originals = []
+
+    def _key(self):
+        from flask import has_request_context, request
+        if has_request_context():
+            rule = request.url_rule.rule if request.url_rule else 'unmatched'
+            return f"{request.method} {rule}"
+        return 'background'
+
+    def install(self):
+        for module, name in IO_FUNCTIONS:
+            original = getattr(module, name)
+            self._originals.append((module, name, original))
+
+            def counted(*args, _original=original, _name=name, **kwargs):
+                key = self._key()
+                with self.lock:
+                    ops = self.counts.setdefault(key, {})
+                    ops[_name] = ops.get(_name, 0) + 1
+                return _original(*args, **kwargs)
+
+            setattr(module, name, counted)
+
+    def uninstall(self):
+        for module, name, original in self._originals:
+            setattr(module, name, original)
+        self._originals = []
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+
+    def snapshot(self):
+        with self.lock:
+            return {key: dict(ops) for key, ops in self.counts.items()}
+
+
+def prepare_workdir(workdir):
+    """Scratch copy of the sounds the app plays; becomes the working directory"""
+    os.makedirs(workdir, exist_ok=True)
+    shutil.copytree(os.path.join(REPO_DIR, "static"), os.path.join(workdir, "static"), dirs_exist_ok=True)
+    os.chdir(workdir)
+
+
+def start_pishock_stub(latency):
+    """Serve pishock_stub on a free local port; returns (server, api_url)"""
+    from werkzeug.serving import make_server
+    from pishock_stub import create_stub_app
+    server = make_server('127.0.0.1', 0, create_stub_app(latency=latency), threaded=True)
+    threading.Thread(target=server.serve_forever, name='pishock-stub', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/api/apioperate"
+
+
+def load_app(args, stub_url):
+    """Import app.py inside the scratch directory and point it at the stub"""
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')  # pygame.mixer without a sound card
+    sys.path.insert(0, REPO_DIR)
+    import app as clicker_app
+
+    if clicker_app.pishock_client is not None:
+        clicker_app.pishock_client.api_url = stub_url
+    clicker_app.save_pishock_config(dict(
+        clicker_app.load_pishock_config(),
+        enabled=True, username='bench', api_key='bench', sharecode='bench'
+    ))
+    if args.rate_limit is not None:
+        clicker_app.app.test_client().post('/admin/rate-limit', json={
+            'max_clicks_per_hour': args.rate_limit, 'burst': args.rate_limit, 'refill_per_hour': args.rate_limit
+        })
+    return clicker_app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def make_client_senders(clicker_app, concurrency):
+    """One Flask test client (with its own session cookie) per worker"""
+    def sender_for(_):
+        client = clicker_app.app.test_client()
+
+        def send(method, path, body):
+            response = client.open(path, method=method, json=body)
+            response.close()
+            return response.status_code
+        return send
+    return [sender_for(i) for i in range(concurrency)]
+
+
+def make_live_senders(base_url, concurrency, timeout):
+    """One keep-alive HTTP session (with its own session cookie) per worker"""
+    def sender_for(_):
+        http = requests.Session()
+
+        def send(method, path, body):
+            return http.request(method, base_url + path, json=body, timeout=timeout).status_code
+        return send
+    return [sender_for(i) for i in range(concurrency)]
+
+
+def run_load(senders, plan):
+    """Send every request in plan across the senders; returns ([(name, status, seconds)], wall seconds)"""
+    results = []
+    results_lock = threading.Lock()
+    position = itertools.count()
+
+    def worker(send):
+        local = []
+        while True:
+            i = next(position)
+            if i >= len(plan):
+                break
+            name = plan[i]
+            method, path, body = ENDPOINTS[name]
+            start = time.perf_counter()
+            try:
+                status = send(method, path, body)
+            except Exception:
+                status = None  # Connection error or handler crash
+            local.append((name, status, time.perf_counter() - start))
+        with results_lock:
+            results.extend(local)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(senders), thread_name_prefix='bench') as pool:
+        for send in senders:
+            pool.submit(worker, send)
+    return results, time.perf_counter() - wall_start
+
+
+def summarize(results, wall, io_counts):
+    """Per-endpoint and overall throughput, latency percentiles, error/429 rates and I/O per request"""
+    def stats_for(rows):
+        latencies = sorted(seconds * 1000 for _, _, seconds in rows)
+        statuses = {}
+        for _, status, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(1 for _, status, _ in rows if status is None or status >= 500)
+        limited = statuses.get('429', 0)
+        count = len(rows)
+        return {
+            'requests': count,
+            'throughput_rps': round(count / wall, 1) if wall else None,
+            'error_rate': round(errors / count, 4) if count else 0.0,
+            'rate_limited_rate': round(limited / count, 4) if count else 0.0,
+            'statuses': statuses,
+            'latency_ms': {
+                'mean': round(sum(latencies) / count, 3) if count else None,
+                'p50': percentile(latencies, 0.50),
+                'p90': percentile(latencies, 0.90),
+                'p95': percentile(latencies, 0.95),
+                'p99': percentile(latencies, 0.99),
+                'max': latencies[-1] if latencies else None,
+            },
+        }
+
+    endpoints = {}
+    for name in sorted({name for name, _, _ in results}):
+        rows = [row for row in results if row[0] == name]
+        endpoints[name] = stats_for(rows)
+
+    # I/O is counted per route, which two endpoints can share (GET and POST /chat differ by method)
+    route_requests = {}
+    for name, summary in endpoints.items():
+        method, path, _ = ENDPOINTS[name]
+        key = f"{method} {path.split('?')[0]}"
+        route_requests[key] = route_requests.get(key, 0) + summary['requests']
+    for name, summary in endpoints.items():
+        method, path, _ = ENDPOINTS[name]
+        key = f"{method} {path.split('?')[0]}"
+        ops = io_counts.get(key, {})
+        summary['io_per_request'] = {op: round(n / route_requests[key], 2) for op, n in sorted(ops.items())}
+        summary['io_per_request']['total'] = round(sum(ops.values()) / route_requests[key], 2)
+
+    overall = stats_for(results)
+    background = io_counts.get('background', {})
+    overall['background_io'] = dict(sorted(background.items()))
+    return overall, endpoints
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+    try:
+        return {'commit': git('rev-parse', '--short', 'HEAD') or None, 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+    except (OSError, subprocess.SubprocessError):
+        return {'commit': None, 'dirty': None}
+
+
+def print_report(report):
+    print(f"\n📊 {report['config']['mode']} mode, concurrency {report['config']['concurrency']}, "
+          f"{report['overall']['requests']} requests in {report['wall_seconds']:.2f}s")
+    print(f"{'endpoint':<14}{'req':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err%':>7}{'429%':>7}{'io/req':>8}")
+    rows = list(report['endpoints'].items()) + [('overall', report['overall'])]
+    for name, s in rows:
+        lat = s['latency_ms']
+        io = s.get('io_per_request', {}).get('total', '')
+        print(f"{name:<14}{s['requests']:>7}{s['throughput_rps']:>9}{lat['p50'] or 0:>9.2f}{lat['p95'] or 0:>9.2f}"
+              f"{lat['p99'] or 0:>9.2f}{s['error_rate'] * 100:>7.1f}{s['rate_limited_rate'] * 100:>7.1f}{io:>8}")
+
+
+def print_comparison(report, baseline_path):
+    """Throughput and latency change per endpoint against an earlier results file"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+
+    def change(new, old):
+        if not old or new is None:
+            return '   n/a'
+        return f"{(new - old) / old * 100:+6.1f}%"
+
+    print(f"\n🔁 Compared with {os.path.basename(baseline_path)} (commit {baseline['meta'].get('commit')})")
+    differing = [key for key in ('mode', 'concurrency', 'mix', 'rate_limit', 'count_io')
+                 if report['config'].get(key) != baseline['config'].get(key)]
+    if differing:
+        print(f"⚠️ Runs differ in {', '.join(differing)} - changes are not like for like")
+    print(f"{'endpoint':<14}{'rps':>9}{'p50':>9}{'p99':>9}")
+    rows = list(report['endpoints'].items()) + [('overall', report['overall'])]
+    for name, s in rows:
+        old = baseline['overall'] if name == 'overall' else baseline['endpoints'].get(name)
+        if old is None:
+            continue
+        print(f"{name:<14}{change(s['throughput_rps'], old['throughput_rps']):>9}"
+              f"{change(s['latency_ms']['p50'], old['latency_ms']['p50']):>9}"
+              f"{change(s['latency_ms']['p99'], old['latency_ms']['p99']):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test and benchmark the Remote Audio Clicker HTTP API')
+    parser.add_argument('--mode', choices=('client', 'live'), default='client',
+                        help='client: Flask test client in-process; live: real HTTP against a local server')
+    parser.add_argument('--concurrency', type=int, default=8, help='parallel workers (one session each)')
+    parser.add_argument('--requests', type=int, default=2000, help='requests to send (after warmup)')
+    parser.add_argument('--warmup', type=int, default=100, help='requests sent first and not measured')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'endpoint weights, e.g. click=4,stats=2 (endpoints: {", ".join(ENDPOINTS)})')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the request order')
+    parser.add_argument('--rate-limit', type=int, default=None, help='clicks per hour per session (default: app setting)')
+    parser.add_argument('--stub-latency', type=float, default=0.05, help='seconds the PiShock stub takes per call')
+    parser.add_argument('--engine', choices=('auto', 'cheroot', 'werkzeug'), default=None, help='server engine for --mode live')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds per live request')
+    parser.add_argument('--no-io', action='store_true', help="don't count file I/O (removes its small overhead)")
+    parser.add_argument('--workdir', default=None, help='scratch directory for the app (default: a new temp dir)')
+    parser.add_argument('--output', default=None, help='results file (default: benchmark_results/<time>-<commit>.json)')
+    parser.add_argument('--compare', default=None, help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    if args.mode == 'live' and not REQUESTS_AVAILABLE:
+        parser.error("--mode live needs requests - pip install requests")
+
+    revision = git_revision()
+    # The app runs in the scratch directory, so resolve the caller's paths first
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='clicker-bench-'))
+    prepare_workdir(workdir)
+    print(f"🧪 Benchmark working directory: {workdir}")
+
+    stub, stub_url = start_pishock_stub(args.stub_latency)
+    clicker_app = load_app(args, stub_url)
+
+    server = None
+    if args.mode == 'live':
+        if args.engine:
+            clicker_app.SERVER_ENGINE = args.engine
+        port = free_port()
+        server = clicker_app.create_server('127.0.0.1', port)
+        server.start()
+        senders = make_live_senders(f"http://127.0.0.1:{port}", args.concurrency, args.timeout)
+    else:
+        senders = make_client_senders(clicker_app, args.concurrency)
+
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    rng = random.Random(args.seed)
+    warmup_plan = rng.choices(names, weights, k=args.warmup)
+    plan = rng.choices(names, weights, k=args.requests)
+
+    io_counter = None if args.no_io else IOCounter()
+    try:
+        run_load(senders, warmup_plan)
+        if io_counter:
+            io_counter.install()
+        results, wall = run_load(senders, plan)
+    finally:
+        if io_counter:
+            io_counter.uninstall()
+        if server is not None:
+            server.stop()
+        # The stub keeps serving until exit so PiShock calls still in flight complete
+
+    overall, endpoints = summarize(results, wall, io_counter.snapshot() if io_counter else {})
+    report = {
+        'meta': {
+            **revision,
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'server_engine': server.engine if server is not None else None,
+            'state_backend': clicker_app.STATE_BACKEND,
+        },
+        'config': {
+            'mode': args.mode,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'mix': args.mix,
+            'seed': args.seed,
+            'rate_limit': args.rate_limit,
+            'stub_latency': args.stub_latency,
+            'count_io': io_counter is not None,
+        },
+        'wall_seconds': round(wall, 3),
+        'overall': overall,
+        'endpoints': endpoints,
+        'app': {
+            'audio_engine': clicker_app.audio_engine.stats(),
+            'pishock': clicker_app.pishock_client.stats() if clicker_app.pishock_client else None,
+            'trace_stages': clicker_app.tracer.summary(),
+        },
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{revision['commit'] or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    if args.compare:
+        print_comparison(report, args.compare)
+    print(f"\n💾 Results saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
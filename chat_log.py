@@ -0,0 +1,111 @@
+"""
+Chat storage for Remote Audio Clicker
+Recent messages live in a fixed-size ring buffer with increasing IDs;
+the file on disk is an append-only JSON Lines log.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+
+from state_store import atomic_write_text
+
+
+class ChatLog:
+    """Ring buffer of the last ``capacity`` chat messages.
+
+    Every message gets a monotonically increasing ``id`` so clients can ask
+    for just what they haven't seen yet. Posting appends one line to the
+    log file. When the log reaches ``compact_factor`` times the buffer size,
+    it is rewritten to hold only the buffered messages.
+    """
+
+    def __init__(self, path, capacity=50, compact_factor=4, legacy_path=None):
+        self.path = path
+        self.capacity = capacity
+        self.compact_factor = compact_factor
+        self.lock = threading.Lock()
+        self._messages = deque(maxlen=capacity)
+        self._last_id = 0
+        self._log_lines = 0
+        self._file = None
+        self._load(legacy_path)
+
+    def _load(self, legacy_path):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        message = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash - skip it
+                        continue
+                    self._messages.append(message)
+                    self._last_id = max(self._last_id, message.get('id', 0))
+                    self._log_lines += 1
+        elif legacy_path and os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    legacy = json.load(f).get('messages', [])
+                for message in legacy[-self.capacity:]:
+                    self._last_id += 1
+                    self._messages.append(dict(message, id=self._last_id))
+                self._compact_locked()
+                print(f"💬 Migrated {len(self._messages)} chat messages to {self.path}")
+            except Exception as e:
+                print(f"⚠️ Could not migrate chat messages: {e}")
+
+    def _compact_locked(self):
+        self._close_locked()
+        text = ''.join(json.dumps(m, separators=(',', ':')) + '\n' for m in self._messages)
+        atomic_write_text(self.path, text)
+        self._log_lines = len(self._messages)
+
+    def _close_locked(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def append(self, message):
+        """Assign the next id, buffer the message and append it to the log"""
+        with self.lock:
+            self._last_id += 1
+            message = dict(message, id=self._last_id)
+            self._messages.append(message)
+            try:
+                if self._log_lines >= self.capacity * self.compact_factor:
+                    self._compact_locked()
+                else:
+                    if self._file is None:
+                        self._file = open(self.path, 'a', encoding='utf-8')
+                    self._file.write(json.dumps(message, separators=(',', ':')) + '\n')
+                    self._file.flush()
+                    self._log_lines += 1
+            except Exception as e:
+                print(f"⚠️ Could not append chat message: {e}")
+                self._close_locked()
+            return message
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def since(self, message_id):
+        """Buffered messages with an id greater than message_id"""
+        with self.lock:
+            if message_id >= self._last_id:
+                return []
+            return [m for m in self._messages if m['id'] > message_id]
+
+    def latest(self, count):
+        """The newest ``count`` messages, oldest first"""
+        with self.lock:
+            return list(self._messages)[-count:]
+
+    def close(self):
+        with self.lock:
+            self._close_locked()
@@ -0,0 +1,109 @@
+"""
+In-process pub/sub for Remote Audio Clicker
+Feeds the /events Server-Sent Events stream so open pages get pushed
+updates instead of polling.
+"""
+
+import itertools
+import json
+import queue
+import threading
+
+
+class Subscriber:
+    """One listener with its own bounded queue of encoded events"""
+
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def get(self, timeout):
+        """Next encoded event, or None if nothing arrived within timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Fan events out to every subscriber without ever blocking the publisher.
+
+    Each event is encoded as an SSE frame once and the same string is queued
+    for every subscriber. A subscriber whose queue is full is too slow to
+    keep up - it is dropped and its stream ends, and the browser reconnects
+    and starts again from a fresh snapshot. With ``max_subscribers`` set,
+    ``subscribe`` refuses new listeners (returns None) once that many are open.
+    """
+
+    def __init__(self, queue_size=100, max_subscribers=None):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def subscribe(self):
+        """A new Subscriber, or None if max_subscribers are already listening"""
+        subscriber = Subscriber(self.queue_size)
+        with self.lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self._subscribers.discard(subscriber)
+
+    def disconnect_all(self):
+        """End every open stream, e.g. so a server shutdown doesn't wait on them"""
+        with self.lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscriber in subscribers:
+            subscriber.dropped = True
+            try:
+                # Wake a stream that's waiting for its next event
+                subscriber.queue.put_nowait(None)
+            except queue.Full:
+                pass
+        return len(subscribers)
+
+    def encode(self, event, data):
+        """Format one SSE frame"""
+        return f"id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def publish(self, event, data):
+        """Queue an event for every subscriber; returns how many received it"""
+        with self.lock:
+            if not self._subscribers:
+                return 0
+            subscribers = list(self._subscribers)
+        frame = self.encode(event, data)
+
+        delivered = 0
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(frame)
+                delivered += 1
+            except queue.Full:
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+                with self.lock:
+                    self.dropped += 1
+        with self.lock:
+            self.published += 1
+        return delivered
+
+    def stats(self):
+        with self.lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,341 @@
+"""
+Click event log for Remote Audio Clicker
+Every click, bonk and zap is appended as one JSON line to a segment file;
+segments rotate by size, are gzipped once old and deleted after retention.
+"""
+
+import bisect
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+
+SEGMENT_PREFIX = 'events-'
+
+
+def _segment_name(start_ms, compacted=False):
+    return f"{SEGMENT_PREFIX}{start_ms:013d}.jsonl" + ('.gz' if compacted else '')
+
+
+def _parse_segment_name(filename):
+    """(start_ms, compacted) for a segment file name, or None"""
+    if not filename.startswith(SEGMENT_PREFIX):
+        return None
+    stem = filename[len(SEGMENT_PREFIX):]
+    compacted = stem.endswith('.jsonl.gz')
+    stem = stem[:-len('.jsonl.gz')] if compacted else stem[:-len('.jsonl')] if stem.endswith('.jsonl') else None
+    if not stem or not stem.isdigit():
+        return None
+    return int(stem), compacted
+
+
+class EventLog:
+    """Append-only, segmented JSON Lines log of timestamped events.
+
+    Records are appended to the newest segment, which is sealed once it
+    reaches ``segment_bytes`` and a new one named after its first event's
+    timestamp is started - so the segment list is itself a time index.
+    Inside a segment every ``index_every``-th record's byte offset is kept,
+    so ``read`` seeks close to the start of a time range instead of
+    scanning. Reads copy the segment list under the lock and open the
+    files without it, so a long query never holds up ``append``. Sealed
+    segments older than ``compact_after`` seconds are gzipped (read
+    sequentially from then on); segments older than ``retention`` seconds
+    are deleted. Maintenance runs on a background thread at most every
+    ``maintenance_interval`` seconds.
+    """
+
+    def __init__(self, directory, segment_bytes=4 * 1024 * 1024, retention=90 * 24 * 3600,
+                 compact_after=7 * 24 * 3600, index_every=64, maintenance_interval=3600):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retention = retention
+        self.compact_after = compact_after
+        self.index_every = index_every
+        self.maintenance_interval = maintenance_interval
+        self.lock = threading.Lock()
+        self._segments = []  # sorted [start_ms, path, compacted]
+        self._indexes = {}  # path -> ([timestamps], [offsets]) for uncompressed segments
+        self._file = None
+        self._size = 0
+        self._count = 0  # records in the active segment
+        self._last_ts = 0.0
+        self._last_maintenance = 0.0
+        self._maintaining = False
+        self.appended = 0
+        self.compacted = 0
+        self.deleted = 0
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for filename in os.listdir(self.directory):
+            parsed = _parse_segment_name(filename)
+            if parsed:
+                self._segments.append([parsed[0], os.path.join(self.directory, filename), parsed[1]])
+        self._segments.sort()
+        self.maintain()
+
+    # Writing
+
+    def _open_active_locked(self, ts, rotate=False):
+        """Make sure the newest segment is open for appending, starting one at ts if needed"""
+        if self._file is not None:
+            return
+        if not rotate and self._segments and not self._segments[-1][2]:
+            path = self._segments[-1][1]
+            timestamps, offsets = self._index_locked(path)
+            self._count = len(timestamps) * self.index_every  # approximate is fine for indexing
+            self._last_ts = timestamps[-1] if timestamps else 0.0
+            self._file = open(path, 'ab')
+            self._size = self._file.tell()
+            if self._size and not self._ends_with_newline(path):
+                # A torn final line from a crash - don't glue the next record onto it
+                self._file.write(b'\n')
+                self._size += 1
+            return
+
+        start_ms = int(ts * 1000)
+        if self._segments and start_ms <= self._segments[-1][0]:
+            start_ms = self._segments[-1][0] + 1  # Keep names unique and ordered
+        path = os.path.join(self.directory, _segment_name(start_ms))
+        self._segments.append([start_ms, path, False])
+        self._indexes[path] = ([], [])
+        self._file = open(path, 'ab')
+        self._size = 0
+        self._count = 0
+
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _seal_locked(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, record):
+        """Append one event (a dict with a 'timestamp'); None values are left out"""
+        record = {key: value for key, value in record.items() if value is not None}
+        ts = record.setdefault('timestamp', time.time())
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        with self.lock:
+            try:
+                rotate = self._file is not None and self._size and self._size + len(line) > self.segment_bytes
+                if rotate:
+                    self._seal_locked()
+                self._open_active_locked(ts, rotate)
+                # The index must stay sorted even if the clock steps back
+                self._last_ts = max(self._last_ts, ts)
+                if self._count % self.index_every == 0:
+                    timestamps, offsets = self._indexes.setdefault(self._segments[-1][1], ([], []))
+                    timestamps.append(self._last_ts)
+                    offsets.append(self._size)
+                self._file.write(line)
+                self._file.flush()
+                self._size += len(line)
+                self._count += 1
+                self.appended += 1
+            except Exception as e:
+                print(f"⚠️ Could not append event: {e}")
+                self._seal_locked()
+        self._maybe_maintain()
+        return record
+
+    # Reading
+
+    @staticmethod
+    def _build_index(path, index_every):
+        """Sparse (timestamps, offsets) index of an uncompressed segment"""
+        timestamps, offsets = [], []
+        last_ts = 0.0
+        offset = 0
+        count = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    last_ts = max(last_ts, json.loads(line)['timestamp'])
+                except (ValueError, KeyError, TypeError):
+                    offset += len(line)
+                    continue
+                if count % index_every == 0:
+                    timestamps.append(last_ts)
+                    offsets.append(offset)
+                offset += len(line)
+                count += 1
+        return timestamps, offsets
+
+    def _index_locked(self, path):
+        """Index of an uncompressed segment, built on first use"""
+        index = self._indexes.get(path)
+        if index is None:
+            index = self._indexes[path] = self._build_index(path, self.index_every)
+        return index
+
+    def _snapshot_segments(self, start=None, end=None):
+        """What reading [start, end) needs, copied under the lock so files are read without it.
+
+        Sealed segments never change; the active one is read only up to
+        its current size. Each item is (start_ms, path, compacted, index, size limit).
+        """
+        with self.lock:
+            if self._file is not None:
+                self._file.flush()
+            active = self._segments[-1][1] if self._file is not None else None
+            selected = []
+            for start_ms, path, compacted in self._segments_for_locked(start, end):
+                index = self._indexes.get(path)
+                if index is not None:
+                    index = (list(index[0]), list(index[1]))
+                selected.append((start_ms, path, compacted, index, self._size if path == active else None))
+        return selected
+
+    def _iter_segment(self, segment, start=None):
+        """Records of one snapshotted segment in order, seeking near start when possible"""
+        start_ms, path, compacted, index, limit = segment
+        try:
+            if not compacted and start is not None and index is None:
+                index = self._build_index(path, self.index_every)
+                with self.lock:
+                    if any(s[1] == path for s in self._segments):
+                        self._indexes.setdefault(path, index)
+            f = gzip.open(path, 'rb') if compacted else open(path, 'rb')
+        except FileNotFoundError:
+            if compacted:
+                return  # Deleted by retention meanwhile
+            # Compacted meanwhile - same records, now gzipped
+            compacted = True
+            try:
+                f = gzip.open(os.path.join(self.directory, _segment_name(start_ms, compacted=True)), 'rb')
+            except FileNotFoundError:
+                return
+        with f:
+            consumed = 0
+            if not compacted and start is not None:
+                i = bisect.bisect_left(index[0], start) - 1
+                if i >= 0:
+                    f.seek(index[1][i])
+                    consumed = index[1][i]
+            for line in f:
+                consumed += len(line)
+                if limit is not None and consumed > limit:
+                    break  # Appended after the snapshot
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # Torn line
+
+    def _segments_for_locked(self, start, end):
+        """Segments that may hold events in [start, end)"""
+        selected = []
+        for i, segment in enumerate(self._segments):
+            next_start = self._segments[i + 1][0] / 1000 if i + 1 < len(self._segments) else None
+            if start is not None and next_start is not None and next_start <= start:
+                continue
+            if end is not None and segment[0] / 1000 >= end:
+                break
+            selected.append(segment)
+        return selected
+
+    def read(self, start=None, end=None, types=None, limit=1000):
+        """Events with start <= timestamp < end, oldest first.
+
+        Returns (events, next_start): next_start is the timestamp of the first
+        event left out by ``limit`` (read again from there), or None.
+        """
+        events = []
+        for segment in self._snapshot_segments(start, end):
+            for record in self._iter_segment(segment, start):
+                ts = record.get('timestamp', 0)
+                if start is not None and ts < start:
+                    continue
+                if end is not None and ts >= end:
+                    break
+                if types and record.get('type') not in types:
+                    continue
+                if len(events) >= limit:
+                    return events, ts
+                events.append(record)
+        return events, None
+
+    def tail(self, count, types=None):
+        """The newest ``count`` events (optionally of some types), oldest first"""
+        found = []
+        for segment in reversed(self._snapshot_segments()):
+            records = [r for r in self._iter_segment(segment)
+                       if not types or r.get('type') in types]
+            found = records[-(count - len(found)):] + found
+            if len(found) >= count:
+                break
+        return found[-count:] if count else []
+
+    # Retention
+
+    def _maybe_maintain(self):
+        now = time.time()
+        with self.lock:
+            if self._maintaining or now - self._last_maintenance < self.maintenance_interval:
+                return
+            self._maintaining = True
+        threading.Thread(target=self.maintain, name='event-log-maintenance', daemon=True).start()
+
+    def maintain(self, now=None):
+        """Delete segments past retention and gzip sealed segments past compact_after"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self._maintaining = True
+            # A segment's newest event is older than the start of the next segment
+            aged = [(segment, self._segments[i + 1][0] / 1000)
+                    for i, segment in enumerate(self._segments[:-1])]
+
+        try:
+            for segment, ends_at in aged:
+                _, path, compacted = segment
+                if self.retention and ends_at < now - self.retention:
+                    with self.lock:
+                        self._segments.remove(segment)
+                        self._indexes.pop(path, None)
+                    os.remove(path)
+                    self.deleted += 1
+                elif not compacted and self.compact_after is not None and ends_at < now - self.compact_after:
+                    # Sealed segments never change, so compress outside the lock
+                    gz_path = os.path.join(self.directory, _segment_name(segment[0], compacted=True))
+                    with open(path, 'rb') as src, gzip.open(gz_path + '.tmp', 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                    os.replace(gz_path + '.tmp', gz_path)
+                    with self.lock:
+                        segment[1], segment[2] = gz_path, True
+                        self._indexes.pop(path, None)
+                        os.remove(path)
+                    self.compacted += 1
+        except Exception as e:
+            print(f"⚠️ Event log maintenance failed: {e}")
+        finally:
+            with self.lock:
+                self._maintaining = False
+                self._last_maintenance = now
+
+    def stats(self):
+        with self.lock:
+            sizes = []
+            for _, path, _ in self._segments:
+                try:
+                    sizes.append(os.path.getsize(path))
+                except OSError:
+                    pass
+            return {
+                'segments': len(self._segments),
+                'compacted_segments': sum(1 for segment in self._segments if segment[2]),
+                'bytes': sum(sizes),
+                'appended': self.appended,
+                'compacted': self.compacted,
+                'deleted': self.deleted,
+            }
+
+    def close(self):
+        with self.lock:
+            self._seal_locked()
@@ -12,7 +12,7 @@ import sys
 import os
 
 # Import the Flask app
-from app import app, clicker, public_tunnel_url, NGROK_AVAILABLE, NGROK_AUTH_TOKEN, setup_tunnel
+from app import clicker, state, create_server, NGROK_AVAILABLE, NGROK_AUTH_TOKEN, setup_tunnel
 
 class AudioClickerGUI:
     def __init__(self, root):
@@ -30,7 +30,7 @@ class AudioClickerGUI:
         self.root.configure(bg=self.bg_color)
         
         self.server_running = False
-        self.server_thread = None
+        self.server = None
         self.tunnel_url = None
         
         self.setup_ui()
@@ -186,17 +186,24 @@ class AudioClickerGUI:
             return
             
         self.log("🚀 Starting Flask server...")
+        
+        # Bind and serve in a background thread
+        try:
+            self.server = create_server()
+            self.server.start()
+        except Exception as e:
+            self.log(f"❌ Server error: {e}")
+            self.server = None
+            return
+        
         self.server_running = True
+        self.log(f"📡 Server listening on http://localhost:{self.server.port} ({self.server.engine})")
         
         # Update UI
         self.status_label.config(text="✅ Running", fg=self.success_color)
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
         
-        # Start Flask in thread
-        self.server_thread = threading.Thread(target=self.run_flask, daemon=True)
-        self.server_thread.start()
-        
         # Setup ngrok after delay
         if NGROK_AVAILABLE and NGROK_AUTH_TOKEN.strip():
             self.log("🌐 Setting up ngrok tunnel...")
@@ -204,15 +211,6 @@ class AudioClickerGUI:
         else:
             self.log("⚠️ Ngrok not configured - local access only")
             
-    def run_flask(self):
-        """Run Flask app (in background thread)"""
-        try:
-            self.log("📡 Server listening on http://localhost:5000")
-            app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
-        except Exception as e:
-            self.log(f"❌ Server error: {e}")
-            self.server_running = False
-            
     def setup_ngrok_delayed(self):
         """Setup ngrok tunnel after server starts"""
         time.sleep(3)  # Wait for Flask to start
@@ -220,7 +218,7 @@ class AudioClickerGUI:
         try:
             success = setup_tunnel()
             if success:
-                global public_tunnel_url
+                # Read it now - setup_tunnel just set it
                 from app import public_tunnel_url
                 self.tunnel_url = public_tunnel_url
                 
@@ -257,14 +255,28 @@ class AudioClickerGUI:
         self.server_running = False
         
         # Update UI
-        self.status_label.config(text="⭕ Stopped", fg="#ef233c")
-        self.start_btn.config(state=tk.NORMAL)
+        self.status_label.config(text="⏳ Stopping...", fg=self.accent_color)
         self.stop_btn.config(state=tk.DISABLED)
         self.copy_btn.config(state=tk.DISABLED)
         self.open_btn.config(state=tk.DISABLED)
         
-        # Note: Flask doesn't have clean shutdown in thread, so we just exit
-        self.log("⚠️ Please close and restart to start server again")
+        # Draining can take up to the shutdown timeout, so keep it off the UI thread
+        server, self.server = self.server, None
+        threading.Thread(target=self.drain_server, args=(server,), daemon=True).start()
+        
+    def drain_server(self, server):
+        """Stop the server (in background thread), then re-enable Start"""
+        try:
+            server.stop()
+            self.log("✅ Server stopped - in-flight requests finished and state saved")
+        except Exception as e:
+            self.log(f"❌ Error while stopping server: {e}")
+        self.root.after(0, self.server_stopped)
+        
+    def server_stopped(self):
+        """Update UI once the server has stopped (must be called on main thread)"""
+        self.status_label.config(text="⭕ Stopped", fg="#ef233c")
+        self.start_btn.config(state=tk.NORMAL)
         
     def copy_url(self):
         """Copy tunnel URL to clipboard"""
@@ -299,6 +311,9 @@ class AudioClickerGUI:
         if messagebox.askokcancel("Quit", "Stop server and quit?"):
             self.log("👋 Shutting down...")
             self.server_running = False
+            if self.server:
+                self.server.stop()
+            state.close()  # os._exit skips atexit, so flush pending state first
             self.root.destroy()
             os._exit(0)  # Force exit
 
@@ -0,0 +1,192 @@
+"""
+Metrics for Remote Audio Clicker
+Counters, gauges and latency histograms kept in plain dicts, exported in
+the Prometheus text format - no client library needed.
+"""
+
+import bisect
+import threading
+
+# Request latency buckets (seconds) - fine-grained where /click normally lands
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+class Counter:
+    """Monotonic count per label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self.lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]  # An unlabelled metric exists from the start
+        return [(self.name, _labels(self.labelnames, labels), value) for labels, value in sorted(items)]
+
+
+class Gauge(Counter):
+    """Value per label values that can go up and down"""
+
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self.lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self._values = {}  # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self.lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        samples = []
+        for labels, counts, total in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', _labels(self.labelnames, labels, ('le', _number(float(bound)))), cumulative))
+            samples.append((self.name + '_sum', _labels(self.labelnames, labels), total))
+            samples.append((self.name + '_count', _labels(self.labelnames, labels), cumulative))
+        return samples
+
+
+class Callback:
+    """Metric read from elsewhere at scrape time.
+
+    ``fn`` returns a number, or a {label values tuple: number} dict.
+    """
+
+    def __init__(self, kind, name, help_text, fn, labelnames=()):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        value = self.fn()
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, _labels(self.labelnames, labels), v) for labels, v in sorted(value.items())]
+        return [(self.name, '', value)]
+
+
+class MetricsRegistry:
+    """Every metric of the app, rendered together for /metrics"""
+
+    def __init__(self, namespace=''):
+        self.namespace = namespace
+        self._metrics = []
+
+    def _name(self, name):
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(self._name(name), help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(Gauge(self._name(name), help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self._name(name), help_text, labelnames, buckets))
+
+    def callback(self, kind, name, help_text, fn, labelnames=()):
+        return self._add(Callback(kind, self._name(name), help_text, fn, labelnames))
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                print(f"⚠️ Could not collect {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Per-route request count by status, latency histogram and in-flight gauge"""
+
+    def __init__(self, registry, buckets=DEFAULT_BUCKETS):
+        self.requests = registry.counter('http_requests_total', 'HTTP requests by route, method and status',
+                                         ('route', 'method', 'status'))
+        self.latency = registry.histogram('http_request_duration_seconds', 'Time spent handling a request',
+                                          ('route', 'method'), buckets)
+        self.in_flight = registry.gauge('http_requests_in_flight', 'Requests being handled right now', ('route',))
+
+    def started(self, route):
+        self.in_flight.inc(route)
+
+    def finished(self, route, method, status, elapsed):
+        self.in_flight.dec(route)
+        self.requests.inc(route, method, str(status))
+        self.latency.observe(elapsed, route, method)
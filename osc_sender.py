@@ -0,0 +1,214 @@
+"""
+OSC output for Remote Audio Clicker
+One sender thread writes every datagram to VRChat. Each event goes out as
+a single OSC bundle, and momentary parameters are reset by a timer wheel
+instead of a sleeping thread per click.
+"""
+
+import math
+import queue
+import socket
+import struct
+import threading
+import time
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+
+BUNDLE_HEADER = b'#bundle\x00'
+IMMEDIATELY = struct.pack('>Q', 1)  # OSC time tag meaning "now"
+
+
+def encode_message(address, value):
+    """Encode one OSC message with a single argument"""
+    builder = OscMessageBuilder(address=address)
+    builder.add_arg(value)
+    return builder.build().dgram
+
+
+def encode_bundle(messages):
+    """Wrap already encoded messages in one immediate OSC bundle"""
+    parts = [BUNDLE_HEADER, IMMEDIATELY]
+    for message in messages:
+        parts.append(struct.pack('>i', len(message)))
+        parts.append(message)
+    return b''.join(parts)
+
+
+class TimerWheel:
+    """Hashed timer wheel keyed by name - scheduling a key again moves it.
+
+    Time is split into ``tick``-sized slots arranged in a ring of ``slots``.
+    Scheduling and cancelling are O(1); ``advance`` jumps to the earliest
+    deadline and walks only the slots from there to now. Deadlines further out than one revolution stay in
+    their slot until their tick comes round.
+    """
+
+    def __init__(self, tick=0.01, slots=512):
+        self.tick = tick
+        self._slots = [dict() for _ in range(slots)]
+        self._keys = {}  # key -> tick number
+        self._origin = time.monotonic()
+        self._current = 0
+
+    def _tick_at(self, t):
+        return int((t - self._origin) / self.tick)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def schedule(self, key, delay, value, now=None):
+        """Fire ``value`` for ``key`` after ``delay`` seconds. Returns True if it replaced a pending one."""
+        now = time.monotonic() if now is None else now
+        if not self._keys:
+            # Idle wheel - catch up to now so advance doesn't walk the idle time slot by slot
+            self._current = max(self._current, self._tick_at(now))
+        tick = max(self._current + 1, int(math.ceil((now + delay - self._origin) / self.tick)))
+        replaced = self.cancel(key)
+        self._keys[key] = tick
+        self._slots[tick % len(self._slots)][key] = (tick, value)
+        return replaced
+
+    def cancel(self, key):
+        tick = self._keys.pop(key, None)
+        if tick is None:
+            return False
+        del self._slots[tick % len(self._slots)][key]
+        return True
+
+    def advance(self, now=None):
+        """Pop every (key, value) whose deadline has passed"""
+        now = time.monotonic() if now is None else now
+        target = self._tick_at(now)
+        due = []
+        if self._keys:
+            # Skip the empty slots before the earliest deadline
+            self._current = max(self._current, min(min(self._keys.values()), target) - 1)
+        while self._current < target and self._keys:
+            self._current += 1
+            slot = self._slots[self._current % len(self._slots)]
+            for key in [k for k, (tick, _) in slot.items() if tick <= self._current]:
+                _, value = slot.pop(key)
+                del self._keys[key]
+                due.append((key, value))
+        # Nothing pending - jump straight to now rather than walking empty slots
+        self._current = max(self._current, target)
+        return due
+
+
+class OSCSender:
+    """Single thread that sends OSC over UDP and fires scheduled resets.
+
+    ``send_event`` puts parameter values and the "on" half of every pulse
+    in one bundle, and schedules the "off" half on the timer wheel. A pulse
+    on a parameter that already has a reset pending just pushes that reset
+    back, so rapid clicks produce one reset instead of one per click. Resets
+    falling due on the same tick go out together as one bundle.
+    """
+
+    def __init__(self, ip, port, tick=0.01):
+        self.address = (ip, port)
+        self.tick = tick
+        self.lock = threading.Lock()
+        self.wheel = TimerWheel(tick=tick)
+        self._queue = queue.Queue()
+        self._constants = {}
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._thread = None
+        self.sent = 0
+        self.bundles = 0
+        self.resets = 0
+        self.merged_resets = 0
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='osc-sender', daemon=True)
+            self._thread.start()
+
+    @property
+    def ok(self):
+        """False while the most recent send failed"""
+        return self.last_error is None
+
+    def message(self, address, value):
+        """Encoded message, reusing the cached bytes for constant (bool/None) values"""
+        if isinstance(value, bool) or value is None:
+            key = (address, value)
+            encoded = self._constants.get(key)
+            if encoded is None:
+                encoded = self._constants[key] = encode_message(address, value)
+            return encoded
+        return encode_message(address, value)
+
+    def send(self, address, value):
+        self._queue.put((self.message(address, value), None))
+
+    def send_bundle(self, values):
+        """Send several (address, value) updates as one bundle"""
+        messages = [self.message(address, value) for address, value in values]
+        if messages:
+            self._queue.put((encode_bundle(messages), None))
+
+    def send_event(self, values=(), pulses=(), pulse_duration=0.1, on=True, off=False, on_sent=None):
+        """One bundle of values plus pulses set to ``on``; pulses return to ``off`` after pulse_duration.
+
+        ``on_sent()`` is called from the sender thread once the bundle has gone out.
+        """
+        messages = [self.message(address, value) for address, value in values]
+        messages += [self.message(address, on) for address in pulses]
+        with self.lock:
+            now = time.monotonic()
+            for address in pulses:
+                if self.wheel.schedule(address, pulse_duration, off, now):
+                    self.merged_resets += 1
+        # Queued after scheduling, so it also wakes the thread to watch the new deadline
+        self._queue.put((encode_bundle(messages), on_sent))
+
+    def _send(self, datagram, is_bundle):
+        try:
+            self._socket.sendto(datagram, self.address)
+            with self.lock:
+                self.sent += 1
+                if is_bundle:
+                    self.bundles += 1
+                self.last_error = None
+        except OSError as e:
+            with self.lock:
+                self.errors += 1
+                self.last_error = str(e)
+            print(f"❌ OSC send failed: {e}")
+
+    def _run(self):
+        while True:
+            with self.lock:
+                timeout = self.tick if len(self.wheel) else None
+            try:
+                datagram, on_sent = self._queue.get(timeout=timeout)
+                self._send(datagram, datagram.startswith(BUNDLE_HEADER))
+                if on_sent is not None:
+                    try:
+                        on_sent()
+                    except Exception as e:
+                        print(f"⚠️ OSC sent callback failed: {e}")
+            except queue.Empty:
+                pass
+
+            with self.lock:
+                due = self.wheel.advance()
+                self.resets += len(due)
+            if due:
+                self._send(encode_bundle([self.message(address, value) for address, value in due]), True)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'target': f"{self.address[0]}:{self.address[1]}",
+                'datagrams_sent': self.sent,
+                'bundles_sent': self.bundles,
+                'resets_sent': self.resets,
+                'resets_merged': self.merged_resets,
+                'resets_pending': len(self.wheel),
+                'errors': self.errors,
+                'last_error': self.last_error,
+            }
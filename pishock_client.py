@@ -0,0 +1,377 @@
+"""
+PiShock API client for Remote Audio Clicker
+Commands are queued and sent from a small worker pool over one pooled
+HTTPS session, so /bonk and /zap never wait on the PiShock API.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional HTTP client - PiShock is unavailable without it
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+
+class CircuitBreaker:
+    """Stop calling an API that keeps failing, then probe it again later.
+
+    ``closed``: calls go through. After ``failure_threshold`` consecutive
+    failures it turns ``open`` and rejects calls for ``reset_timeout``
+    seconds. Then it is ``half_open``: one trial call is let through, and
+    its result closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._current_state_locked()
+
+    def _current_state_locked(self):
+        if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = 'half_open'
+        return self._state
+
+    def allow(self):
+        """Whether a call may go out now"""
+        with self.lock:
+            state = self._current_state_locked()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self._failures += 1
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    self.trips += 1
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def retry_in(self):
+        """Seconds until an open circuit lets a trial call through"""
+        with self.lock:
+            if self._current_state_locked() != 'open':
+                return 0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+MERGE_POLICIES = ('max_intensity', 'sum_duration', 'drop_duplicates')
+MAX_DURATION = 15  # Longest operation the API accepts (seconds)
+
+
+def _whole(value):
+    """API payload number ('45', '45.5', 2.5) as a whole number"""
+    return int(round(float(value)))
+
+
+def same_operation(a, b):
+    return _whole(a['Intensity']) == _whole(b['Intensity']) and _whole(a['Duration']) == _whole(b['Duration'])
+
+
+def merge_payloads(current, incoming, policy):
+    """Fold a new press into a pending apioperate payload.
+
+    - max_intensity: keep the strongest intensity and the longest duration
+    - sum_duration: keep the strongest intensity, add durations (capped at 15s)
+    - drop_duplicates: like max_intensity (identical presses never get here -
+      ``submit`` drops them)
+    """
+    merged = dict(current)
+    merged['Intensity'] = str(max(_whole(current['Intensity']), _whole(incoming['Intensity'])))
+    if policy == 'sum_duration':
+        merged['Duration'] = str(min(MAX_DURATION, _whole(current['Duration']) + _whole(incoming['Duration'])))
+    else:
+        merged['Duration'] = str(max(_whole(current['Duration']), _whole(incoming['Duration'])))
+    return merged
+
+
+class PiShockClient:
+    """Bounded, asynchronous dispatcher for PiShock ``apioperate`` calls.
+
+    ``submit`` returns a job dict straight away; a pool of ``workers``
+    threads posts it over a shared ``requests.Session`` (keep-alive, one
+    TLS handshake per pooled connection). At most ``queue_size`` jobs may be
+    waiting or running - more are rejected, as are jobs while the circuit
+    breaker is open. The last ``history`` jobs can be looked up by id.
+
+    With a coalescing ``window``, the first press for a device and operation
+    is sent straight away and opens the window. Presses arriving before it
+    closes are merged into one pending follow-up job (see
+    ``merge_payloads``) and get that job back with ``merged`` set once they
+    join it; with ``drop_duplicates``, a press identical to the one just
+    sent or waiting is dropped. When the window closes the follow-up is
+    sent and a new window opens behind it, so a burst costs at most one
+    API call per window and a lone press is never delayed.
+    """
+
+    def __init__(self, api_url, workers=2, queue_size=16, timeout=5,
+                 failure_threshold=5, reset_timeout=30, history=200, on_complete=None):
+        if not REQUESTS_AVAILABLE:
+            raise RuntimeError("requests is not installed - pip install requests")
+        self.api_url = api_url
+        self.timeout = timeout
+        self.history = history
+        self.on_complete = on_complete
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pishock')
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self._jobs = OrderedDict()  # id -> job dict
+        self._done = {}  # id -> Event
+        self._ids = itertools.count(1)
+        self._windows = {}  # (sharecode, op) -> {'sent', 'sent_payload', 'pending', 'pending_payload'} while a window is open
+        self.in_flight = 0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.merged = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+
+    def _new_job(self, payload):
+        with self.lock:
+            return self._new_job_locked(payload)
+
+    def _new_job_locked(self, payload):
+        """Create and register a job, counting it as submitted"""
+        job = {
+            'id': next(self._ids),
+            'status': 'queued',
+            'op': payload.get('Op'),
+            'intensity': payload.get('Intensity'),
+            'duration': payload.get('Duration'),
+            'created': time.time(),
+            'latency_ms': None,
+            'error': None,
+            'presses': 1,
+        }
+        self._jobs[job['id']] = job
+        self._done[job['id']] = threading.Event()
+        while len(self._jobs) > self.history:
+            old_id, _ = self._jobs.popitem(last=False)
+            self._done.pop(old_id, None)
+        self.submitted += 1
+        return job
+
+    def _finish(self, job, status, error=None):
+        with self.lock:
+            job['status'] = status
+            job['error'] = error
+            if status == 'rejected':
+                self.rejected += 1
+            done = self._done.get(job['id'])
+        if done:
+            done.set()
+        if self.on_complete:
+            try:
+                self.on_complete(dict(job))
+            except Exception as e:
+                print(f"⚠️ PiShock completion callback failed: {e}")
+
+    def submit(self, payload, window=0, policy='max_intensity'):
+        """Queue one apioperate call, merging it into a pending one within ``window`` seconds.
+
+        Returns a copy of its job - status 'pending', 'queued' or 'rejected',
+        with ``merged`` True when the press joined an existing job.
+        """
+        if policy not in MERGE_POLICIES:
+            raise ValueError(f"Unknown merge policy: {policy}")
+        if window <= 0:
+            job = self._new_job(payload)
+            return dict(self._dispatch(job, payload), merged=False)
+
+        key = (payload.get('Code'), payload.get('Op'))
+        # Looking up the window and attaching the press happen in one critical
+        # section, so a window closing in between can't strand a pending job
+        with self.lock:
+            window_state = self._windows.get(key)
+            if window_state is None:
+                # Leading edge - send now and hold the window open for whatever follows
+                job = self._new_job_locked(payload)
+                self._windows[key] = {'sent': job, 'sent_payload': payload, 'pending': None, 'pending_payload': None}
+            else:
+                if window_state['pending'] is not None:
+                    job, current = window_state['pending'], window_state['pending_payload']
+                else:
+                    job, current = window_state['sent'], window_state['sent_payload']
+                if policy == 'drop_duplicates' and same_operation(current, payload):
+                    self.merged += 1
+                    return dict(job, merged=True)
+                if window_state['pending'] is not None:
+                    merged = merge_payloads(current, payload, policy)
+                    window_state['pending_payload'] = merged
+                    job['presses'] += 1
+                    job['intensity'] = merged['Intensity']
+                    job['duration'] = merged['Duration']
+                    self.merged += 1
+                    return dict(job, merged=True)
+
+                job = self._new_job_locked(payload)
+                # Fail fast instead of holding a press for a window only to reject it
+                if self.breaker.state != 'open':
+                    # First follow-up inside the window - it waits for the window to close
+                    job['status'] = 'pending'
+                    window_state['pending'], window_state['pending_payload'] = job, payload
+                    return dict(job, merged=False)
+
+        if window_state is not None:
+            self._finish(job, 'rejected', f"PiShock API unavailable - retrying in {self.breaker.retry_in():.0f}s")
+            return dict(job, merged=False)
+        self._start_window(key, window)
+        return dict(self._dispatch(job, payload), merged=False)
+
+    def _start_window(self, key, window):
+        timer = threading.Timer(window, self._flush, args=(key, window))
+        timer.daemon = True
+        timer.start()
+
+    def _flush(self, key, window):
+        """Coalescing window closed - send the follow-up the burst merged into, if any"""
+        with self.lock:
+            window_state = self._windows.pop(key, None)
+            if window_state is None or window_state['pending'] is None:
+                return
+            job, payload = window_state['pending'], window_state['pending_payload']
+            # The follow-up is the new leading edge
+            self._windows[key] = {'sent': job, 'sent_payload': payload, 'pending': None, 'pending_payload': None}
+        if job['presses'] > 1:
+            print(f"⚡ Merged {job['presses']} PiShock presses into one: intensity={payload['Intensity']}, duration={payload['Duration']}")
+        self._start_window(key, window)
+        self._dispatch(job, payload)
+
+    def _dispatch(self, job, payload):
+        """Hand a job to the worker pool, or reject it. Returns a copy of the job."""
+        with self.lock:
+            job['status'] = 'queued'
+
+        if not self.slots.acquire(blocking=False):
+            self._finish(job, 'rejected', 'PiShock queue is full')
+            return dict(job)
+        # Asked second, so a half-open trial is only claimed by a job that will run
+        if not self.breaker.allow():
+            self.slots.release()
+            self._finish(job, 'rejected', f"PiShock API unavailable - retrying in {self.breaker.retry_in():.0f}s")
+            return dict(job)
+
+        with self.lock:
+            self.in_flight += 1
+        try:
+            self.executor.submit(self._run, job, payload)
+        except RuntimeError as e:
+            with self.lock:
+                self.in_flight -= 1
+            self.slots.release()
+            self._finish(job, 'rejected', str(e))
+        return dict(job)
+
+    def _run(self, job, payload):
+        with self.lock:
+            job['status'] = 'running'
+        start = time.monotonic()
+        try:
+            response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+            latency = time.monotonic() - start
+            if response.status_code == 200:
+                self.breaker.record_success()
+                print(f"✅ PiShock triggered successfully ({latency * 1000:.0f} ms)")
+                status, error = 'succeeded', None
+            else:
+                # Server-side errors mean the API is struggling; 4xx is our request
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                print(f"❌ PiShock API error: {response.status_code} - {response.text}")
+                status, error = 'failed', f"HTTP {response.status_code}: {response.text[:200]}"
+        except Exception as e:
+            latency = time.monotonic() - start
+            self.breaker.record_failure()
+            print(f"❌ PiShock request failed: {e}")
+            status, error = 'failed', str(e)
+        finally:
+            self.slots.release()
+
+        with self.lock:
+            self.in_flight -= 1
+            job['latency_ms'] = round(latency * 1000, 1)
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._total_latency += latency
+            if status == 'succeeded':
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        self._finish(job, status, error)
+
+    def job(self, job_id):
+        with self.lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job has finished; returns it (or None if unknown)"""
+        with self.lock:
+            done = self._done.get(job_id)
+        if done is not None:
+            done.wait(timeout)
+        return self.job(job_id)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def stats(self):
+        with self.lock:
+            completed = self.succeeded + self.failed
+            return {
+                'circuit': self.breaker.state,
+                'circuit_trips': self.breaker.trips,
+                'in_flight': self.in_flight,
+                'queue_size': self.queue_size,
+                'submitted': self.submitted,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'merged': self.merged,
+                'pending': sum(1 for window_state in self._windows.values() if window_state['pending'] is not None),
+                'latency_ms': {
+                    'last': round(self.last_latency * 1000, 1),
+                    'avg': round(self._total_latency / completed * 1000, 1) if completed else 0.0,
+                    'max': round(self.max_latency * 1000, 1),
+                },
+            }
@@ -0,0 +1,94 @@
+"""
+Local PiShock API stand-in for Remote Audio Clicker
+Implements the apioperate contract so bonks, zaps and the client's circuit
+breaker can be exercised offline. Nothing is ever sent to a real device.
+
+Usage:
+    python pishock_stub.py --port 5050 --latency 0.2 --error-rate 0.1
+
+then set PISHOCK_API_URL in app.py to http://127.0.0.1:5050/api/apioperate
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from flask import Flask, jsonify, request
+
+REQUIRED_FIELDS = ('Username', 'Apikey', 'Code', 'Name', 'Op')
+
+
+def create_stub_app(latency=0.0, error_rate=0.0, down=False):
+    """Flask app answering POST /api/apioperate like the PiShock API.
+
+    ``latency`` seconds are added to every call, ``error_rate`` of calls
+    answer HTTP 500, and ``down`` makes every call fail (for tripping the
+    breaker). All three can be changed at runtime via POST /stub/config.
+    """
+    stub = Flask(__name__)
+    config = {'latency': latency, 'error_rate': error_rate, 'down': down}
+    counters = {'requests': 0, 'succeeded': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def count(name):
+        with lock:
+            counters[name] += 1
+
+    @stub.route('/api/apioperate', methods=['POST'])
+    def apioperate():
+        count('requests')
+        if config['latency']:
+            time.sleep(config['latency'])
+        if config['down'] or random.random() < config['error_rate']:
+            count('errors')
+            return 'Internal Server Error', 500
+
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or any(field not in data for field in REQUIRED_FIELDS):
+            count('rejected')
+            return 'Missing required fields.', 400
+
+        # Same ranges the real API enforces
+        try:
+            op = int(data['Op'])
+            intensity = int(data.get('Intensity', 0))
+            duration = int(data.get('Duration', 0))
+        except (TypeError, ValueError):
+            count('rejected')
+            return 'Invalid operation values.', 400
+        if op not in (0, 1, 2) or not 0 <= intensity <= 100 or not 0 <= duration <= 15:
+            count('rejected')
+            return 'Invalid operation values.', 400
+
+        count('succeeded')
+        return 'Operation Succeeded.', 200
+
+    @stub.route('/stub/config', methods=['GET', 'POST'])
+    def stub_config():
+        if request.method == 'POST':
+            for key, value in (request.get_json(silent=True) or {}).items():
+                if key in config:
+                    config[key] = value
+        return jsonify({'config': config, 'counters': dict(counters)})
+
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the PiShock apioperate API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answering HTTP 500')
+    parser.add_argument('--down', action='store_true', help='fail every call')
+    args = parser.parse_args()
+
+    print(f"⚡ PiShock stub listening on http://{args.host}:{args.port}/api/apioperate")
+    create_stub_app(args.latency, args.error_rate, args.down).run(
+        host=args.host, port=args.port, threaded=True
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+"""
+Rate limiter engines for Remote Audio Clicker
+Per-session state lives in memory and is snapshotted compactly for the
+state store - one key per session, so a click changes a single entry.
+
+Three algorithms share one interface:
+- sliding_window: at most N clicks in any window (the original behaviour)
+- token_bucket: a bucket of ``burst`` clicks refilled at a steady rate
+- gcra: the generic cell rate algorithm, one float of state per session
+"""
+
+import math
+import threading
+import time
+
+SESSION_PREFIX = 'session:'
+
+
+class RateLimiter:
+    """Shared plumbing: locking, idle-session sweeps and snapshots.
+
+    Subclasses implement ``_check_locked``, ``_record_locked``,
+    ``_is_idle`` and the per-session encode/decode used by snapshots.
+    """
+
+    algorithm = None
+
+    def __init__(self, sweep_interval=300):
+        self.sweep_interval = sweep_interval
+        self.lock = threading.Lock()
+        self._sessions = {}
+        self._last_sweep = time.time()
+
+    @staticmethod
+    def _wait_seconds(seconds):
+        """Whole seconds until the next click is allowed (never rounds down to early)"""
+        return max(1, math.ceil(seconds - 1e-9))
+
+    def check(self, key, now=None):
+        """Returns (allowed, wait_time, click_count) without recording anything"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep_locked(now)
+            return self._check_locked(key, now)
+
+    def record(self, key, now=None):
+        """Record one click for key"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self._record_locked(key, now)
+
+    def _sweep_locked(self, now):
+        idle = [key for key, value in self._sessions.items() if self._is_idle(value, now)]
+        for key in idle:
+            del self._sessions[key]
+        self._last_sweep = now
+        return len(idle)
+
+    def sweep(self, now=None):
+        """Drop sessions that are back to a clean slate; returns how many"""
+        now = time.time() if now is None else now
+        with self.lock:
+            return self._sweep_locked(now)
+
+    def session_count(self):
+        with self.lock:
+            return len(self._sessions)
+
+    def settings(self):
+        """Algorithm parameters, as reported by /admin/rate-limit"""
+        return {'algorithm': self.algorithm}
+
+    def snapshot(self):
+        """Compact JSON form: the settings plus one 'session:<id>' key per session.
+
+        Times are absolute epoch milliseconds, so a session's entry only
+        changes when that session clicks.
+        """
+        now = time.time()
+        with self.lock:
+            self._sweep_locked(now)
+            data = self.settings()
+            for key, value in self._sessions.items():
+                data[SESSION_PREFIX + key] = self._encode(value)
+        return data
+
+    def restore(self, data):
+        """Load a snapshot written by ``snapshot``"""
+        now = time.time()
+        with self.lock:
+            self._sessions = {}
+            for name, encoded in data.items():
+                if not name.startswith(SESSION_PREFIX):
+                    continue
+                value = self._decode(encoded)
+                if value is not None and not self._is_idle(value, now):
+                    self._sessions[name[len(SESSION_PREFIX):]] = value
+        return self
+
+    @staticmethod
+    def _ms(t):
+        return int(round(t * 1000))
+
+    @staticmethod
+    def _from_ms(ms):
+        return ms / 1000.0
+
+
+class _Ring:
+    """Fixed-capacity ring buffer of click timestamps, oldest at ``head``"""
+
+    __slots__ = ('times', 'head', 'count')
+
+    def __init__(self, capacity):
+        self.times = [0.0] * capacity
+        self.head = 0
+        self.count = 0
+
+    def timestamps(self):
+        capacity = len(self.times)
+        return [self.times[(self.head + i) % capacity] for i in range(self.count)]
+
+    def newest(self):
+        return self.times[(self.head + self.count - 1) % len(self.times)]
+
+
+class SlidingWindowLimiter(RateLimiter):
+    """Allow at most ``max_events`` per session in any ``window`` seconds.
+
+    Each session keeps a ring buffer sized to ``max_events``. Expired
+    timestamps are dropped from the head as they age out, so a check costs
+    O(1) amortized no matter how busy the session has been.
+    """
+
+    algorithm = 'sliding_window'
+
+    def __init__(self, max_events, window, sweep_interval=300):
+        super().__init__(sweep_interval)
+        self.max_events = max_events
+        self.window = window
+
+    def _expire(self, ring, now):
+        times = ring.times
+        capacity = len(times)
+        while ring.count and now - times[ring.head] >= self.window:
+            ring.head = (ring.head + 1) % capacity
+            ring.count -= 1
+
+    def _is_idle(self, ring, now):
+        return not ring.count or now - ring.newest() >= self.window
+
+    def _check_locked(self, key, now):
+        ring = self._sessions.get(key)
+        if ring is None:
+            return True, 0, 0
+        self._expire(ring, now)
+        if ring.count >= self.max_events:
+            oldest = ring.times[ring.head]
+            return False, self._wait_seconds(self.window - (now - oldest)), ring.count
+        return True, 0, ring.count
+
+    def _record_locked(self, key, now):
+        ring = self._sessions.get(key)
+        if ring is None:
+            ring = self._sessions[key] = _Ring(self.max_events)
+        else:
+            self._expire(ring, now)
+        capacity = len(ring.times)
+        if ring.count == capacity:
+            # Full ring - overwrite the oldest timestamp
+            ring.times[ring.head] = now
+            ring.head = (ring.head + 1) % capacity
+        else:
+            ring.times[(ring.head + ring.count) % capacity] = now
+            ring.count += 1
+
+    def _make_ring(self, timestamps):
+        ring = _Ring(self.max_events)
+        for ts in sorted(timestamps)[-self.max_events:]:
+            ring.times[ring.count] = ts
+            ring.count += 1
+        return ring
+
+    def configure(self, max_events=None, window=None, **_):
+        """Change the limit, resizing every ring while keeping the newest clicks"""
+        with self.lock:
+            if window is not None:
+                self.window = window
+            if max_events is not None and max_events != self.max_events:
+                self.max_events = max_events
+                for key, ring in list(self._sessions.items()):
+                    self._sessions[key] = self._make_ring(ring.timestamps())
+
+    def settings(self):
+        return {'algorithm': self.algorithm, 'max_events': self.max_events, 'window': self.window}
+
+    def _encode(self, ring):
+        return [self._ms(t) for t in ring.timestamps()]
+
+    def _decode(self, times_ms):
+        now = time.time()
+        recent = [self._from_ms(ms) for ms in times_ms]
+        recent = [t for t in recent if now - t < self.window]
+        return self._make_ring(recent) if recent else None
+
+    def restore(self, data):
+        """Load a snapshot (or the legacy ``{session: {'clicks': [...]}}`` layout)"""
+        if any(isinstance(value, dict) for value in data.values()):
+            now = time.time()
+            with self.lock:
+                self._sessions = {}
+                for key, value in data.items():
+                    if not isinstance(value, dict):
+                        continue
+                    recent = [t for t in value.get('clicks', []) if now - t < self.window]
+                    if recent:
+                        self._sessions[key] = self._make_ring(recent)
+            return self
+        return super().restore(data)
+
+
+class TokenBucketLimiter(RateLimiter):
+    """Each session gets a bucket of ``burst`` clicks that refills continuously.
+
+    Viewers can spend a burst at once, then earn one click back every
+    ``window / refill_per_window`` seconds instead of waiting out a whole
+    window. State per session is (tokens, last_update).
+    """
+
+    algorithm = 'token_bucket'
+
+    def __init__(self, burst, refill_per_window, window, sweep_interval=300):
+        super().__init__(sweep_interval)
+        self.burst = burst
+        self.refill_per_window = refill_per_window
+        self.window = window
+
+    @property
+    def rate(self):
+        """Tokens gained per second"""
+        return self.refill_per_window / self.window
+
+    def _tokens(self, bucket, now):
+        tokens, updated = bucket
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    def _is_idle(self, bucket, now):
+        return self._tokens(bucket, now) >= self.burst
+
+    def _check_locked(self, key, now):
+        bucket = self._sessions.get(key)
+        if bucket is None:
+            return True, 0, 0
+        tokens = self._tokens(bucket, now)
+        used = self.burst - int(math.floor(tokens))
+        if tokens < 1:
+            return False, self._wait_seconds((1 - tokens) / self.rate), used
+        return True, 0, used
+
+    def _record_locked(self, key, now):
+        bucket = self._sessions.get(key)
+        tokens = self.burst if bucket is None else self._tokens(bucket, now)
+        self._sessions[key] = (tokens - 1, now)
+
+    def configure(self, burst=None, refill_per_window=None, window=None, **_):
+        with self.lock:
+            now = time.time()
+            # Settle every bucket at the old rate before changing it
+            self._sessions = {key: (self._tokens(b, now), now) for key, b in self._sessions.items()}
+            if burst is not None:
+                self.burst = burst
+            if refill_per_window is not None:
+                self.refill_per_window = refill_per_window
+            if window is not None:
+                self.window = window
+
+    def settings(self):
+        return {
+            'algorithm': self.algorithm,
+            'burst': self.burst,
+            'refill_per_window': self.refill_per_window,
+            'window': self.window,
+        }
+
+    def _encode(self, bucket):
+        return [int(round(bucket[0] * 1000)), self._ms(bucket[1])]
+
+    def _decode(self, encoded):
+        return (encoded[0] / 1000.0, self._from_ms(encoded[1]))
+
+
+class GCRALimiter(RateLimiter):
+    """Generic cell rate algorithm: ``max_events`` per ``window`` with a ``burst``.
+
+    Each session stores only its theoretical arrival time (TAT). A click is
+    allowed while TAT - now stays within the burst tolerance, and the exact
+    wait is how far past that tolerance TAT has run.
+    """
+
+    algorithm = 'gcra'
+
+    def __init__(self, max_events, window, burst, sweep_interval=300):
+        super().__init__(sweep_interval)
+        self.max_events = max_events
+        self.window = window
+        self.burst = burst
+
+    @property
+    def emission_interval(self):
+        return self.window / self.max_events
+
+    @property
+    def tolerance(self):
+        return self.emission_interval * (self.burst - 1)
+
+    def _is_idle(self, tat, now):
+        return tat <= now
+
+    def _check_locked(self, key, now):
+        tat = max(self._sessions.get(key, now), now)
+        interval = self.emission_interval
+        used = math.ceil((tat - now) / interval - 1e-9)
+        allow_at = tat - self.tolerance
+        if now < allow_at:
+            return False, self._wait_seconds(allow_at - now), used
+        return True, 0, used
+
+    def _record_locked(self, key, now):
+        tat = max(self._sessions.get(key, now), now)
+        self._sessions[key] = tat + self.emission_interval
+
+    def configure(self, max_events=None, window=None, burst=None, **_):
+        with self.lock:
+            if max_events is not None:
+                self.max_events = max_events
+            if window is not None:
+                self.window = window
+            if burst is not None:
+                self.burst = burst
+
+    def settings(self):
+        return {
+            'algorithm': self.algorithm,
+            'max_events': self.max_events,
+            'window': self.window,
+            'burst': self.burst,
+        }
+
+    def _encode(self, tat):
+        return self._ms(tat)
+
+    def _decode(self, ms):
+        return self._from_ms(ms)
+
+
+RATE_LIMIT_ALGORITHMS = ('sliding_window', 'token_bucket', 'gcra')
+
+
+def create_rate_limiter(algorithm, max_events, window, burst, refill_per_window, sweep_interval=300):
+    """Build a limiter for one of RATE_LIMIT_ALGORITHMS"""
+    if algorithm == 'sliding_window':
+        return SlidingWindowLimiter(max_events, window, sweep_interval)
+    if algorithm == 'token_bucket':
+        return TokenBucketLimiter(burst, refill_per_window, window, sweep_interval)
+    if algorithm == 'gcra':
+        return GCRALimiter(max_events, window, burst, sweep_interval)
+    raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+
+
+def restore_rate_limiter(data, max_events, window, burst, refill_per_window, sweep_interval=300):
+    """Rebuild a limiter from a snapshot, keeping the algorithm it was saved with.
+
+    ``window`` always comes from the caller's configuration; ``max_events``,
+    ``burst`` and ``refill_per_window`` are taken from the snapshot when present.
+    """
+    algorithm = data.get('algorithm', 'sliding_window')
+    if algorithm not in RATE_LIMIT_ALGORITHMS:
+        algorithm = 'sliding_window'
+    limiter = create_rate_limiter(
+        algorithm, data.get('max_events', max_events), window,
+        data.get('burst', burst),
+        data.get('refill_per_window', refill_per_window),
+        sweep_interval
+    )
+    if data.get('window', window) != window:
+        # Offsets were taken against a different window - start clean
+        return limiter
+    return limiter.restore(data)
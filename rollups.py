@@ -0,0 +1,135 @@
+"""
+Click rollups for Remote Audio Clicker
+Per-minute, per-hour and per-day event counters plus an hour-of-day by
+weekday heatmap, updated as events happen so history queries never scan
+the raw event log.
+"""
+
+import bisect
+import threading
+import time
+
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def _local_midnight(ts):
+    t = time.localtime(ts)
+    return time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1))
+
+
+class ClickRollups:
+    """Counters of events per type in minute, hour and day buckets.
+
+    ``record`` adds one event to the bucket it falls in at every
+    resolution, so the coarser series always already hold what the finer
+    ones will lose: downsampling is just dropping minute buckets older than
+    ``retention['minute']`` seconds (and hour buckets after
+    ``retention['hour']``). Days follow local midnight, like the daily
+    click count. Bucket starts are kept sorted, so ``series`` costs
+    O(log n + buckets returned) however many events were counted.
+    """
+
+    def __init__(self, retention=None):
+        self.retention = {'minute': 2 * 24 * 3600, 'hour': 90 * 24 * 3600, 'day': None}
+        self.retention.update(retention or {})
+        self.lock = threading.Lock()
+        self._buckets = {name: {} for name in RESOLUTIONS}  # resolution -> {start: {type: count}}
+        self._starts = {name: [] for name in RESOLUTIONS}  # resolution -> sorted bucket starts
+        self._heatmap = [[0] * 24 for _ in range(7)]  # [weekday (Mon=0)][hour] -> events
+        self.total = 0
+
+    @staticmethod
+    def bucket_start(resolution, ts):
+        if resolution == 'day':
+            return _local_midnight(ts)
+        step = RESOLUTIONS[resolution]
+        return ts - (ts % step)
+
+    def _add_locked(self, resolution, start, counts):
+        bucket = self._buckets[resolution].get(start)
+        if bucket is None:
+            bucket = self._buckets[resolution][start] = {}
+            starts = self._starts[resolution]
+            if not starts or start > starts[-1]:
+                starts.append(start)
+            else:
+                bisect.insort(starts, start)
+            self._expire_locked(resolution, start)
+        for event_type, count in counts.items():
+            bucket[event_type] = bucket.get(event_type, 0) + count
+
+    def _expire_locked(self, resolution, now):
+        """Drop buckets past their resolution's retention (they live on in coarser ones)"""
+        keep = self.retention.get(resolution)
+        if not keep:
+            return
+        starts = self._starts[resolution]
+        cutoff = bisect.bisect_left(starts, now - keep)
+        for start in starts[:cutoff]:
+            del self._buckets[resolution][start]
+        del starts[:cutoff]
+
+    def record(self, event_type='click', ts=None):
+        """Count one event at every resolution and in the heatmap"""
+        ts = time.time() if ts is None else ts
+        local = time.localtime(ts)
+        with self.lock:
+            for resolution in RESOLUTIONS:
+                self._add_locked(resolution, self.bucket_start(resolution, ts), {event_type: 1})
+            self._heatmap[local.tm_wday][local.tm_hour] += 1
+            self.total += 1
+
+    def series(self, resolution, start=None, end=None, max_points=None):
+        """[{'start': ts, <type>: count, ...}] for buckets starting in [start, end), oldest first.
+
+        With max_points, the newest max_points buckets of the range.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        with self.lock:
+            starts = self._starts[resolution]
+            lo = 0 if start is None else bisect.bisect_left(starts, self.bucket_start(resolution, start))
+            hi = len(starts) if end is None else bisect.bisect_left(starts, end)
+            if max_points is not None:
+                lo = max(lo, hi - max_points)
+            buckets = self._buckets[resolution]
+            return [dict(buckets[s], start=s) for s in starts[lo:hi]]
+
+    def heatmap(self):
+        """7 rows (Monday first) of 24 hourly event counts, in local time"""
+        with self.lock:
+            return [list(row) for row in self._heatmap]
+
+    def snapshot(self):
+        """JSON form - one flat '<resolution>:<start>' key per bucket, so a click changes only a few keys"""
+        with self.lock:
+            data = {
+                f"{resolution}:{start!r}": dict(counts)
+                for resolution, buckets in self._buckets.items()
+                for start, counts in buckets.items()
+            }
+            data['heatmap'] = [list(row) for row in self._heatmap]
+            data['total'] = self.total
+            return data
+
+    def restore(self, data):
+        """Load a snapshot, dropping buckets that expired meanwhile"""
+        flat = {resolution: {} for resolution in RESOLUTIONS}
+        for key, counts in data.items():
+            resolution, _, start = key.partition(':')
+            if resolution in flat and start:
+                flat[resolution][start] = counts
+        with self.lock:
+            for resolution in RESOLUTIONS:
+                buckets = {
+                    float(start): dict(counts)
+                    for start, counts in flat[resolution].items()
+                }
+                self._buckets[resolution] = buckets
+                self._starts[resolution] = sorted(buckets)
+                self._expire_locked(resolution, time.time())
+            heatmap = data.get('heatmap')
+            if isinstance(heatmap, list) and len(heatmap) == 7 and all(len(row) == 24 for row in heatmap):
+                self._heatmap = [list(row) for row in heatmap]
+            self.total = data.get('total', 0)
+        return self
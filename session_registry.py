@@ -0,0 +1,188 @@
+"""
+Session registry for Remote Audio Clicker
+Nicknames and colors for every visitor, held in memory with coarse
+last_seen times and automatic expiry of idle sessions.
+"""
+
+import bisect
+import threading
+import time
+
+
+class SessionRegistry:
+    """Dict-backed registry of session_id -> {nickname, color, last_seen}.
+
+    Lookups are plain dict reads. ``last_seen`` is rounded down to
+    ``granularity`` seconds, so a visitor clicking repeatedly only changes
+    the registry (and makes the state store write it) once per interval.
+    Sessions idle for longer than ``ttl`` are dropped by a sweep that runs
+    at most every ``sweep_interval`` seconds from ``touch``, whose
+    ``changed`` result tells the caller to save (and re-version) the registry.
+
+    Two sorted indexes are kept up to date on every change: (last_seen,
+    session_id) for newest-first paging and expiry, and (nickname, session_id)
+    for prefix search. ``page`` never looks at more sessions than it returns
+    (plus the prefix matches when searching).
+    """
+
+    def __init__(self, ttl=30 * 24 * 3600, granularity=60, sweep_interval=3600, color_for=None):
+        self.ttl = ttl
+        self.granularity = granularity
+        self.sweep_interval = sweep_interval
+        self.color_for = color_for
+        self.lock = threading.Lock()
+        self._sessions = {}
+        self._by_seen = []  # sorted (last_seen, session_id)
+        self._by_name = []  # sorted (lowercased nickname, session_id)
+        self._last_sweep = time.time()
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    @staticmethod
+    def _name_key(entry):
+        return (entry.get('nickname') or '').lower()
+
+    def _index_add_locked(self, session_id, entry):
+        bisect.insort(self._by_seen, (entry.get('last_seen', 0), session_id))
+        bisect.insort(self._by_name, (self._name_key(entry), session_id))
+
+    def _index_remove_locked(self, session_id, entry):
+        for index, key in ((self._by_seen, (entry.get('last_seen', 0), session_id)),
+                           (self._by_name, (self._name_key(entry), session_id))):
+            i = bisect.bisect_left(index, key)
+            if i < len(index) and index[i] == key:
+                del index[i]
+
+    def _put_locked(self, session_id, entry):
+        old = self._sessions.get(session_id)
+        if old is not None:
+            self._index_remove_locked(session_id, old)
+        self._sessions[session_id] = entry
+        self._index_add_locked(session_id, entry)
+
+    def _bucket(self, t):
+        return t - (t % self.granularity) if self.granularity else t
+
+    def get(self, session_id, default=None):
+        """The session's entry (don't mutate it - use touch)"""
+        return self._sessions.get(session_id, default)
+
+    def nickname(self, session_id):
+        entry = self._sessions.get(session_id)
+        return entry.get('nickname') if entry else None
+
+    def color(self, session_id, default='💜'):
+        entry = self._sessions.get(session_id)
+        return entry.get('color', default) if entry else default
+
+    def touch(self, session_id, nickname, now=None):
+        """Record a nickname and activity. Returns (color, changed) - changed means it needs saving."""
+        now = time.time() if now is None else now
+        last_seen = self._bucket(now)
+        with self.lock:
+            changed = self._maybe_sweep_locked(now) > 0
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                color = self.color_for(session_id) if self.color_for else '💜'
+                self._put_locked(session_id, {'nickname': nickname, 'color': color, 'last_seen': last_seen})
+                return color, True
+
+            color = entry.get('color', '💜')
+            if entry.get('nickname') != nickname or entry.get('last_seen', 0) < last_seen:
+                # Replace rather than mutate, so readers never see a half-updated entry
+                self._put_locked(session_id, {'nickname': nickname, 'color': color, 'last_seen': last_seen})
+                changed = True
+            return color, changed
+
+    def _maybe_sweep_locked(self, now):
+        if now - self._last_sweep < self.sweep_interval:
+            return 0
+        return self._sweep_locked(now)
+
+    def _sweep_locked(self, now):
+        # The oldest sessions are at the front of the last_seen index
+        cutoff_index = bisect.bisect_left(self._by_seen, (now - self.ttl,))
+        idle = [sid for _, sid in self._by_seen[:cutoff_index]]
+        for sid in idle:
+            self._index_remove_locked(sid, self._sessions.pop(sid))
+        self._last_sweep = now
+        self.expired += len(idle)
+        if idle:
+            print(f"🧹 Expired {len(idle)} idle session{'s' if len(idle) != 1 else ''}")
+        return len(idle)
+
+    def sweep(self, now=None):
+        """Drop sessions idle for longer than the TTL; returns how many"""
+        now = time.time() if now is None else now
+        with self.lock:
+            return self._sweep_locked(now)
+
+    @staticmethod
+    def encode_cursor(entry_key):
+        last_seen, session_id = entry_key
+        return f"{last_seen!r}:{session_id}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """(last_seen, session_id) from encode_cursor; raises ValueError if malformed"""
+        last_seen, _, session_id = cursor.partition(':')
+        if not session_id:
+            raise ValueError('malformed cursor')
+        return (float(last_seen), session_id)
+
+    def page(self, limit, cursor=None, prefix=None):
+        """Sessions newest first: returns ([(session_id, entry), ...], next_cursor or None).
+
+        ``cursor`` continues after the last session of the previous page;
+        ``prefix`` keeps only nicknames starting with it (case-insensitive).
+        """
+        after = self.decode_cursor(cursor) if cursor else None
+        with self.lock:
+            if prefix:
+                prefix = prefix.lower()
+                keys = []
+                i = bisect.bisect_left(self._by_name, (prefix,))
+                while i < len(self._by_name) and self._by_name[i][0].startswith(prefix):
+                    sid = self._by_name[i][1]
+                    keys.append((self._sessions[sid].get('last_seen', 0), sid))
+                    i += 1
+                keys.sort(reverse=True)
+                if after is not None:
+                    keys = [key for key in keys if key < after]
+                keys = keys[:limit + 1]
+            else:
+                end = len(self._by_seen) if after is None else bisect.bisect_left(self._by_seen, after)
+                keys = self._by_seen[max(0, end - limit - 1):end][::-1]
+
+            more = len(keys) > limit
+            keys = keys[:limit]
+            users = [(sid, self._sessions[sid]) for _, sid in keys]
+        next_cursor = self.encode_cursor(keys[-1]) if more and keys else None
+        return users, next_cursor
+
+    def items(self):
+        """(session_id, entry) pairs at this moment"""
+        with self.lock:
+            return list(self._sessions.items())
+
+    def snapshot(self):
+        """JSON form - the same {session_id: entry} layout user_sessions.json always had"""
+        with self.lock:
+            return dict(self._sessions)
+
+    def restore(self, data):
+        """Load a snapshot, skipping sessions that already expired"""
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            self._sessions = {
+                sid: entry for sid, entry in data.items()
+                if isinstance(entry, dict) and entry.get('last_seen', 0) >= cutoff
+            }
+            self._by_seen = sorted((entry.get('last_seen', 0), sid) for sid, entry in self._sessions.items())
+            self._by_name = sorted((self._name_key(entry), sid) for sid, entry in self._sessions.items())
+        return self
@@ -0,0 +1,124 @@
+"""
+Decoded sound cache for Remote Audio Clicker
+Keeps pygame.mixer.Sound objects in memory so a click doesn't re-read
+and re-decode its WAV file every time.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import pygame
+
+
+class SoundCache:
+    """LRU cache of decoded pygame Sounds bounded by a memory budget.
+
+    Entries are keyed by (path, mtime, size), so replacing a file on disk
+    naturally misses and loads the new version. The stale entry ages out
+    through normal LRU eviction.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (sound, nbytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version = 0  # Bumped whenever anything reported by stats() changes
+
+    @staticmethod
+    def make_key(path):
+        """Cache key for a file as it currently exists on disk"""
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def sound_bytes(sound):
+        """Decoded size of a Sound in the mixer's native sample format"""
+        mixer_init = pygame.mixer.get_init()
+        if not mixer_init:
+            return 0
+        frequency, size, channels = mixer_init
+        return int(sound.get_length() * frequency * channels * (abs(size) // 8))
+
+    def get(self, path):
+        """Return a decoded Sound for path, loading it on a miss"""
+        key = self.make_key(path)
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.version += 1
+                return entry[0]
+            self.misses += 1
+            self.version += 1
+
+        # Decode outside the lock so one slow file doesn't block other clicks
+        sound = pygame.mixer.Sound(path)
+        self._store(key, sound)
+        return sound
+
+    def _store(self, key, sound):
+        nbytes = self.sound_bytes(sound)
+        with self.lock:
+            if key in self._entries:
+                return
+            if nbytes > self.max_bytes:
+                # Bigger than the whole budget - play it, but don't cache it
+                return
+            self._entries[key] = (sound, nbytes)
+            self.current_bytes += nbytes
+            self.version += 1
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+            self.version += 1
+
+    def preload(self, paths):
+        """Warm the cache with every path that exists; returns how many loaded"""
+        loaded = 0
+        for path in paths:
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                self.get(path)
+                loaded += 1
+            except Exception as e:
+                print(f"⚠️ Could not preload sound {path}: {e}")
+        return loaded
+
+    def invalidate(self, path):
+        """Drop every cached version of path"""
+        abs_path = os.path.abspath(path)
+        with self.lock:
+            for key in [k for k in self._entries if k[0] == abs_path]:
+                _, nbytes = self._entries.pop(key)
+                self.current_bytes -= nbytes
+                self.version += 1
+
+    def set_budget(self, max_bytes):
+        """Change the memory budget, evicting if it shrank"""
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.version += 1
+            self._evict_locked()
+
+    def stats(self):
+        """Counters for the stats endpoint"""
+        with self.lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
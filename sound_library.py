@@ -0,0 +1,154 @@
+"""
+Sound library index for Remote Audio Clicker
+Keeps filename, size, format and content hash for every sound in the
+library directories, so listings don't rescan the disk on every request.
+"""
+
+import hashlib
+import os
+import threading
+
+SOUND_EXTENSIONS = ('.wav', '.mp3', '.ogg')
+SORT_KEYS = ('filename', 'size', 'modified')
+
+
+class SoundLibrary:
+    """In-memory index of the sound directories.
+
+    ``directories`` maps a source name (e.g. 'sounds', 'custom') to a
+    directory, in lookup order. The index is built once, updated in place by
+    ``add`` and ``remove`` when the app itself changes a file, and any
+    directory whose mtime moved (files copied in by hand) is rescanned on the
+    next read. Rescans reuse the hash of files whose mtime and size match.
+    """
+
+    def __init__(self, directories):
+        self.directories = dict(directories)
+        self.lock = threading.Lock()
+        self._entries = {}  # source -> {filename: entry}
+        self._dir_mtimes = {}
+        self.version = 0  # Bumped whenever the indexed files change
+        for source in self.directories:
+            self._scan_locked(source)
+
+    @staticmethod
+    def content_hash(path):
+        """SHA-256 of a file's bytes"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _make_entry(self, source, filename, previous=None):
+        path = os.path.join(self.directories[source], filename)
+        st = os.stat(path)
+        if previous and previous['mtime'] == st.st_mtime_ns and previous['size'] == st.st_size:
+            return previous
+        return {
+            'filename': filename,
+            'path': path,
+            'source': source,
+            'size': st.st_size,
+            'format': os.path.splitext(filename)[1].lstrip('.').lower(),
+            'hash': self.content_hash(path),
+            'mtime': st.st_mtime_ns,
+        }
+
+    def _scan_locked(self, source):
+        directory = self.directories[source]
+        os.makedirs(directory, exist_ok=True)
+        mtime = os.stat(directory).st_mtime_ns
+        old = self._entries.get(source, {})
+        entries = {}
+        for filename in os.listdir(directory):
+            if not filename.endswith(SOUND_EXTENSIONS):
+                continue
+            try:
+                entries[filename] = self._make_entry(source, filename, old.get(filename))
+            except OSError:
+                continue  # Deleted while scanning
+        self._entries[source] = entries
+        self._dir_mtimes[source] = mtime
+        self.version += 1
+
+    def revalidate(self):
+        """Rescan any directory whose mtime changed since it was indexed"""
+        with self.lock:
+            for source, directory in self.directories.items():
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    mtime = None
+                if mtime != self._dir_mtimes.get(source):
+                    self._scan_locked(source)
+
+    def _source_for(self, path):
+        directory = os.path.abspath(os.path.dirname(path))
+        for source, source_dir in self.directories.items():
+            if os.path.abspath(source_dir) == directory:
+                return source
+        return None
+
+    def add(self, path):
+        """Index a file the app just wrote; returns its entry"""
+        source = self._source_for(path)
+        if source is None:
+            return None
+        filename = os.path.basename(path)
+        with self.lock:
+            entry = self._make_entry(source, filename)
+            self._entries.setdefault(source, {})[filename] = entry
+            # Our own write moved the directory mtime - don't rescan for it
+            self._dir_mtimes[source] = os.stat(self.directories[source]).st_mtime_ns
+            self.version += 1
+            return dict(entry)
+
+    def remove(self, path):
+        """Drop a file the app just deleted"""
+        source = self._source_for(path)
+        if source is None:
+            return
+        with self.lock:
+            self._entries.get(source, {}).pop(os.path.basename(path), None)
+            try:
+                self._dir_mtimes[source] = os.stat(self.directories[source]).st_mtime_ns
+            except OSError:
+                self._dir_mtimes[source] = None
+            self.version += 1
+
+    def find(self, filename, sources=None):
+        """Path of the first indexed file with this name, searching sources in order"""
+        self.revalidate()
+        with self.lock:
+            for source in sources or self.directories:
+                entry = self._entries.get(source, {}).get(filename)
+                if entry:
+                    return entry['path']
+        return None
+
+    def query(self, q=None, fmt=None, source=None, sort='filename', descending=False, offset=0, limit=None):
+        """Filtered, sorted slice of the index: returns (entries, total matching)"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        self.revalidate()
+        q = q.lower() if q else None
+        with self.lock:
+            sources = [source] if source else list(self.directories)
+            matches = [
+                entry
+                for name in sources
+                for entry in self._entries.get(name, {}).values()
+                if (not q or q in entry['filename'].lower()) and (not fmt or entry['format'] == fmt)
+            ]
+        sort_field = 'mtime' if sort == 'modified' else sort
+        matches.sort(key=lambda entry: (entry[sort_field], entry['filename']), reverse=descending)
+        end = None if limit is None else offset + limit
+        return [dict(entry) for entry in matches[offset:end]], len(matches)
+
+    def totals(self):
+        """(file count, total bytes) across every directory"""
+        self.revalidate()
+        with self.lock:
+            entries = [entry for files in self._entries.values() for entry in files.values()]
+        return len(entries), sum(entry['size'] for entry in entries)
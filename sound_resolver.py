@@ -0,0 +1,117 @@
+"""
+Per-user sound resolution for Remote Audio Clicker
+Maps (session, sound type) straight to a ready-to-play file so a click
+decides what to play with dictionary lookups only.
+"""
+
+import threading
+
+SOUND_TYPES = ('click', 'bonk')
+
+
+class SoundResolver:
+    """Precompiled table of default and per-user sounds.
+
+    ``loader(path)`` returns the file to actually play for a library sound
+    (the file itself, or its converted WAV) or None when it can't be played
+    directly - e.g. a missing file or an MP3 that hasn't been converted
+    yet. Only paths are kept: the decoded Sound is fetched from the
+    SoundCache at play time, so its memory budget covers every sound. The
+    loader runs when the table changes (``set_default``, ``set_override``,
+    ``refresh``, ``rebuild``), never during ``resolve``. A user whose sound
+    isn't playable resolves to the default.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.lock = threading.Lock()
+        self._defaults = {}  # sound_type -> path
+        self._overrides = {}  # (session_id, sound_type) -> path
+        self._playable = {}  # path -> file to play, or None
+        self.version = 0  # Bumped whenever the table changes
+
+    def _load_locked(self, path):
+        if path not in self._playable:
+            try:
+                self._playable[path] = self.loader(path)
+            except Exception as e:
+                print(f"⚠️ Could not load sound {path}: {e}")
+                self._playable[path] = None
+        return self._playable[path]
+
+    def _prune_locked(self):
+        """Forget paths no default or override points at any more"""
+        live = set(self._defaults.values()) | set(self._overrides.values())
+        for path in [p for p in self._playable if p not in live]:
+            del self._playable[path]
+
+    def resolve(self, session_id, sound_type='click'):
+        """(path, playable) - playable is None if the path must be played the slow way"""
+        path = self._overrides.get((session_id, sound_type))
+        if path is not None:
+            playable = self._playable.get(path)
+            if playable is not None:
+                return path, playable
+        path = self._defaults.get(sound_type)
+        return path, self._playable.get(path)
+
+    def playable_paths(self):
+        """Every file the table can play straight away"""
+        with self.lock:
+            return {playable for playable in self._playable.values() if playable is not None}
+
+    def set_default(self, sound_type, path):
+        with self.lock:
+            self._defaults[sound_type] = path
+            self._load_locked(path)
+            self._prune_locked()
+            self.version += 1
+
+    def set_override(self, session_id, sound_type, path):
+        with self.lock:
+            if path:
+                self._overrides[(session_id, sound_type)] = path
+                self._load_locked(path)
+            else:
+                self._overrides.pop((session_id, sound_type), None)
+            self._prune_locked()
+            self.version += 1
+
+    def refresh(self, path):
+        """Look a file up again after it changed on disk or finished converting"""
+        with self.lock:
+            if path in self._playable:
+                del self._playable[path]
+                self._load_locked(path)
+                self.version += 1
+
+    def invalidate(self, path):
+        """A file was deleted - everyone using it falls back to the default"""
+        with self.lock:
+            if path in self._playable:
+                self._playable[path] = None
+                self.version += 1
+
+    def rebuild(self, defaults, preferences):
+        """Recompile the whole table from default paths and {session: {'click_sound': ...}} preferences"""
+        with self.lock:
+            self._defaults = dict(defaults)
+            self._overrides = {
+                (session_id, sound_type): user_prefs[f'{sound_type}_sound']
+                for session_id, user_prefs in preferences.items()
+                for sound_type in SOUND_TYPES
+                if user_prefs.get(f'{sound_type}_sound')
+            }
+            self._playable = {}
+            for path in set(self._defaults.values()) | set(self._overrides.values()):
+                self._load_locked(path)
+            self.version += 1
+            return sum(1 for playable in self._playable.values() if playable is not None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'overrides': len(self._overrides),
+                'sounds': len(self._playable),
+                'ready': sum(1 for playable in self._playable.values() if playable is not None),
+            }
@@ -0,0 +1,156 @@
+"""
+SQLite storage for Remote Audio Clicker state
+A StateStore backend keeping every document in one WAL-mode database,
+one row per top-level key, so a flush writes only the entries that changed.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS documents (
+        name TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,  -- 'dict': one row per key in entries; 'value': the whole document under key ''
+        updated REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS entries (
+        name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (name, key)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS entries_updated ON entries (name, updated)",
+    """CREATE TABLE IF NOT EXISTS migrations (
+        name TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        migrated REAL NOT NULL
+    )""",
+)
+
+UPSERT_ENTRY = (
+    "INSERT INTO entries (name, key, value, updated) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (name, key) DO UPDATE SET value = excluded.value, updated = excluded.updated"
+)
+DELETE_ENTRY = "DELETE FROM entries WHERE name = ? AND key = ?"
+UPSERT_DOCUMENT = (
+    "INSERT INTO documents (name, kind, updated) VALUES (?, ?, ?) "
+    "ON CONFLICT (name) DO UPDATE SET kind = excluded.kind, updated = excluded.updated"
+)
+
+
+class SqliteBackend:
+    """StateStore backend on a single SQLite database in WAL mode.
+
+    A dict document is stored as one row per top-level key; ``write``
+    compares each key's JSON with what was last written and only upserts
+    the changed rows and deletes the removed ones, in one transaction.
+    Anything else is stored as a single row. Each thread gets its own
+    connection, statements are parameterized (and so cached by sqlite3),
+    and WAL lets readers carry on while the flusher writes.
+
+    The first time a document is loaded, the JSON file it used to live in
+    is imported (once - recorded in the migrations table) and left in place.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._written = {}  # name -> {key: json} as last written by this process
+        self.rows_written = 0
+        self.rows_deleted = 0
+        self.migrated = []
+        conn = self._connection()
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; safe against corruption
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _rows(data):
+        """(kind, {key: json}) for a document"""
+        if isinstance(data, dict):
+            return 'dict', {str(key): json.dumps(value, separators=(',', ':')) for key, value in data.items()}
+        return 'value', {'': json.dumps(data, separators=(',', ':'))}
+
+    def _migrate(self, conn, name, path):
+        """Import a document's old JSON file, the first time only"""
+        if conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+            return
+        data = None
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+        with conn:
+            if data is not None and not conn.execute("SELECT 1 FROM documents WHERE name = ?", (name,)).fetchone():
+                kind, rows = self._rows(data)
+                now = time.time()
+                conn.execute(UPSERT_DOCUMENT, (name, kind, now))
+                conn.executemany(UPSERT_ENTRY, [(name, key, value, now) for key, value in rows.items()])
+                self.migrated.append(name)
+                print(f"🗄️ Migrated {path} into {self.path} ({len(rows)} row{'s' if len(rows) != 1 else ''})")
+            conn.execute("INSERT OR IGNORE INTO migrations (name, source, migrated) VALUES (?, ?, ?)",
+                         (name, path, time.time()))
+
+    def load(self, name, path):
+        """The stored document, or None if there isn't one yet"""
+        conn = self._connection()
+        self._migrate(conn, name, path)
+        document = conn.execute("SELECT kind FROM documents WHERE name = ?", (name,)).fetchone()
+        if document is None:
+            return None
+        rows = dict(conn.execute("SELECT key, value FROM entries WHERE name = ?", (name,)).fetchall())
+        with self.lock:
+            self._written[name] = dict(rows)
+        if document[0] == 'dict':
+            return {key: json.loads(value) for key, value in rows.items()}
+        return json.loads(rows[''])
+
+    def encode(self, name, data):
+        """Serialize a document row by row (called under the store lock)"""
+        return self._rows(data)
+
+    def write(self, name, path, payload):
+        """Write only the rows that changed since the last write"""
+        kind, rows = payload
+        with self.lock:
+            written = self._written.get(name, {})
+            changed = [(key, value) for key, value in rows.items() if written.get(key) != value]
+            removed = [key for key in written if key not in rows]
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(UPSERT_DOCUMENT, (name, kind, now))
+            conn.executemany(UPSERT_ENTRY, [(name, key, value, now) for key, value in changed])
+            conn.executemany(DELETE_ENTRY, [(name, key) for key in removed])
+        with self.lock:
+            self._written[name] = rows
+            self.rows_written += len(changed)
+            self.rows_deleted += len(removed)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'backend': self.name,
+                'database': self.path,
+                'rows_written': self.rows_written,
+                'rows_deleted': self.rows_deleted,
+                'migrated': list(self.migrated),
+            }
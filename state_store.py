@@ -0,0 +1,217 @@
+"""
+In-memory state store for Remote Audio Clicker
+Request handlers only touch memory - a background flusher writes dirty
+documents back to their JSON files.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+def atomic_write_json(path, data):
+    """Write JSON to a temp file next to path, then rename it into place"""
+    atomic_write_text(path, json.dumps(data, separators=(',', ':')))
+
+
+def atomic_write_text(path, text):
+    """Write text to a temp file next to path, then rename it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class JsonFileBackend:
+    """Each document is its own JSON file, rewritten whole on every flush"""
+
+    name = 'json'
+
+    def load(self, name, path):
+        """The stored document, or None if there isn't one yet"""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def encode(self, name, data):
+        """Serialize a document (called under the store lock)"""
+        return json.dumps(data, separators=(',', ':'))
+
+    def write(self, name, path, payload):
+        atomic_write_text(path, payload)
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class StateStore:
+    """Owns every persisted JSON document and writes them back lazily.
+
+    Each document is registered under a name with the file that backs it.
+    ``get`` returns the live object, mutations go through ``edit`` (or
+    ``set`` / ``mark_dirty``), and the flusher thread persists dirty
+    documents every ``flush_interval`` seconds or as soon as
+    ``dirty_threshold`` mutations have piled up. Where documents are
+    stored is up to ``backend`` - one JSON file each by default.
+    """
+
+    def __init__(self, flush_interval=2.0, dirty_threshold=50, backend=None):
+        self.backend = backend or JsonFileBackend()
+        self.flush_interval = flush_interval
+        self.dirty_threshold = dirty_threshold
+        self.lock = threading.RLock()
+        self._flush_lock = threading.Lock()  # Held across snapshot and write
+        self._docs = {}
+        self._dirty = set()
+        self._dirty_count = 0
+        self._versions = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flush_count = 0
+        self.last_flush_time = None
+
+    def register(self, name, path, default=None, to_json=None, from_json=None):
+        """Register a document and load it from disk.
+
+        ``to_json``/``from_json`` let a document be a richer object than a
+        plain dict; they convert it to and from its on-disk JSON form.
+        """
+        data = None
+        try:
+            data = self.backend.load(name, path)
+        except Exception as e:
+            print(f"⚠️ Could not load {path}: {e}")
+
+        if data is None:
+            data = default() if callable(default) else (default if default is not None else {})
+        elif from_json:
+            data = from_json(data)
+
+        with self.lock:
+            self._docs[name] = {
+                'path': path,
+                'data': data,
+                'to_json': to_json,
+            }
+        return data
+
+    def get(self, name):
+        """Return the live in-memory object for a document"""
+        return self._docs[name]['data']
+
+    def path(self, name):
+        """Return the file that backs a document"""
+        return self._docs[name]['path']
+
+    def set(self, name, data):
+        """Replace a document wholesale and mark it dirty"""
+        with self.lock:
+            self._docs[name]['data'] = data
+            self._mark_dirty_locked(name)
+
+    def mark_dirty(self, name):
+        """Flag a document as changed so the flusher persists it"""
+        with self.lock:
+            self._mark_dirty_locked(name)
+
+    @contextmanager
+    def edit(self, name):
+        """Mutate a document under the store lock, then mark it dirty"""
+        with self.lock:
+            yield self._docs[name]['data']
+            self._mark_dirty_locked(name)
+
+    def version(self, name):
+        """Counter bumped on every change to a document (drives ETags)"""
+        return self._versions.get(name, 0)
+
+    def _mark_dirty_locked(self, name):
+        self._versions[name] = self._versions.get(name, 0) + 1
+        self._dirty.add(name)
+        self._dirty_count += 1
+        if self._dirty_count >= self.dirty_threshold:
+            self._wake.set()
+
+    def dirty_names(self):
+        """Names of documents waiting to be flushed"""
+        with self.lock:
+            return sorted(self._dirty)
+
+    def flush(self, name=None):
+        """Persist dirty documents now (all of them, or just ``name``)"""
+        # One flush at a time: an older snapshot must never be written after a newer one
+        with self._flush_lock:
+            with self.lock:
+                names = [name] if name is not None else list(self._dirty)
+                names = [n for n in names if n in self._dirty]
+                snapshots = []
+                for n in names:
+                    doc = self._docs[n]
+                    data = doc['to_json'](doc['data']) if doc['to_json'] else doc['data']
+                    # Serialize under the lock so handlers can't mutate mid-dump
+                    snapshots.append((n, doc['path'], self.backend.encode(n, data)))
+                    self._dirty.discard(n)
+                if name is None:
+                    self._dirty_count = 0
+
+            for n, path, payload in snapshots:
+                try:
+                    self.backend.write(n, path, payload)
+                except Exception as e:
+                    print(f"⚠️ Could not save {path}: {e}")
+                    self.mark_dirty(n)
+
+            if snapshots:
+                self.flush_count += 1
+                self.last_flush_time = time.time()
+            return len(snapshots)
+
+    def start(self):
+        """Start the background flusher thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='state-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write out anything still dirty"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        self.flush()
+
+    def stats(self):
+        """Flusher counters for the stats endpoint"""
+        with self.lock:
+            return {
+                **self.backend.stats(),
+                'documents': len(self._docs),
+                'dirty': sorted(self._dirty),
+                'flush_count': self.flush_count,
+                'last_flush_time': self.last_flush_time,
+                'flush_interval': self.flush_interval,
+                'dirty_threshold': self.dirty_threshold,
+            }
@@ -0,0 +1,80 @@
+"""
+Tests for PiShock press coalescing
+Run with: python -m pytest test_pishock_client.py
+"""
+
+import threading
+import time
+
+from pishock_client import PiShockClient
+
+
+class FakeResponse:
+    status_code = 200
+    text = 'Operation Succeeded.'
+
+
+def make_client():
+    client = PiShockClient('http://127.0.0.1:9/api/apioperate', workers=4, queue_size=1000)
+    client.session.post = lambda *args, **kwargs: FakeResponse()
+    return client
+
+
+def press(intensity='30', duration='1'):
+    return {'Code': 'code', 'Op': '0', 'Intensity': intensity, 'Duration': duration}
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_first_press_is_sent_at_once_and_follow_ups_merge():
+    client = make_client()
+    first = client.submit(press('30', '1'), window=0.2)
+    assert first['status'] != 'pending' and not first['merged']
+
+    follow_up = client.submit(press('45.5', '2.6'), window=0.2)
+    merged = client.submit(press('20', '1'), window=0.2)
+    assert follow_up['status'] == 'pending'
+    assert merged['merged'] and merged['id'] == follow_up['id']
+    assert (merged['intensity'], merged['duration']) == ('46', '3')
+
+    assert client.wait(follow_up['id'], timeout=3)['status'] == 'succeeded'
+    assert wait_for(lambda: not client._windows)
+
+
+def test_follow_up_racing_a_closing_window_is_never_stranded():
+    """A press that arrives while its window closes must still be sent"""
+    client = make_client()
+    new_job_locked = client._new_job_locked
+
+    def slow_new_job_locked(payload):
+        time.sleep(0.02)  # Lets the window timer fire mid-submit
+        return new_job_locked(payload)
+
+    client._new_job_locked = slow_new_job_locked
+    jobs = []
+    jobs_lock = threading.Lock()
+
+    def presser(n):
+        for i in range(20):
+            job = client.submit(press(str(10 + n), str(1 + i % 3)), window=0.01)
+            with jobs_lock:
+                jobs.append(job['id'])
+            time.sleep(0.003)
+
+    threads = [threading.Thread(target=presser, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert wait_for(lambda: not client._windows)
+    for job_id in set(jobs):
+        job = client.wait(job_id, timeout=3)
+        assert job['status'] == 'succeeded', job
@@ -0,0 +1,248 @@
+"""
+Persistent transcode cache for Remote Audio Clicker
+Converts MP3 (and other ffmpeg-readable) sounds to WAV once and reuses the
+result for as long as the source file's content is unchanged.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+
+from state_store import atomic_write_json
+
+
+class TranscodeCache:
+    """Content-hash keyed directory of converted WAV files.
+
+    Outputs are named after the SHA-256 of the source bytes plus the target
+    format, so identical uploads share one conversion. A small index maps
+    source paths to (mtime, size, hash) so unchanged files aren't rehashed,
+    and the directory is kept under ``max_bytes`` by evicting the least
+    recently used outputs.
+    """
+
+    INDEX_NAME = 'index.json'
+    TOUCH_INTERVAL = 60  # Seconds between last-used updates of an output that keeps getting hit
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, sample_rate=44100, channels=2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.lock = threading.Lock()
+        self._key_locks = {}  # content hash -> [lock, callers using it] while a conversion is wanted
+        self.hits = 0
+        self.conversions = 0
+        self.failures = 0
+        self.evictions = 0
+        self.version = 0  # Bumped whenever anything reported by stats() changes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, self.INDEX_NAME)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            if os.path.exists(self._index_path):
+                with open(self._index_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not load transcode index: {e}")
+        return {}
+
+    def _save_index_locked(self):
+        self.version += 1
+        try:
+            atomic_write_json(self._index_path, self._index)
+        except Exception as e:
+            print(f"⚠️ Could not save transcode index: {e}")
+
+    @staticmethod
+    def content_hash(path):
+        """SHA-256 of a file's bytes"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _output_path(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}_{self.sample_rate}_{self.channels}.wav")
+
+    def _source_hash(self, src):
+        """Hash for src, reusing the indexed one while mtime and size match"""
+        src_key = os.path.abspath(src)
+        st = os.stat(src)
+        with self.lock:
+            entry = self._index.get(src_key)
+            if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                return entry['hash']
+
+        content_hash = self.content_hash(src)
+        with self.lock:
+            self._index[src_key] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'hash': content_hash}
+            self._save_index_locked()
+        return content_hash
+
+    def lookup(self, src):
+        """Path of an already converted output for src, or None (never converts)"""
+        try:
+            output_path = self._output_path(self._source_hash(src))
+        except OSError:
+            return None
+        try:
+            st = os.stat(output_path)
+        except OSError:
+            return None
+        if time.time() - st.st_mtime >= self.TOUCH_INTERVAL:
+            # Keeps eviction least-recently-used rather than oldest-converted
+            self._touch(output_path)
+        return output_path
+
+    def get_or_convert(self, src, timeout=30):
+        """Return a WAV for src, converting with ffmpeg only on a cache miss"""
+        try:
+            content_hash = self._source_hash(src)
+        except OSError as e:
+            print(f"⚠️ Cannot read {src} for transcoding: {e}")
+            return None
+        output_path = self._output_path(content_hash)
+
+        with self.lock:
+            key_lock = self._key_locks.get(content_hash)
+            if key_lock is None:
+                key_lock = self._key_locks[content_hash] = [threading.Lock(), 0]
+            key_lock[1] += 1
+
+        # One conversion per content hash - concurrent callers wait and reuse it
+        try:
+            with key_lock[0]:
+                if os.path.exists(output_path):
+                    with self.lock:
+                        self.hits += 1
+                        self.version += 1
+                    self._touch(output_path)
+                    return output_path
+                return self._convert(src, output_path, timeout)
+        finally:
+            with self.lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[content_hash]
+
+    def _convert(self, src, output_path, timeout):
+        tmp_path = output_path + '.tmp.wav'
+        try:
+            print(f"🔄 Transcoding to WAV: {src}")
+            result = subprocess.run(
+                ['ffmpeg', '-i', src, '-acodec', 'pcm_s16le', '-ar', str(self.sample_rate),
+                 '-ac', str(self.channels), '-y', tmp_path],
+                capture_output=True,
+                timeout=timeout
+            )
+            if result.returncode == 0 and os.path.exists(tmp_path):
+                os.replace(tmp_path, output_path)
+                with self.lock:
+                    self.conversions += 1
+                    self.version += 1
+                print(f"✅ Cached WAV: {output_path}")
+                self._evict()
+                return output_path
+            print(f"⚠️ ffmpeg conversion failed: {result.stderr.decode(errors='replace')}")
+        except FileNotFoundError:
+            print("⚠️ ffmpeg not found - MP3 conversion requires ffmpeg")
+        except Exception as e:
+            print(f"⚠️ Transcode error: {e}")
+
+        with self.lock:
+            self.failures += 1
+            self.version += 1
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return None
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _outputs(self):
+        """(path, size, last_used) for every converted file in the cache"""
+        outputs = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.wav') or filename.endswith('.tmp.wav'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            outputs.append((path, st.st_size, st.st_mtime))
+        return outputs
+
+    def _evict(self):
+        """Delete least recently used outputs until the cache fits its budget"""
+        outputs = sorted(self._outputs(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in outputs)
+        for path, size, _ in outputs:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                with self.lock:
+                    self.evictions += 1
+                    self.version += 1
+                print(f"🧹 Evicted cached WAV: {os.path.basename(path)}")
+            except OSError:
+                pass
+
+    def forget(self, src):
+        """Drop src from the index and delete outputs nothing else references"""
+        with self.lock:
+            self._index.pop(os.path.abspath(src), None)
+            self._save_index_locked()
+        return self.cleanup_orphans()
+
+    def cleanup_orphans(self):
+        """Remove index entries for missing sources and outputs with no source"""
+        with self.lock:
+            for src_key in [k for k in self._index if not os.path.exists(k)]:
+                del self._index[src_key]
+            self._save_index_locked()
+            live_hashes = {entry['hash'] for entry in self._index.values()}
+
+        removed = 0
+        for path, _, _ in self._outputs():
+            content_hash = os.path.basename(path).split('_', 1)[0]
+            if content_hash not in live_hashes:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            print(f"🧹 Removed {removed} orphaned cached WAV{'s' if removed != 1 else ''}")
+        return removed
+
+    def stats(self):
+        """Counters for the stats endpoint"""
+        outputs = self._outputs()
+        with self.lock:
+            return {
+                'entries': len(outputs),
+                'bytes': sum(size for _, size, _ in outputs),
+                'max_bytes': self.max_bytes,
+                'sources': len(self._index),
+                'hits': self.hits,
+                'conversions': self.conversions,
+                'failures': self.failures,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,94 @@
+"""
+Trigger tracing for Remote Audio Clicker
+Each click, bonk and zap gets a trace ID and a timestamp per stage it
+reaches (sound resolved, playback started, OSC sent, PiShock answered),
+kept in a bounded buffer for per-stage latency percentiles.
+"""
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+
+
+class Trace:
+    """Stage offsets (milliseconds since the trigger was received) for one trigger"""
+
+    __slots__ = ('id', 'kind', 'started', '_t0', 'stages')
+
+    def __init__(self, trace_id, kind, t0):
+        self.id = trace_id
+        self.kind = kind
+        self._t0 = t0
+        self.started = time.time() - (time.perf_counter() - t0)
+        self.stages = {'received': 0.0}
+
+    def mark(self, stage):
+        """Record that the trigger reached ``stage`` now (the first time only)"""
+        if stage not in self.stages:
+            self.stages[stage] = round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def elapsed_ms(self):
+        """Milliseconds since the trigger was received"""
+        return round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def to_dict(self):
+        return {'id': self.id, 'kind': self.kind, 'started': self.started, 'stages': dict(self.stages)}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Tracer:
+    """Bounded buffer of the last ``capacity`` traces.
+
+    Traces join the buffer when they start and are marked in place from
+    whichever thread reaches a stage (audio engine, OSC sender, PiShock
+    workers), so the buffer always reflects the latest stages reached.
+    """
+
+    def __init__(self, capacity=1000):
+        self.lock = threading.Lock()
+        self._traces = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self.started = 0
+
+    def start(self, kind, t0=None):
+        """New trace for a trigger received at perf_counter() time t0 (default: now)"""
+        trace = Trace(f"{next(self._ids):x}", kind, time.perf_counter() if t0 is None else t0)
+        with self.lock:
+            self._traces.append(trace)
+            self.started += 1
+        return trace
+
+    def recent(self, count=20, kind=None):
+        """The newest traces, newest first"""
+        with self.lock:
+            traces = [t for t in reversed(self._traces) if kind is None or t.kind == kind]
+        return [trace.to_dict() for trace in traces[:count]]
+
+    def summary(self, kind=None):
+        """{stage: {count, p50, p95, p99, max}} in milliseconds since received"""
+        with self.lock:
+            traces = [t for t in self._traces if kind is None or t.kind == kind]
+        by_stage = {}
+        for trace in traces:
+            for stage, offset in list(trace.stages.items()):
+                by_stage.setdefault(stage, []).append(offset)
+        summary = {}
+        for stage, offsets in by_stage.items():
+            offsets.sort()
+            summary[stage] = {
+                'count': len(offsets),
+                'p50': percentile(offsets, 0.50),
+                'p95': percentile(offsets, 0.95),
+                'p99': percentile(offsets, 0.99),
+                'max': offsets[-1],
+            }
+        return summary
@@ -0,0 +1,300 @@
+"""
+Production serving for Remote Audio Clicker
+Runs the Flask app on a pooled WSGI server that can be started in the
+background and stopped cleanly, instead of the Werkzeug debug server.
+"""
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Optional alternative engine - the pooled Werkzeug server is the default
+try:
+    from cheroot import wsgi as cheroot_wsgi
+    CHEROOT_AVAILABLE = True
+except ImportError:
+    CHEROOT_AVAILABLE = False
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler, get_sockaddr, select_address_family
+
+
+def _listen(host, port, backlog):
+    """Bound, listening socket - bind errors are raised as OSError.
+
+    Werkzeug calls sys.exit() when it can't bind, which callers catching
+    Exception (like the GUI) would not survive.
+    """
+    family = select_address_family(host, port)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # As http.server does
+        sock.bind(get_sockaddr(host, int(port), family))
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class _CountingRequestHandler(WSGIRequestHandler):
+    """Werkzeug handler that counts open connections and gives streams their own thread"""
+
+    detached = False  # The connection now belongs to a stream thread, not the pool worker
+
+    def handle(self):
+        self.server.connection_opened()
+        try:
+            super().handle()
+        finally:
+            if not self.detached:
+                self.server.connection_closed()
+
+    def finish(self):
+        if not self.detached:
+            super().finish()
+
+    def run_wsgi(self):
+        if urlsplit(self.path).path not in self.server.stream_paths:
+            return super().run_wsgi()
+
+        self.close_connection = True  # A stream is the last request on its connection
+        if not self.server.stream_opened():
+            # Refused before the app runs, so the page falls back to polling
+            self.send_response(503)
+            self.send_header('Retry-After', '30')
+            self.send_header('Content-Length', '0')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            return
+
+        # SSE streams and WebSockets stay open for as long as the page does -
+        # serve them outside the pool so they never hold a worker
+        self.detached = True
+        threading.Thread(target=self._serve_stream, name='http-stream', daemon=True).start()
+
+    def _serve_stream(self):
+        try:
+            WSGIRequestHandler.run_wsgi(self)
+        except (ConnectionError, socket.timeout) as e:
+            self.connection_dropped(e)
+        except Exception as e:
+            print(f"❌ Stream error on {self.path}: {e}")
+        finally:
+            self.server.stream_closed()
+            try:
+                WSGIRequestHandler.finish(self)
+            except OSError:
+                pass
+            self.server.shutdown_request(self.request)
+            self.server.connection_closed()
+
+
+class _DrainingWSGIServer(ThreadedWSGIServer):
+    """Werkzeug server with a fixed worker pool, a stream cap and a drain count.
+
+    Up to ``threads`` workers handle connections; ``backlog`` more wait
+    for one before the accept loop stops and the OS queue takes over.
+    Requests for ``stream_paths`` move to a thread of their own, at most
+    ``max_streams`` at a time - the rest get 503.
+    """
+
+    def __init__(self, host, port, app, threads, backlog, timeout, stream_paths=(), max_streams=0):
+        handler = type('RequestHandler', (_CountingRequestHandler,), {'timeout': timeout})
+        self._open_lock = threading.Condition()
+        self._open = 0
+        self._streams = 0
+        self.stream_paths = frozenset(stream_paths)
+        self.max_streams = max_streams
+        self._slots = threading.BoundedSemaphore(threads + backlog)
+        self._closing = False
+        listener = _listen(host, port, backlog)
+        try:
+            # Werkzeug serves a duplicate of the listening socket's descriptor
+            super().__init__(host, port, app, handler=handler, fd=listener.fileno())
+        finally:
+            listener.close()
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        # Wait for a slot, but keep noticing shutdown() while every worker is busy
+        while not self._slots.acquire(timeout=0.5):
+            if self._closing:
+                self.shutdown_request(request)
+                return
+        try:
+            self._pool.submit(self._process, request, client_address)
+        except RuntimeError:  # Pool already shut down
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process(self, request, client_address):
+        detached = False
+        try:
+            detached = self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            if not detached:
+                self.shutdown_request(request)
+            self._slots.release()
+
+    def finish_request(self, request, client_address):
+        """Handle one connection; True if a stream thread took it over"""
+        return self.RequestHandlerClass(request, client_address, self).detached
+
+    def shutdown(self):
+        self._closing = True
+        super().shutdown()
+        self._pool.shutdown(wait=False)  # In-flight requests finish; stop() waits for them
+
+    def stream_opened(self):
+        """Claim a stream slot; False when max_streams are already open"""
+        with self._open_lock:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def stream_closed(self):
+        with self._open_lock:
+            self._streams -= 1
+
+    def connection_opened(self):
+        with self._open_lock:
+            self._open += 1
+
+    def connection_closed(self):
+        with self._open_lock:
+            self._open -= 1
+            self._open_lock.notify_all()
+
+    def wait_for_connections(self, timeout):
+        """Block until every open connection has finished; returns how many are left"""
+        deadline = time.monotonic() + timeout
+        with self._open_lock:
+            while self._open:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._open_lock.wait(remaining)
+            return self._open
+
+
+class WSGIServer:
+    """A WSGI server that can run in the foreground or background and stop cleanly.
+
+    The default engine is a pooled Werkzeug server: ``threads`` workers, a
+    listen ``backlog`` and a per-connection socket ``timeout``. Long-lived
+    requests for ``stream_paths`` (SSE, WebSockets) run on their own
+    threads instead, up to ``max_streams`` of them, so open pages never
+    starve ordinary requests. ``engine='cheroot'`` (or ``'auto'``, cheroot
+    when installed) uses cheroot's pool of ``threads`` workers for
+    everything; every open stream then holds one of them, and /ws is
+    unavailable.
+
+    ``stop()`` first calls ``on_draining`` (so long-lived streams can end),
+    stops accepting connections, waits up to ``shutdown_timeout`` for
+    in-flight requests and finally calls ``on_stopped``.
+    """
+
+    def __init__(self, app, host='0.0.0.0', port=5000, threads=32, backlog=128,
+                 timeout=30, shutdown_timeout=10, engine='werkzeug',
+                 stream_paths=(), max_streams=256, on_draining=None, on_stopped=None):
+        if engine == 'auto':
+            engine = 'cheroot' if CHEROOT_AVAILABLE else 'werkzeug'
+        if engine == 'cheroot' and not CHEROOT_AVAILABLE:
+            raise ValueError("cheroot is not installed - pip install cheroot")
+        if engine not in ('cheroot', 'werkzeug'):
+            raise ValueError(f"Unknown server engine: {engine}")
+
+        self.app = app
+        self.host = host
+        self.port = port
+        self.threads = threads
+        self.backlog = backlog
+        self.timeout = timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.engine = engine
+        self.stream_paths = stream_paths
+        self.max_streams = max_streams
+        self.on_draining = on_draining
+        self.on_stopped = on_stopped
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    def _bind(self):
+        if self.engine == 'cheroot':
+            server = cheroot_wsgi.Server(
+                (self.host, self.port), self.app,
+                numthreads=self.threads,
+                request_queue_size=self.backlog,
+                timeout=self.timeout,
+                shutdown_timeout=self.shutdown_timeout
+            )
+            server.prepare()
+            return server
+        return _DrainingWSGIServer(self.host, self.port, self.app, self.threads, self.backlog,
+                                   self.timeout, self.stream_paths, self.max_streams)
+
+    def _serve(self, server):
+        if self.engine == 'cheroot':
+            server.serve()
+        else:
+            server.serve_forever()
+
+    def start(self):
+        """Bind the port and serve from a background thread"""
+        with self.lock:
+            if self._server is not None:
+                return
+            # Bind here so "address in use" is raised to the caller, not lost in the thread
+            self._server = self._bind()
+            self._thread = threading.Thread(target=self._serve, args=(self._server,), daemon=True)
+            self._thread.start()
+        print(f"📡 Serving on http://{self.host}:{self.port} ({self.engine}, {self.threads} threads)")
+
+    def serve_forever(self):
+        """Serve in the current thread until Ctrl+C, then shut down gracefully"""
+        self.start()
+        thread = self._thread
+        try:
+            while self._server is not None and thread.is_alive():
+                thread.join(0.5)
+        except KeyboardInterrupt:
+            print("\n🛑 Ctrl+C received")
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop accepting, drain in-flight requests and run on_stopped"""
+        with self.lock:
+            server, thread = self._server, self._thread
+            self._server = self._thread = None
+        if server is None:
+            return
+
+        print("🛑 Stopping server - draining in-flight requests...")
+        if self.on_draining:
+            self.on_draining()
+
+        if self.engine == 'cheroot':
+            # Closes the listener and joins workers, waiting up to shutdown_timeout
+            server.stop()
+        else:
+            server.shutdown()
+            server.server_close()
+            left = server.wait_for_connections(self.shutdown_timeout)
+            if left:
+                print(f"⚠️ {left} connection{'s' if left != 1 else ''} still open after {self.shutdown_timeout}s")
+        thread.join(self.shutdown_timeout)
+
+        if self.on_stopped:
+            self.on_stopped()
+        print("✅ Server stopped")